@@ -0,0 +1,121 @@
+"""
+Compiled AIML brain with hot reload.
+
+Parsing wellness.aiml on every process start gets slower as the file grows.
+The first process to see a given version of the file learns it once and
+saves python-aiml's compiled brain next to a hash of the source. Later
+workers (and test runs) bootstrap straight from that snapshot.
+
+Reloads build a new Kernel off to the side and swap the reference in one
+assignment, so in-flight /chat requests finish on the kernel they started
+with and are never blocked by a parse.
+"""
+import glob
+import hashlib
+import os
+import threading
+import time
+import aiml
+
+
+class AIMLBrain:
+    def __init__(self, aiml_path, cache_dir):
+        self.aiml_path = aiml_path
+        self.cache_dir = cache_dir
+        self.source_hash = None
+        self.loaded_from = None
+        self.loaded_at = None
+        self._mtime = None
+        self._reload_lock = threading.Lock()
+        self.kernel = self._build()
+
+    def _file_hash(self):
+        with open(self.aiml_path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def _brain_path(self, digest):
+        stem = os.path.splitext(os.path.basename(self.aiml_path))[0]
+        return os.path.join(self.cache_dir, f"{stem}-{digest[:16]}.brn")
+
+    def _build(self):
+        kernel = aiml.Kernel()
+        if not os.path.exists(self.aiml_path):
+            self.loaded_from = None
+            return kernel
+
+        mtime = os.path.getmtime(self.aiml_path)
+        digest = self._file_hash()
+        brain_file = self._brain_path(digest)
+        loaded_from = "brain"
+        try:
+            if not os.path.exists(brain_file):
+                raise FileNotFoundError(brain_file)
+            kernel.bootstrap(brainFile=brain_file)
+        except Exception:
+            kernel = aiml.Kernel()
+            kernel.learn(self.aiml_path)
+            loaded_from = "aiml"
+            self._save(kernel, brain_file)
+
+        self.source_hash, self.loaded_from = digest, loaded_from
+        self._mtime = mtime
+        self.loaded_at = time.time()
+        return kernel
+
+    def _save(self, kernel, brain_file):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write under a temp name and rename, so a worker never loads a partial file
+            tmp = f"{brain_file}.{os.getpid()}.tmp"
+            kernel.saveBrain(tmp)
+            os.replace(tmp, brain_file)
+            # Drop snapshots of older versions of the same file
+            for stale in glob.glob(self._brain_path("*")):
+                if stale != brain_file:
+                    os.remove(stale)
+        except OSError as e:
+            print(f"AIML Brain Save Error: {e}")
+
+    def respond(self, message):
+        return self.kernel.respond(message)
+
+    def reload(self):
+        """Rebuild the kernel and swap it in; returns the new kernel."""
+        with self._reload_lock:
+            self.kernel = self._build()
+            return self.kernel
+
+    def reload_if_changed(self):
+        try:
+            mtime = os.path.getmtime(self.aiml_path)
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        try:
+            self.reload()
+        except Exception as e:
+            print(f"AIML Reload Error: {e}")
+            return False
+        return True
+
+    def start_watcher(self, interval):
+        """Poll the AIML file every `interval` seconds and hot-reload on change."""
+        def watch():
+            while True:
+                time.sleep(interval)
+                if self.reload_if_changed():
+                    print(f"AIML brain reloaded from {self.aiml_path}")
+
+        thread = threading.Thread(target=watch, name="aiml-watcher", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        return {
+            "aiml_path": self.aiml_path,
+            "source_hash": self.source_hash,
+            "loaded_from": self.loaded_from,
+            "loaded_at": self.loaded_at,
+            "categories": self.kernel.numCategories()
+        }
@@ -0,0 +1,198 @@
+"""
+Time-bucketed chat counters for the admin analytics endpoints.
+
+Every stored chat increments one hourly and one daily bucket in the
+`chat_rollups` collection. A bucket is keyed by its start time and by
+DIMENSIONS, so one row counts e.g. "Hindi, Groq, mental, llm, not crisis,
+no image on 2026-03-14". Dashboards $group a few hundred bucket rows instead
+of the whole chats collection.
+
+Chats tagged with health `topics` also bump one "topic" row per topic per
+day, which backs the admin top health queries view.
+
+Hourly rows carry an expires_at so Mongo's TTL monitor drops them after
+HOURLY_RETENTION_DAYS. Daily and topic rows are kept forever.
+`python maintenance.py rebuild-rollups` recomputes buckets from chats.
+"""
+from datetime import datetime, timedelta
+from pymongo import ReplaceOne
+
+DIMENSIONS = ("language", "ai_model", "intent", "response_source", "is_crisis", "has_image")
+HOURLY_RETENTION_DAYS = 14
+
+
+def bucket_start(timestamp, granularity):
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _bucket_doc(granularity, start, dims):
+    doc = {"granularity": granularity, "bucket": start}
+    doc.update((d, dims.get(d)) for d in DIMENSIONS)
+    if granularity == "hour":
+        doc["expires_at"] = start + timedelta(days=HOURLY_RETENTION_DAYS)
+    return doc
+
+
+def bucket_id(granularity, start, dims):
+    # A string key keeps _id equality independent of field order
+    values = "|".join(str(dims.get(d)) for d in DIMENSIONS)
+    return f"{granularity}:{start.isoformat()}:{values}"
+
+
+def bucket_update(chat, granularity):
+    """(filter, update) that counts one stored chat in its `granularity` bucket."""
+    start = bucket_start(chat["timestamp"], granularity)
+    return (
+        {"_id": bucket_id(granularity, start, chat)},
+        {"$inc": {"count": 1}, "$setOnInsert": _bucket_doc(granularity, start, chat)}
+    )
+
+
+def topic_id(start, topic):
+    return f"topic:{start.isoformat()}:{topic}"
+
+
+def chat_updates(chat):
+    """[(filter, update)] upserts that count one stored chat in every bucket it touches."""
+    ops = [bucket_update(chat, g) for g in ("hour", "day")]
+    day = bucket_start(chat["timestamp"], "day")
+    for topic in chat.get("topics") or ():
+        ops.append((
+            {"_id": topic_id(day, topic)},
+            {"$inc": {"count": 1}, "$setOnInsert": {"granularity": "topic", "bucket": day, "topic": topic}}
+        ))
+    return ops
+
+
+def summary(collection, since=None, daily_days=7):
+    """All dashboard counters from the daily buckets in one $facet query.
+
+    `since` limits every counter to days on or after that date; the `daily`
+    series covers the last `daily_days` days including today.
+    """
+    match = {"granularity": "day"}
+    if since is not None:
+        match["bucket"] = {"$gte": bucket_start(since, "day")}
+    today = bucket_start(datetime.now(), "day")
+    count = {"$sum": "$count"}
+
+    def by(field):
+        return [{"$group": {"_id": f"${field}", "count": count}}, {"$sort": {"count": -1}}]
+
+    result = next(collection.aggregate([
+        {"$match": match},
+        {"$facet": {
+            "total": [{"$group": {"_id": None, "count": count}}],
+            "today": [{"$match": {"bucket": today}}, {"$group": {"_id": None, "count": count}}],
+            "crisis": [{"$match": {"is_crisis": True}}, {"$group": {"_id": None, "count": count}}],
+            "images": [{"$match": {"has_image": True}}, {"$group": {"_id": {"$ne": ["$ai_model", "None"]}, "count": count}}],
+            "daily": [
+                {"$match": {"bucket": {"$gt": today - timedelta(days=daily_days)}}},
+                {"$group": {"_id": "$bucket", "count": count}},
+                {"$sort": {"_id": 1}}
+            ],
+            "language": by("language"),
+            "ai_model": by("ai_model"),
+            "intent": by("intent"),
+            "response_source": by("response_source")
+        }}
+    ]), {})
+
+    def scalar(name):
+        rows = result.get(name) or []
+        return rows[0]["count"] if rows else 0
+
+    images = {row["_id"]: row["count"] for row in result.get("images", [])}
+    return {
+        "total": scalar("total"),
+        "today": scalar("today"),
+        "crisis": scalar("crisis"),
+        "images_analyzed": sum(images.values()),
+        "images_success": images.get(True, 0),
+        "daily": [{"_id": row["_id"].strftime("%Y-%m-%d"), "count": row["count"]} for row in result.get("daily", [])],
+        "language": result.get("language", []),
+        "ai_model": result.get("ai_model", []),
+        "intent": result.get("intent", []),
+        "response_source": result.get("response_source", [])
+    }
+
+
+def top_topics(collection, since=None, limit=10):
+    """[(topic, count)] most mentioned first, over all days or from `since`."""
+    match = {"granularity": "topic"}
+    if since is not None:
+        match["bucket"] = {"$gte": bucket_start(since, "day")}
+    rows = collection.aggregate([
+        {"$match": match},
+        {"$group": {"_id": "$topic", "count": {"$sum": "$count"}}},
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$limit": limit}
+    ])
+    return [(row["_id"], row["count"]) for row in rows]
+
+
+def rebuild_rollups(chats_col, rollup_col, since=None, batch_size=500):
+    """Recompute buckets from chats (all of them, or from `since`); returns rows written.
+
+    Counts are overwritten, not incremented, so re-running is safe. Chats saved
+    while this runs may be missed in the current bucket; run it while quiet.
+    """
+    since = bucket_start(since, "day") if since is not None else None
+    # Hourly rows older than the retention window would expire straight away
+    hourly_since = bucket_start(datetime.now(), "day") - timedelta(days=HOURLY_RETENTION_DAYS)
+    written = 0
+    for granularity, fmt in (("hour", "%Y-%m-%dT%H"), ("day", "%Y-%m-%d")):
+        start_at = since
+        if granularity == "hour":
+            start_at = max(since, hourly_since) if since else hourly_since
+        match = {"timestamp": {"$type": "date"}}
+        if start_at is not None:
+            match["timestamp"]["$gte"] = start_at
+        group_id = {d: f"${d}" for d in DIMENSIONS}
+        group_id["bucket"] = {"$dateToString": {"format": fmt, "date": "$timestamp"}}
+        rows = chats_col.aggregate([
+            {"$match": match},
+            {"$group": {"_id": group_id, "count": {"$sum": 1}}}
+        ], allowDiskUse=True)
+        batch = []
+        for row in rows:
+            dims = row["_id"]
+            start = datetime.strptime(dims["bucket"], fmt)
+            doc = _bucket_doc(granularity, start, dims)
+            doc["count"] = row["count"]
+            batch.append(ReplaceOne({"_id": bucket_id(granularity, start, dims)}, doc, upsert=True))
+            if len(batch) >= batch_size:
+                rollup_col.bulk_write(batch, ordered=False)
+                written += len(batch)
+                batch = []
+        if batch:
+            rollup_col.bulk_write(batch, ordered=False)
+            written += len(batch)
+
+    match = {"timestamp": {"$type": "date"}, "topics.0": {"$exists": True}}
+    if since is not None:
+        match["timestamp"]["$gte"] = since
+    rows = chats_col.aggregate([
+        {"$match": match},
+        {"$unwind": "$topics"},
+        {"$group": {
+            "_id": {"topic": "$topics", "bucket": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}}},
+            "count": {"$sum": 1}
+        }}
+    ], allowDiskUse=True)
+    batch = []
+    for row in rows:
+        start = datetime.strptime(row["_id"]["bucket"], "%Y-%m-%d")
+        topic = row["_id"]["topic"]
+        doc = {"granularity": "topic", "bucket": start, "topic": topic, "count": row["count"]}
+        batch.append(ReplaceOne({"_id": topic_id(start, topic)}, doc, upsert=True))
+        if len(batch) >= batch_size:
+            rollup_col.bulk_write(batch, ordered=False)
+            written += len(batch)
+            batch = []
+    if batch:
+        rollup_col.bulk_write(batch, ordered=False)
+        written += len(batch)
+    return written
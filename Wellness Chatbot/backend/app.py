@@ -1,25 +1,44 @@
 import os
-import csv
+import re
 import json as json_module
-from io import StringIO
 import warnings
 warnings.filterwarnings("ignore")
 import hashlib
 import secrets
-import requests as http_requests
-from flask import Flask, request, jsonify, redirect, session, send_from_directory, url_for
+import tempfile
+import time
+import threading
+from flask import Flask, Response, request, jsonify, redirect, session, send_from_directory, url_for
 from flask_cors import CORS
-from datetime import datetime
+from werkzeug.exceptions import RequestEntityTooLarge
+from datetime import datetime, timedelta
 from openai import OpenAI
 from groq import Groq
 from authlib.integrations.flask_client import OAuth
 from dotenv import load_dotenv
+import pymongo
 from pymongo import MongoClient
-import aiml
+from pymongo.errors import ConnectionFailure, DuplicateKeyError
+from aiml_brain import AIMLBrain
+from jobs import JobQueue, QueueFull
+from image_pipeline import InvalidImage, prepare_data_url, prepare_file
+from health_prober import HealthProber
+from ollama_client import OllamaClient
+from db_indexes import ensure_indexes
+from session_cache import SessionCache
+from user_stats import chat_update, get_user_stats
+from write_behind import WriteBehind
+import analytics_rollup
+from pagination import InvalidCursor, fetch_page
+from topics import HEALTH_TOPICS
+from export_stream import EXPORTS, RENDERERS as EXPORT_RENDERERS, export_query, iter_rows, gzip_stream
+from llm_router import LLMRouter, Provider, AllProvidersFailed
+from response_cache import ResponseCache
+from semantic_cache import SemanticCache
+from translation_memory import TranslationMemory, Unverified
+from keyword_matcher import KeywordMatcher
+from knowledge_base import KnowledgeBase
 import google.generativeai as genai
-from PIL import Image
-import io
-import base64
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 FRONTEND_DIR = os.path.join(os.path.dirname(BASE_DIR), 'frontend')
@@ -49,6 +68,34 @@ feedback_col = db.feedback
 issues_col = db.issues # New collection for login issues
 error_logs_col = db.error_logs  # AI error tracking
 admin_logs_col = db.admin_logs  # Admin action tracking
+user_stats_col = db.user_stats  # Per-user chat stats, updated on every chat
+rollups_col = db.chat_rollups  # Hourly/daily analytics buckets
+jobs_col = db.jobs  # Background analysis jobs (see jobs.py)
+translations_col = db.translation_memory  # Translated strings (see translation_memory.py)
+
+# Create missing indexes in the background so an unreachable Mongo never
+# blocks startup; set MONGO_ENSURE_INDEXES=false to manage them by hand.
+if os.getenv("MONGO_ENSURE_INDEXES", "true").lower() in ("1", "true", "yes"):
+    threading.Thread(target=ensure_indexes, args=(db,), name="mongo-indexes", daemon=True).start()
+
+# Chats, AI error logs, admin logs and chat-derived counters are written in
+# batches off the request path; WRITE_BEHIND_ENABLED=false writes inline.
+write_behind = WriteBehind(
+    db,
+    max_batch=int(os.getenv("WRITE_BEHIND_BATCH", "500")),
+    flush_interval=float(os.getenv("WRITE_BEHIND_INTERVAL", "1.0")),
+    max_queue=int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "10000")),
+    spill_path=os.getenv("WRITE_BEHIND_SPILL", os.path.join(tempfile.gettempdir(), "wellbot_write_behind_spill.jsonl")),
+    replay_interval=float(os.getenv("WRITE_BEHIND_REPLAY_INTERVAL", "30")),
+    enabled=os.getenv("WRITE_BEHIND_ENABLED", "true").lower() in ("1", "true", "yes")
+)
+
+# token -> user cache so each admin call doesn't cost a Mongo round trip
+session_cache = SessionCache(
+    lambda token: users_col.find_one({"token": token}, {"_id": 0, "email": 1, "name": 1, "role": 1}),
+    maxsize=int(os.getenv("SESSION_CACHE_SIZE", "1000")),
+    ttl=float(os.getenv("SESSION_CACHE_TTL", "60"))
+)
 
 # Groq client
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
@@ -62,146 +109,458 @@ if GEMINI_API_KEY:
 else:
     gemini_model = None
 
-# Ollama setup
-OLLAMA_URL = "http://localhost:11434/api/generate"
+# Ollama setup - every call shares one keep-alive connection pool
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+OLLAMA_URL = f"{OLLAMA_HOST}/api/generate"
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")
 OLLAMA_VISION_MODEL = os.getenv("OLLAMA_VISION_MODEL", "llava")
-
-def ask_ollama(prompt):
-    payload = {"model": OLLAMA_MODEL, "prompt": prompt, "stream": False}
-    response = http_requests.post(OLLAMA_URL, json=payload, timeout=60)
-    response.raise_for_status()
-    return response.json()["response"]
-
-def ask_ollama_vision(prompt, image_base64):
-    payload = {
-        "model": OLLAMA_VISION_MODEL,
-        "prompt": prompt,
-        "stream": False,
-        "images": [image_base64]
-    }
-    response = http_requests.post(OLLAMA_URL, json=payload, timeout=120)
-    response.raise_for_status()
-    return response.json()["response"]
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "10"))
+OLLAMA_RETRIES = int(os.getenv("OLLAMA_RETRIES", "2"))
+ollama = OllamaClient(
+    OLLAMA_HOST,
+    pool_size=OLLAMA_POOL_SIZE,
+    retries=OLLAMA_RETRIES,
+    backoff=float(os.getenv("OLLAMA_RETRY_BACKOFF", "0.25")),
+    connect_timeout=float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "3.05")),
+    keep_alive=os.getenv("OLLAMA_KEEP_ALIVE") or None
+)
+# Open the first connection now rather than on the first chat
+threading.Thread(target=ollama.warm, name="ollama-warm", daemon=True).start()
+
+def ask_ollama(prompt, timeout=60):
+    return ollama.generate(OLLAMA_MODEL, prompt, timeout=timeout)
+
+def ask_ollama_vision(prompt, image_base64, timeout=120):
+    return ollama.generate(OLLAMA_VISION_MODEL, prompt, images=[image_base64], timeout=timeout)
+
+# Streaming variants - yield text chunks as soon as each provider emits them
+def stream_groq(prompt, max_tokens=200, timeout=None):
+    stream = client_groq.chat.completions.create(
+        model="llama-3.3-70b-versatile",
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=max_tokens,
+        stream=True,
+        timeout=timeout
+    )
+    for chunk in stream:
+        token = chunk.choices[0].delta.content if chunk.choices else None
+        if token:
+            yield token
+
+def stream_gemini(prompt, max_tokens=None, timeout=None):
+    request_options = {"timeout": timeout} if timeout else None
+    for chunk in gemini_model.generate_content(prompt, stream=True, request_options=request_options):
+        if chunk.text:
+            yield chunk.text
+
+def stream_ollama(prompt, max_tokens=None, timeout=60):
+    return ollama.stream(OLLAMA_MODEL, prompt, timeout=timeout)
 
 # OpenAI client
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 client_openai = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
 
-# Initialize AIML
-kernel = aiml.Kernel()
+# ============================================================
+# LLM PROVIDER ROUTER
+# ============================================================
+def groq_complete(prompt, system=None, max_tokens=200, timeout=None):
+    messages = [{"role": "system", "content": system}] if system else []
+    messages.append({"role": "user", "content": prompt})
+    res = client_groq.chat.completions.create(
+        model="llama-3.3-70b-versatile", messages=messages, max_tokens=max_tokens, timeout=timeout
+    )
+    return res.choices[0].message.content
+
+def gemini_complete(prompt, system=None, max_tokens=None, timeout=None):
+    request_options = {"timeout": timeout} if timeout else None
+    return gemini_model.generate_content(prompt, request_options=request_options).text
+
+def ollama_complete(prompt, system=None, max_tokens=None, timeout=60):
+    return ask_ollama(prompt, timeout=timeout)
+
+# Vision providers all take the same PreparedImage (see image_pipeline.py)
+def ollama_vision(prompt, image, timeout=120):
+    return ask_ollama_vision(prompt, image.b64, timeout=timeout)
+
+def groq_vision(prompt, image, timeout=None):
+    completion = client_groq.chat.completions.create(
+        model="llama-3.2-11b-vision-preview",
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {"type": "image_url", "image_url": {"url": image.data_url}},
+                ],
+            }
+        ],
+        max_tokens=1024,
+        timeout=timeout
+    )
+    return completion.choices[0].message.content
+
+def gemini_vision(prompt, image, timeout=None):
+    request_options = {"timeout": timeout} if timeout else None
+    return gemini_model.generate_content([prompt, image.blob], request_options=request_options).text
+
+def openai_vision(prompt, image, timeout=None):
+    response = client_openai.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {"type": "image_url", "image_url": {"url": image.data_url}}
+                ],
+            }
+        ],
+        max_tokens=500,
+        timeout=timeout
+    )
+    return response.choices[0].message.content
+
+def log_ai_error(model, error):
+    write_behind.insert("error_logs", {"model": model, "error": str(error), "timestamp": datetime.now()})
+
+def env_chain(name, default):
+    return [p.strip() for p in os.getenv(name, default).split(",") if p.strip()]
+
+# Provider priority, overridable per deployment, e.g. LLM_PROVIDER_ORDER="Ollama,Groq"
+TEXT_CHAIN = env_chain("LLM_PROVIDER_ORDER", "Groq,Gemini,Ollama")
+VISION_CHAIN = env_chain("LLM_VISION_ORDER", "Ollama-Vision,Groq-Vision,Gemini-Vision,OpenAI-Vision")
+TRANSLATE_CHAIN = ["Groq", "Gemini"]
+
+# Hedged text chat: race the top two providers of HEDGE_CHAIN, firing the
+# second one if the first has not answered within LLM_HEDGE_DELAY_MS. At most
+# LLM_HEDGE_WORKERS hedges run at once; past that requests just wait.
+HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+HEDGE_CHAIN = env_chain("LLM_HEDGE_ORDER", ",".join(TEXT_CHAIN))
+HEDGE_DELAY = int(os.getenv("LLM_HEDGE_DELAY_MS", "1500")) / 1000
+HEDGE_WORKERS = int(os.getenv("LLM_HEDGE_WORKERS", "8"))
+
+BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "3"))
+BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+
+router = LLMRouter(budget=float(os.getenv("LLM_REQUEST_BUDGET", "90")), on_error=log_ai_error,
+                   hedge_workers=HEDGE_WORKERS)
+
+def register_provider(name, call, stream=None, timeout=30):
+    router.register(Provider(
+        name, call, stream=stream, timeout=float(timeout),
+        failure_threshold=BREAKER_THRESHOLD, reset_timeout=BREAKER_RESET
+    ))
+
+if client_groq:
+    register_provider("Groq", groq_complete, stream_groq, os.getenv("GROQ_TIMEOUT", 20))
+    register_provider("Groq-Vision", groq_vision, timeout=os.getenv("GROQ_TIMEOUT", 20))
+if gemini_model:
+    register_provider("Gemini", gemini_complete, stream_gemini, os.getenv("GEMINI_TIMEOUT", 20))
+    register_provider("Gemini-Vision", gemini_vision, timeout=os.getenv("GEMINI_TIMEOUT", 20))
+register_provider("Ollama", ollama_complete, stream_ollama, os.getenv("OLLAMA_TIMEOUT", 60))
+register_provider("Ollama-Vision", ollama_vision, timeout=os.getenv("OLLAMA_VISION_TIMEOUT", 120))
+if client_openai:
+    register_provider("OpenAI-Vision", openai_vision, timeout=os.getenv("OPENAI_TIMEOUT", 30))
+
+# Exact-match cache for deterministic prompts (symptom checker, diet).
+# LLM_CACHE_SHARED=true adds a Mongo tier shared by every worker. Answers
+# from a fallback provider only live LLM_CACHE_FALLBACK_TTL seconds, so
+# full-quality answers come back soon after the primary recovers.
+LLM_CACHE_SHARED = os.getenv("LLM_CACHE_SHARED", "false").lower() in ("1", "true", "yes")
+response_cache = ResponseCache(
+    maxsize=int(os.getenv("LLM_CACHE_SIZE", "1000")),
+    ttl=int(os.getenv("LLM_CACHE_TTL", "86400")),
+    collection=db.llm_cache if LLM_CACHE_SHARED else None
+)
+LLM_CACHE_FALLBACK_TTL = int(os.getenv("LLM_CACHE_FALLBACK_TTL", "300"))
+
+def response_cache_ttl(chain, model):
+    """None (the cache's TTL) for the chain's first configured provider, else the fallback TTL."""
+    primary = next((name for name in chain if name in router.providers), None)
+    return None if model == primary else LLM_CACHE_FALLBACK_TTL
+
+def response_cache_key(namespace, chain, prompt, kwargs):
+    return ResponseCache.make_key(
+        namespace, f"{kwargs.get('system', '')}\n{prompt}", f"{','.join(chain)}:{kwargs.get('max_tokens')}"
+    )
+
+def cached_complete(namespace, chain, prompt, **kwargs):
+    """router.complete() behind the exact-match response cache.
+
+    The key covers the prompt, system message, token limit and provider
+    chain, so changing any of them never serves a stale answer.
+    """
+    key = response_cache_key(namespace, chain, prompt, kwargs)
+    cached = response_cache.get(key)
+    if cached:
+        return cached["reply"], cached["model"]
+    reply, model = router.complete(chain, prompt, **kwargs)
+    response_cache.set(key, {"reply": reply, "model": model}, namespace=namespace,
+                       ttl=response_cache_ttl(chain, model))
+    return reply, model
+
+# Vision analyses keyed on the prepared image's content hash plus the prompt,
+# so re-uploading the same report answers instantly. Mongo-backed by default
+# so every worker shares it; entries expire after VISION_CACHE_TTL seconds.
+VISION_CACHE_ENABLED = os.getenv("VISION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+VISION_CACHE_SHARED = os.getenv("VISION_CACHE_SHARED", "true").lower() in ("1", "true", "yes")
+vision_cache = ResponseCache(
+    maxsize=int(os.getenv("VISION_CACHE_SIZE", "200")),
+    ttl=int(os.getenv("VISION_CACHE_TTL", str(7 * 86400))),
+    collection=db.vision_cache if VISION_CACHE_SHARED else None
+)
+
+def vision_cache_key(image, prompt):
+    return ResponseCache.make_key("vision", f"{image.digest}\n{prompt}", ",".join(VISION_CHAIN))
+
+# Translations keyed on (source text hash, language): UI strings and repeated
+# bot phrases are translated once. The Mongo tier never expires, and
+# TRANSLATION_MEMORY_SHARED=false keeps the memory per process.
+TRANSLATION_MEMORY_SHARED = os.getenv("TRANSLATION_MEMORY_SHARED", "true").lower() in ("1", "true", "yes")
+TRANSLATE_BATCH_MAX_ITEMS = int(os.getenv("TRANSLATE_BATCH_MAX_ITEMS", "500"))
+TRANSLATE_BATCH_MAX_TOKENS = int(os.getenv("TRANSLATE_BATCH_MAX_TOKENS", "4096"))
+
+def save_translation(key, doc):
+    write_behind.update("translation_memory", {"_id": key}, {"$set": doc})
+
+translation_memory = TranslationMemory(
+    collection=translations_col if TRANSLATION_MEMORY_SHARED else None,
+    save=save_translation if TRANSLATION_MEMORY_SHARED else None,
+    maxsize=int(os.getenv("TRANSLATION_MEMORY_SIZE", "5000")),
+    max_items=int(os.getenv("TRANSLATE_BATCH_SIZE", "50")),
+    max_chars=int(os.getenv("TRANSLATE_BATCH_CHARS", "3000"))
+)
+
+# Semantic cache in front of the text-chat LLM chain: paraphrased questions
+# in the same mode/language/mood reuse a stored reply above the threshold.
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+semantic_cache = SemanticCache(
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85")),
+    max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", "500")),
+    ttl=int(os.getenv("SEMANTIC_CACHE_TTL", "86400"))
+)
+
+def semantic_partition(chat_mode, language, detected_mood):
+    # The mood is part of the LLM prompt, so replies are only shared within it
+    return (chat_mode, language, detected_mood)
+
+# Service health is probed in the background (model listings and pings, no
+# completions); /api/admin/system-health serves the latest results.
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "30"))
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "5"))
+health_prober = HealthProber(interval=HEALTH_PROBE_INTERVAL)
+
+def probe_mongo():
+    try:
+        # Bounds server selection too, not just the command
+        with pymongo.timeout(HEALTH_PROBE_TIMEOUT):
+            client_db.admin.command('ping')
+    except ConnectionFailure:
+        return False
+
+def probe_ollama():
+    models = ollama.models(timeout=HEALTH_PROBE_TIMEOUT)
+    if models is None:
+        return False
+    if OLLAMA_MODEL not in models and f"{OLLAMA_MODEL}:latest" not in models:
+        raise RuntimeError(f"Model {OLLAMA_MODEL} is not pulled")
+
+def providers_for(*names):
+    return [router.providers[name] for name in names if name in router.providers]
+
+# A probe only feeds the breaker of the provider whose model it checked.
+# Vision breakers are left to real traffic: no probe exercises those models.
+health_prober.add("MongoDB", "database", probe_mongo)
+if client_groq:
+    health_prober.add("Groq API", "bolt",
+                      lambda: client_groq.models.retrieve("llama-3.3-70b-versatile", timeout=HEALTH_PROBE_TIMEOUT),
+                      providers_for("Groq"))
+else:
+    health_prober.add("Groq API", "bolt")
+if gemini_model:
+    health_prober.add("Gemini API", "gem",
+                      lambda: genai.get_model(gemini_model.model_name, request_options={"timeout": HEALTH_PROBE_TIMEOUT}),
+                      providers_for("Gemini"))
+else:
+    health_prober.add("Gemini API", "gem")
+health_prober.add("Ollama (Local)", "server", probe_ollama, providers_for("Ollama"))
+if client_openai:
+    health_prober.add("OpenAI API", "brain", lambda: client_openai.models.list(timeout=HEALTH_PROBE_TIMEOUT))
+else:
+    health_prober.add("OpenAI API", "brain")
+if HEALTH_PROBE_INTERVAL > 0:
+    health_prober.start()
+
+# Long analyses (vision, symptom checker, diet) can run as background jobs:
+# send "async": true and poll /api/jobs/<id>. JOB_MAX_PENDING bounds the
+# backlog; past it the endpoints answer 503 straight away.
+JOB_TTL = int(os.getenv("JOB_TTL", "3600"))
+JOB_PERSIST_TIMEOUT = float(os.getenv("JOB_PERSIST_TIMEOUT", "2"))
+JOB_EVENTS_MAX_SECONDS = 600  # an event stream ends after this; clients re-subscribe or poll
+
+def persist_job(job):
+    """Write job state straight to Mongo so a poll on any worker sees it at once.
+
+    Guarded on `version`: a late write of an older state can't overwrite a
+    newer one (the upsert then hits the existing _id and is dropped).
+    """
+    fields = {k: v for k, v in job.items() if k != "id"}
+    fields["expires_at"] = job["updated_at"] + timedelta(seconds=JOB_TTL)
+    try:
+        with pymongo.timeout(JOB_PERSIST_TIMEOUT):
+            jobs_col.update_one({"_id": job["id"], "version": {"$lt": job["version"]}}, {"$set": fields}, upsert=True)
+    except DuplicateKeyError:
+        pass
+
+def lookup_job(job_id):
+    doc = jobs_col.find_one({"_id": job_id}, {"expires_at": 0})
+    if doc:
+        doc["id"] = doc.pop("_id")
+    return doc
+
+jobs = JobQueue(
+    workers=int(os.getenv("JOB_WORKERS", "4")),
+    max_pending=int(os.getenv("JOB_MAX_PENDING", "50")),
+    ttl=JOB_TTL,
+    persist=persist_job,
+    lookup=lookup_job
+)
+
+def wants_async(data):
+    return str(data.get('async', '')).lower() in ("1", "true", "yes")
+
+def enqueue_job(kind, fn, owner=None):
+    """(payload, status, headers): 202 with the new job's id, or 503 if the job queue is full."""
+    try:
+        job = jobs.submit(kind, fn, owner=owner)
+    except QueueFull:
+        return {"success": False, "error": "Too many analyses in progress. Please try again shortly."}, 503, {"Retry-After": "5"}
+    return {
+        "success": True, "job_id": job["id"], "status": job["status"],
+        "status_url": f"/api/jobs/{job['id']}"
+    }, 202, {}
+
+def submit_job(kind, fn, owner=None):
+    payload, status, headers = enqueue_job(kind, fn, owner)
+    return jsonify(payload), status, headers
+
+def token_email(token):
+    user = session_cache.get_user(token)
+    return user.get("email") if user else None
+
+def caller_email(data=None):
+    """Email of the signed-in caller from a `token` query arg or body field; None if anonymous."""
+    return token_email(request.args.get('token') or (data or {}).get('token'))
+
+def job_visible(job, email):
+    """Jobs submitted with a token belong to that user; anonymous ones only need the id."""
+    return job.get("owner") is None or job["owner"] == email
+
+def job_view(job):
+    return {k: job.get(k) for k in ("id", "kind", "status", "progress", "stage", "result", "error",
+                                    "version", "created_at", "updated_at", "finished_at")}
+
+# Initialize AIML from a compiled brain snapshot keyed on the file's hash.
+# AIML_WATCH_INTERVAL > 0 hot-reloads the kernel when wellness.aiml changes.
 aiml_path = os.path.join(BASE_DIR, "wellness.aiml")
-if os.path.exists(aiml_path):
-    kernel.learn(aiml_path)
+aiml_brain = AIMLBrain(aiml_path, os.getenv("AIML_BRAIN_DIR", os.path.join(BASE_DIR, "brain_cache")))
+kernel = aiml_brain.kernel
+AIML_WATCH_INTERVAL = float(os.getenv("AIML_WATCH_INTERVAL", "10"))
+if AIML_WATCH_INTERVAL > 0:
+    aiml_brain.start_watcher(AIML_WATCH_INTERVAL)
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
-def safety_check(message):
-    urgent_keywords = ["suicide", "self harm", "kill myself", "end my life"]
-    for word in urgent_keywords:
-        if word in message.lower():
-            return "I'm concerned about what you're sharing. Please reach out to a professional or a crisis helpline immediately."
+def safety_check(message, hits=None):
+    hits = classify_message(message) if hits is None else hits
+    if "crisis" in hits:
+        return "I'm concerned about what you're sharing. Please reach out to a professional or a crisis helpline immediately."
     return None
 
 # ============================================================
 # MEDICAL KNOWLEDGE BASE (WHO-aligned)
 # ============================================================
-MEDICAL_KB = {
-    "fever": {
-        "symptoms": ["high temperature", "chills", "sweating", "fatigue"],
-        "precautions": ["drink plenty of fluids", "rest", "take paracetamol if needed", "use a cool compress"],
-        "doctor": "If fever exceeds 103°F (39.4°C) or lasts more than 3 days",
-        "source": "WHO"
-    },
-    "cold": {
-        "symptoms": ["runny nose", "sneezing", "sore throat", "mild cough"],
-        "precautions": ["rest", "stay hydrated", "warm soups", "avoid cold air"],
-        "doctor": "If symptoms persist beyond 10 days or breathing becomes difficult",
-        "source": "WHO"
-    },
-    "cough": {
-        "symptoms": ["dry or wet cough", "chest discomfort", "throat irritation"],
-        "precautions": ["honey with warm water", "steam inhalation", "stay hydrated", "avoid smoke"],
-        "doctor": "If cough lasts more than 3 weeks or blood is present",
-        "source": "WHO"
-    },
-    "headache": {
-        "symptoms": ["pain in head or neck", "sensitivity to light", "nausea"],
-        "precautions": ["rest in a quiet dark room", "drink water", "mild pain reliever", "avoid screen time"],
-        "doctor": "If headache is sudden and severe or accompanied by vision changes",
-        "source": "WHO"
-    },
-    "stress": {
-        "symptoms": ["irritability", "fatigue", "difficulty concentrating", "muscle tension"],
-        "precautions": ["deep breathing exercises", "regular exercise", "adequate sleep", "limit caffeine"],
-        "doctor": "If stress interferes with daily functioning for more than 2 weeks",
-        "source": "WHO"
-    },
-    "anxiety": {
-        "symptoms": ["excessive worry", "rapid heartbeat", "shortness of breath", "restlessness"],
-        "precautions": ["mindfulness meditation", "regular physical activity", "limit caffeine", "talk to someone"],
-        "doctor": "If anxiety is severe, constant, or causing panic attacks",
-        "source": "WHO"
-    },
-    "diabetes": {
-        "symptoms": ["frequent urination", "excessive thirst", "blurred vision", "slow healing wounds"],
-        "precautions": ["healthy balanced diet", "regular exercise", "monitor blood sugar", "limit sugar intake"],
-        "doctor": "Consult regularly; seek immediate care if blood sugar is very high or low",
-        "source": "WHO"
-    },
-    "hypertension": {
-        "symptoms": ["headache", "dizziness", "shortness of breath", "nosebleeds"],
-        "precautions": ["low sodium diet", "regular exercise", "maintain healthy weight", "avoid smoking"],
-        "doctor": "If blood pressure is consistently above 140/90 mmHg",
-        "source": "WHO"
-    },
-    "fatigue": {
-        "symptoms": ["persistent tiredness", "lack of energy", "difficulty concentrating", "muscle weakness"],
-        "precautions": ["get 7-9 hours of sleep", "balanced diet", "regular light exercise", "stay hydrated"],
-        "doctor": "If fatigue is severe and unexplained for more than 2 weeks",
-        "source": "WHO"
-    },
-    "nausea": {
-        "symptoms": ["upset stomach", "urge to vomit", "dizziness", "loss of appetite"],
-        "precautions": ["eat small bland meals", "stay hydrated", "ginger tea", "avoid strong smells"],
-        "doctor": "If nausea is accompanied by severe abdominal pain or lasts more than 48 hours",
-        "source": "WHO"
-    }
-}
+# Conditions live in medical_kb.json; the file is re-indexed when it changes.
+knowledge_base = KnowledgeBase(
+    os.getenv("MEDICAL_KB_PATH", os.path.join(BASE_DIR, "medical_kb.json")),
+    reload_interval=float(os.getenv("KB_RELOAD_INTERVAL", "5"))
+)
+KB_TOP_K = int(os.getenv("KB_TOP_K", "3"))
+
+def get_kb_response(query, hits=None):
+    """Check Medical Knowledge Base for the best-scoring conditions.
 
-def get_kb_response(query):
-    """Check Medical Knowledge Base for a matching condition."""
-    q = query.lower()
-    for disease, data in MEDICAL_KB.items():
-        if disease in q or any(sym in q for sym in data["symptoms"]):
-            return (
-                f"📋 **{disease.title()} Information** *(Source: {data['source']})*\n\n"
-                f"**Common Symptoms:** {', '.join(data['symptoms'])}\n\n"
-                f"**Precautions:** {', '.join(data['precautions'])}\n\n"
-                f"**When to See a Doctor:** {data['doctor']}\n\n"
-                f"⚠️ This is general information only. Always consult a qualified healthcare professional."
-            ), disease, "kb"
-    return None, None, None
-
-def detect_intent(message):
+    Conditions are ranked by how many of their terms the message hits; the
+    top one is described in full and the runners-up are listed as related.
+    """
+    hits = classify_message(query) if hits is None else hits
+    matches = knowledge_base.rank(hits.get("kb", ()), top_k=KB_TOP_K)
+    if not matches:
+        return None, None, None
+    disease = matches[0][0]
+    data = knowledge_base.get(disease)
+    related = ""
+    if len(matches) > 1:
+        related = f"**Related Conditions:** {', '.join(name.title() for name, _, _ in matches[1:])}\n\n"
+    return (
+        f"📋 **{disease.title()} Information** *(Source: {data.get('source', 'WHO')})*\n\n"
+        f"**Common Symptoms:** {', '.join(data['symptoms'])}\n\n"
+        f"**Precautions:** {', '.join(data['precautions'])}\n\n"
+        f"**When to See a Doctor:** {data['doctor']}\n\n"
+        f"{related}"
+        f"⚠️ This is general information only. Always consult a qualified healthcare professional."
+    ), disease, "kb"
+
+def detect_intent(message, hits=None):
     """Classify the intent of a user message."""
-    msg = message.lower()
-    symptom_words = ["fever", "pain", "ache", "cough", "cold", "headache", "nausea", "vomit",
-                     "fatigue", "tired", "dizzy", "rash", "swelling", "bleed", "stress", "anxiety",
-                     "diabetes", "hypertension", "sneeze", "runny nose"]
-    mental_words = ["sad", "depressed", "lonely", "anxious", "worried", "mental", "emotion",
-                    "mood", "stress", "overwhelmed", "hopeless", "unhappy"]
-    nutrition_words = ["diet", "food", "nutrition", "calories", "vitamin", "protein", "carb",
-                       "weight", "bmi", "eat", "drink", "meal", "supplement"]
-    if any(w in msg for w in symptom_words):
-        return "symptom"
-    if any(w in msg for w in mental_words):
-        return "mental"
-    if any(w in msg for w in nutrition_words):
-        return "nutrition"
+    hits = classify_message(message) if hits is None else hits
+    for intent in ("symptom", "mental", "nutrition"):
+        if f"intent:{intent}" in hits:
+            return intent
     return "general"
 
+# ============================================================
+# MESSAGE CLASSIFIER
+# Every keyword list is compiled into one matcher at startup so a message is
+# scanned once and all categories (crisis, intent, mood, KB condition,
+# symptom-checker hint, health topic) come back together. Matching respects word
+# boundaries, so "pain" no longer fires on "painting".
+# ============================================================
+CRISIS_KEYWORDS = ["suicide", "self harm", "kill myself", "end my life"]
+SYMPTOM_WORDS = ["fever", "pain", "ache", "cough", "cold", "headache", "nausea", "vomit",
+                 "fatigue", "tired", "dizzy", "dizziness", "rash", "swelling", "bleed", "stress", "anxiety",
+                 "diabetes", "hypertension", "sneeze", "sneezing", "runny nose"]
+MENTAL_WORDS = ["sad", "depressed", "lonely", "anxious", "worried", "mental", "emotion", "emotional",
+                "mood", "stress", "overwhelmed", "hopeless", "unhappy"]
+NUTRITION_WORDS = ["diet", "food", "nutrition", "calorie", "calories", "vitamin", "protein", "carb",
+                   "carbohydrate", "weight", "bmi", "eat", "drink", "meal", "supplement"]
+CHECKER_KEYWORDS = ["fever", "cough", "headache", "pain", "sore throat", "nausea", "vomiting", "dizziness",
+                    "rash", "fatigue", "chest pain", "breathing"]
+NEGATIVE_WORDS = ["sad", "angry", "stressed", "unhappy", "pain", "bad", "depressed"]
+
+def build_message_matcher():
+    matcher = KeywordMatcher()
+    matcher.add("crisis", CRISIS_KEYWORDS)
+    matcher.add("intent:symptom", SYMPTOM_WORDS)
+    matcher.add("intent:mental", MENTAL_WORDS)
+    matcher.add("intent:nutrition", NUTRITION_WORDS)
+    matcher.add("suggest_checker", CHECKER_KEYWORDS)
+    matcher.add("mood:negative", NEGATIVE_WORDS)
+    matcher.add("topic", HEALTH_TOPICS)
+    matcher.add("kb", knowledge_base.terms())
+    return matcher.compile()
+
+message_matcher = build_message_matcher()
+
+def classify_message(message):
+    """Single pass over the message; returns {category: set(matched terms)}."""
+    global message_matcher
+    if knowledge_base.reload_if_changed():
+        # KB terms are part of the shared matcher, so rebuild and swap it
+        message_matcher = build_message_matcher()
+    return message_matcher.match(message)
+
 
 
 @app.route('/')
@@ -226,8 +585,7 @@ def chatbot_page():
 
 @app.route('/admin/dashboard')
 def admin_dashboard_page():
-    token = request.args.get('token')
-    if not token or not users_col.find_one({"token": token, "role": "admin"}):
+    if not admin_auth_check():
         return "<h1>Unauthorized</h1><p>You do not have permission to access this page.</p>", 403
     return send_from_directory(FRONTEND_DIR, 'admin_dashboard.html')
 
@@ -339,33 +697,44 @@ def report_issue():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+def user_stats_payload(stats):
+    moods = stats["mood_history"]
+
+    # Simple wellness tip based on most frequent mood
+    tip = "Stay hydrated and take a 5-minute walk today!"
+    if "Stressed" in moods or "Angry" in moods:
+        tip = "Try a 2-minute deep breathing exercise to reset."
+    elif "Tired" in moods:
+        tip = "Ensure you're getting at least 7-8 hours of sleep."
+
+    return {
+        "success": True,
+        "chat_count": stats["chat_count"],
+        "mood_history": moods,
+        "daily_tip": tip
+    }
+
 @app.route('/api/user_stats')
 def user_stats():
     email = request.args.get('email')
     if not email:
         return jsonify({"success": False, "error": "Email required"}), 400
     try:
-        chat_count = chats_col.count_documents({"user_email": email})
-        # Get mood history (last 10)
-        recent_chats = list(chats_col.find({"user_email": email}, {"mood": 1, "_id": 0}).sort("timestamp", -1).limit(10))
-        moods = [c['mood'] for c in recent_chats if 'mood' in c]
-        
-        # Simple wellness tip based on most frequent mood
-        tip = "Stay hydrated and take a 5-minute walk today!"
-        if "Stressed" in moods or "Angry" in moods:
-            tip = "Try a 2-minute deep breathing exercise to reset."
-        elif "Tired" in moods:
-            tip = "Ensure you're getting at least 7-8 hours of sleep."
-
-        return jsonify({
-            "success": True, 
-            "chat_count": chat_count,
-            "mood_history": moods,
-            "daily_tip": tip
-        })
+        # One primary-key read; save_chat keeps the document current
+        stats = get_user_stats(user_stats_col, email)
+        return jsonify(user_stats_payload(stats))
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+def translate_complete(prompt):
+    return router.complete(TRANSLATE_CHAIN, prompt, max_tokens=TRANSLATE_BATCH_MAX_TOKENS)
+
+TRANSLATE_UNAVAILABLE = {"success": False, "error": "No translation provider configured"}
+
+def translation_verified(translation):
+    # Plain-text fallback replies may be commentary; clients shouldn't keep them
+    return not isinstance(translation, Unverified)
+
 @app.route('/translate', methods=['POST'])
 def translate_api():
     data = request.json
@@ -374,73 +743,134 @@ def translate_api():
     
     if not text:
         return jsonify({"success": False, "error": "Text required"}), 400
-        
-    prompt = f"Translate the following healthcare-related text to {target_lang}. Return ONLY the translated text.\nText: {text}"
-    
+
+    # Echoing the English back as a "translation" would get cached by clients
+    if not router.has_any(TRANSLATE_CHAIN):
+        return jsonify(TRANSLATE_UNAVAILABLE), 503
+
     try:
         # Use Groq for fast translation if available, else Gemini
-        if client_groq:
-            res = client_groq.chat.completions.create(model="llama-3.3-70b-versatile", messages=[{"role": "user", "content": prompt}], max_tokens=500)
-            translated = res.choices[0].message.content
-        elif gemini_model:
-            response = gemini_model.generate_content(prompt)
-            translated = response.text
-        else:
-            translated = text # Fallback
-            
-        return jsonify({"success": True, "translated": translated.strip()})
+        translated = translation_memory.translate([text], target_lang, translate_complete)[0]
+        return jsonify({"success": True, "translated": translated.strip(), "verified": translation_verified(translated)})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+def translate_batch_payload(translations):
+    return {"success": True, "translations": translations, "verified": [translation_verified(t) for t in translations]}
+
+def translate_batch_texts(data):
+    """The `texts` list from a /translate/batch body, or (None, error)."""
+    texts = data.get('texts') if isinstance(data, dict) else None
+    if not isinstance(texts, list) or not texts or not all(isinstance(t, str) for t in texts):
+        return None, "texts must be a non-empty list of strings"
+    if len(texts) > TRANSLATE_BATCH_MAX_ITEMS:
+        return None, f"At most {TRANSLATE_BATCH_MAX_ITEMS} texts per request"
+    return texts, None
+
+@app.route('/translate/batch', methods=['POST'])
+def translate_batch_api():
+    """Translate many strings at once: {"texts": [...], "language": "Hindi"}.
+
+    Returns {"translations": [...], "verified": [...]} in the same order;
+    unverified items are plain-text replies that may not be translations.
+    Strings in the translation memory cost nothing; the rest share as few
+    LLM calls as possible.
+    """
+    data = request.get_json(silent=True) or {}
+    texts, error = translate_batch_texts(data)
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+    target_lang = data.get('language', 'English')
+    if not router.has_any(TRANSLATE_CHAIN):
+        return jsonify(TRANSLATE_UNAVAILABLE), 503
+
+    try:
+        translations = translation_memory.translate(texts, target_lang, translate_complete)
+        return jsonify(translate_batch_payload(translations))
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+CHAT_LOG_MAX_PAGE_SIZE = 200
+CHAT_LOG_FIELDS = {
+    "user_email", "user_name", "user_message", "bot_response", "mood", "mode", "language",
+    "has_image", "ai_model", "is_crisis", "intent", "response_source", "kb_match", "topics", "timestamp"
+}
+
+
+def parse_date(value):
+    """Accept YYYY-MM-DD or a full ISO timestamp."""
+    return datetime.fromisoformat(value)
+
+
+def chat_log_filter(args):
+    """Build a chats query from email/since/until/mode/ai_model/is_crisis params."""
+    query = {}
+    if args.get('email'):
+        query["user_email"] = args['email']
+    if args.get('since') or args.get('until'):
+        query["timestamp"] = {}
+        if args.get('since'):
+            query["timestamp"]["$gte"] = parse_date(args['since'])
+        if args.get('until'):
+            query["timestamp"]["$lt"] = parse_date(args['until'])
+    for field in ("mode", "ai_model", "language"):
+        if args.get(field):
+            query[field] = args[field]
+    if args.get('is_crisis'):
+        query["is_crisis"] = args['is_crisis'].lower() in ("1", "true", "yes")
+    return query
+
+
 @app.route('/api/admin/chat-logs')
 def admin_chat_logs():
-    token = request.args.get('token')
-    if not token or not users_col.find_one({"token": token, "role": "admin"}):
+    if not admin_auth_check():
         return jsonify({"success": False, "error": "Unauthorized"}), 401
     try:
-        logs = list(chats_col.find({}, {"_id": 0}).sort("timestamp", -1))
-        return jsonify({"success": True, "logs": logs})
+        limit = min(max(int(request.args.get('limit', 50)), 1), CHAT_LOG_MAX_PAGE_SIZE)
+        query = chat_log_filter(request.args)
+    except ValueError as e:
+        return jsonify({"success": False, "error": f"Invalid filter: {e}"}), 400
+    fields = [f for f in request.args.get('fields', '').split(',') if f]
+    unknown = set(fields) - CHAT_LOG_FIELDS
+    if unknown:
+        return jsonify({"success": False, "error": f"Unknown fields: {', '.join(sorted(unknown))}"}), 400
+    # timestamp is always returned; the next cursor is built from it
+    projection = dict.fromkeys(fields or CHAT_LOG_FIELDS, 1)
+    projection["timestamp"] = 1
+    try:
+        logs, next_cursor = fetch_page(chats_col, query, projection, limit, request.args.get('cursor'))
+        return jsonify({"success": True, "logs": logs, "next_cursor": next_cursor})
+    except InvalidCursor as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 @app.route('/api/admin/stats')
 def admin_stats():
-    token = request.args.get('token')
-    if not token or not users_col.find_one({"token": token, "role": "admin"}):
+    if not admin_auth_check():
         return jsonify({"success": False, "error": "Unauthorized"}), 401
     
     try:
         total_users = users_col.count_documents({})
-        total_chats = chats_col.count_documents({})
+        rollup = analytics_rollup.summary(rollups_col)
         all_feedback = list(feedback_col.find({}, {"_id": 0}))
         avg_rating = sum(f['rating'] for f in all_feedback) / len(all_feedback) if all_feedback else 0
         user_list = list(users_col.find({}, {"_id": 0, "password": 0, "token": 0}).sort("created_at", -1))
         reported_issues = list(issues_col.find({}, {"_id": 0}).sort("timestamp", -1))
         
-        activity_data = list(chats_col.aggregate([
-            {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}}, "count": {"$sum": 1}}},
-            {"$sort": {"_id": 1}}, {"$limit": 7}
-        ]))
-        
         return jsonify({
-            "success": True, "total_users": total_users, "total_questions": total_chats,
+            "success": True, "total_users": total_users, "total_questions": rollup["total"],
             "avg_rating": round(avg_rating, 1), "recent_feedback": all_feedback[-5:],
-            "user_list": user_list, "activity_data": activity_data,
+            "user_list": user_list, "activity_data": rollup["daily"],
             "reported_issues": reported_issues
         })
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/symptom_checker', methods=['POST'])
-def symptom_checker():
-    data = request.json
-    symptom = data.get('symptom', '')
-    language = data.get('language', 'English')
+SYMPTOM_SYSTEM = "You are a helpful medical assistant. Provide clear, structured health guidance."
 
-    if not symptom:
-        return jsonify({"success": False, "error": "Please describe your symptoms."}), 400
-
-    prompt = f"""
+def symptom_prompt(symptom, language):
+    return f"""
     A user reports the following symptoms:
 
     {symptom}
@@ -454,49 +884,33 @@ def symptom_checker():
     ⚠️ Disclaimer: This is NOT a medical diagnosis. Always consult a qualified healthcare professional for proper evaluation and treatment.
     """
 
-    result = None
-
-    # Priority 1: Groq
-    if client_groq:
-        try:
-            res = client_groq.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[
-                    {"role": "system", "content": "You are a helpful medical assistant. Provide clear, structured health guidance."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=600
-            )
-            result = res.choices[0].message.content
-        except Exception as e:
-            print(f"Groq Symptom Checker Error: {e}")
-
-    # Priority 2: Gemini
-    if result is None and gemini_model:
-        try:
-            response = gemini_model.generate_content(prompt)
-            result = response.text
-        except Exception as e:
-            print(f"Gemini Symptom Checker Error: {e}")
-
-    # Priority 3: Ollama
-    if result is None:
-        try:
-            result = ask_ollama(prompt)
-        except Exception as e:
-            print(f"Ollama Symptom Checker Error: {e}")
-            result = "Unable to analyze symptoms at this time. Please try again later."
-
-    return jsonify({"success": True, "result": result})
-    
-
-@app.route('/api/diet-recommendation', methods=['POST'])
-def diet_recommendation():
+@app.route('/symptom_checker', methods=['POST'])
+def symptom_checker():
     data = request.json
-    goal = data.get('goal', 'Balanced diet')
+    symptom = data.get('symptom', '').strip()
     language = data.get('language', 'English')
 
-    prompt = f"""
+    if not symptom:
+        return jsonify({"success": False, "error": "Please describe your symptoms."}), 400
+
+    if wants_async(data):
+        return submit_job("symptom", lambda report: symptom_result(symptom, language), caller_email(data))
+    return jsonify(symptom_result(symptom, language))
+
+def symptom_result(symptom, language):
+    try:
+        result, _ = cached_complete(
+            "symptom", TEXT_CHAIN, symptom_prompt(symptom, language), max_tokens=600, system=SYMPTOM_SYSTEM
+        )
+    except AllProvidersFailed as e:
+        print(f"Symptom Checker Error: {e}")
+        result = "Unable to analyze symptoms at this time. Please try again later."
+    return {"success": True, "result": result}
+
+DIET_SYSTEM = "You are a professional nutritionist expert. Provide clear, structured healthy diet advice."
+
+def diet_prompt(goal, language):
+    return f"""
     The user has the following health goal: {goal}
 
     Based on this goal, suggest a healthy, daily diet plan in {language}.
@@ -511,257 +925,400 @@ def diet_recommendation():
     Respond in {language}.
     """
 
-    result = None
-
-    # Priority 1: Groq
-    if client_groq:
-        try:
-            res = client_groq.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[
-                    {"role": "system", "content": "You are a professional nutritionist expert. Provide clear, structured healthy diet advice."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=600
-            )
-            result = res.choices[0].message.content
-        except Exception as e:
-            print(f"Groq Diet Error: {e}")
-
-    # Priority 2: Gemini
-    if result is None and gemini_model:
-        try:
-            response = gemini_model.generate_content(prompt)
-            result = response.text
-        except Exception as e:
-            print(f"Gemini Diet Error: {e}")
+@app.route('/api/diet-recommendation', methods=['POST'])
+def diet_recommendation():
+    data = request.json
+    goal = data.get('goal', 'Balanced diet').strip()
+    language = data.get('language', 'English')
 
-    # Priority 3: Ollama
-    if result is None:
-        try:
-            result = ask_ollama(prompt)
-        except Exception as e:
-            print(f"Ollama Diet Error: {e}")
-            result = "Unable to generate diet recommendations at this time."
+    if wants_async(data):
+        return submit_job("diet", lambda report: diet_result(goal, language), caller_email(data))
+    return jsonify(diet_result(goal, language))
 
-    return jsonify({"success": True, "recommendation": result})
+def diet_result(goal, language):
+    try:
+        result, _ = cached_complete("diet", TEXT_CHAIN, diet_prompt(goal, language), max_tokens=600, system=DIET_SYSTEM)
+    except AllProvidersFailed as e:
+        print(f"Diet Error: {e}")
+        result = "Unable to generate diet recommendations at this time."
+    return {"success": True, "recommendation": result}
+
+
+def should_suggest_checker(message, hits=None):
+    """Symptom keyword detection - suggest symptom checker."""
+    hits = classify_message(message) if hits is None else hits
+    return "suggest_checker" in hits
+
+def detect_mood(message, user_mood, hits=None):
+    """AI Mood Detection (Simple sentiment override)."""
+    hits = classify_message(message) if hits is None else hits
+    if "mood:negative" in hits:
+        return "Concerned"
+    return user_mood
+
+def build_chat_prompt(user_message, chat_mode, detected_mood, language):
+    """Build the mode-specific LLM prompt for a text chat message."""
+    system_prompt = "You are an empathetic wellness assistant named WellBot."
+    if chat_mode == "mental":
+        system_prompt = "You are a supportive mental health assistant. Focus on emotional well-being and listening."
+    elif chat_mode == "nutrition":
+        system_prompt = "You are a professional nutrition expert. Focus on diet, vitamins, and healthy eating habits."
+    elif chat_mode == "fitness":
+        system_prompt = "You are an energetic fitness coach. Focus on exercise, movement, and physical strength."
+    return f"{system_prompt} The user's mood is {detected_mood}. User prefers {language}. Respond in {language}. User says: {user_message}. Keep under 100 words."
+
+VISION_PROMPT = "You are a professional medical assistant. Thoroughly read and analyze the provided medical document, lab report, or prescription image. Extract all key information including test names, results, reference ranges, diagnoses, medications, dosages, and any instructions or doctor's notes mentioned. Provide a comprehensive summary of the findings in easy-to-understand language. Read all the text in the report carefully. User message: "
+CONNECTION_TROUBLE = "I'm having trouble connecting right now."
+INVALID_IMAGE_REPLY = "I couldn't read that image. Please upload a JPEG, PNG or WebP photo of the document."
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "1600"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+UPLOAD_MAX_BYTES = int(float(os.getenv("UPLOAD_MAX_MB", "15")) * 1024 * 1024)
+
+def prepare_upload(image_data):
+    """Decode, validate and shrink an uploaded image once for the whole vision chain."""
+    return prepare_data_url(image_data, max_side=IMAGE_MAX_SIDE, quality=IMAGE_JPEG_QUALITY, max_bytes=UPLOAD_MAX_BYTES)
+
+def prepare_upload_file(fileobj):
+    return prepare_file(fileobj, max_side=IMAGE_MAX_SIDE, quality=IMAGE_JPEG_QUALITY, max_bytes=UPLOAD_MAX_BYTES)
+
+def local_reply(user_message, hits, partition):
+    """Answer without an LLM if possible: AIML, then the KB, then the semantic cache.
+
+    Returns (reply, ai_model, response_source, kb_match); reply is None when
+    the message has to go to an LLM.
+    """
+    aiml_response = aiml_brain.respond(user_message.upper())
+    if aiml_response:
+        return aiml_response, "AIML", "aiml", None
+    kb_reply, kb_match, kb_source = get_kb_response(user_message, hits)
+    if kb_reply:
+        return kb_reply, "KB", kb_source, kb_match
+    cached = semantic_cache.lookup(user_message, partition)[0] if SEMANTIC_CACHE_ENABLED else None
+    if cached:
+        return cached["reply"], cached["model"], "cache", kb_match
+    return None, "None", "llm", kb_match
+
+def save_chat(user_email, user_name, user_message, bot_reply, detected_mood, chat_mode, language,
+              ai_model_used, intent, response_source, kb_match, has_image=False, is_crisis=None, topics=None):
+    """Store a chat turn with intent, source and kb_match for admin monitoring."""
+    # Check for crisis content and flag it
+    if is_crisis is None:
+        is_crisis = safety_check(user_message) is not None
+    chat_doc = {
+        "user_email": user_email, "user_name": user_name,
+        "user_message": user_message, "bot_response": bot_reply,
+        "mood": detected_mood, "mode": chat_mode, "language": language,
+        "has_image": has_image, "ai_model": ai_model_used,
+        "is_crisis": is_crisis,
+        "intent": intent if not has_image else "prescription",
+        "response_source": response_source if not has_image or response_source == "vision_cache" else "vision",
+        "kb_match": kb_match,
+        "topics": sorted(topics or []),
+        "timestamp": datetime.now()
+    }
+    write_behind.insert("chats", chat_doc)
+    write_behind.update("user_stats", {"_id": user_email}, chat_update(chat_doc))
+    for bucket, update in analytics_rollup.chat_updates(chat_doc):
+        write_behind.update("chat_rollups", bucket, update)
 
 
 @app.route('/chat', methods=['POST'])
 def chat():
     data = request.json
-    user_message = data.get('message', '')
-    user_mood = data.get('mood', 'Neutral')
-    user_email = data.get('email', 'Anonymous')
-    user_name = data.get('name', 'Guest')
-    language = data.get('language', 'English')
-    chat_mode = data.get('mode', 'wellness')
     image_data = data.get('image') # Base64 image data
+    return chat_response(data, (lambda: prepare_upload(image_data)) if image_data else None)
+
+
+UPLOAD_FIELDS = ("message", "mood", "email", "name", "language", "mode", "async", "token")
+UPLOAD_FORM_OVERHEAD = 64 * 1024  # multipart boundaries and the text fields
+UPLOAD_SPOOL_BYTES = 1024 * 1024  # bodies above this spill from memory to a temp file
+
+def spool_body(stream, limit, chunk_size=64 * 1024):
+    """Copy a request body into a spooled temp file; None once it passes `limit` bytes."""
+    spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+    total = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return spool
+        total += len(chunk)
+        if total > limit:
+            spool.close()
+            return None
+        spool.write(chunk)
+
+@app.route('/chat/upload', methods=['POST'])
+def chat_upload():
+    """Image chat without base64-in-JSON.
+
+    Either multipart/form-data with an `image` file part and the /chat fields
+    as form fields, or the raw image as the body (Content-Type: image/*)
+    with the fields in the query string. Oversized bodies are refused from
+    Content-Length before anything is read. The image is streamed to a
+    spooled temp file and read from there by the vision pipeline.
+    """
+    too_large = jsonify({"reply": f"Images must be under {UPLOAD_MAX_BYTES // (1024 * 1024)} MB."}), 413
+    if request.content_length is not None and request.content_length > UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD:
+        return too_large
+
+    if request.mimetype == "multipart/form-data":
+        # Werkzeug spools file parts to disk; the cap also covers bodies without a Content-Length
+        request.max_content_length = UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD
+        try:
+            upload = request.files.get("image")
+            data = {f: request.form[f] for f in UPLOAD_FIELDS if f in request.form}
+        except RequestEntityTooLarge:
+            return too_large
+        spool = upload.stream if upload and upload.filename else None
+    elif request.mimetype.startswith("image/") or request.mimetype == "application/octet-stream":
+        spool = spool_body(request.stream, UPLOAD_MAX_BYTES)
+        if spool is None:
+            return too_large
+        data = {f: request.args[f] for f in UPLOAD_FIELDS if f in request.args}
+    else:
+        return jsonify({"success": False, "error": "Send multipart/form-data or an image/* body."}), 415
 
-    # Symptom keyword detection - suggest symptom checker
-    symptom_keywords = ["fever", "cough", "headache", "pain", "sore throat", "nausea", "vomiting", "dizziness", "rash", "fatigue", "chest pain", "breathing"]
-    suggest_checker = any(kw in user_message.lower() for kw in symptom_keywords)
+    if spool is None:
+        return jsonify({"success": False, "error": "Image required"}), 400
+    try:
+        return chat_response(data, lambda: prepare_upload_file(spool))
+    finally:
+        spool.close()
 
-    # AI Mood Detection (Simple sentiment override)
-    detected_mood = user_mood
-    negative_words = ["sad", "angry", "stressed", "unhappy", "pain", "bad", "depressed"]
-    if any(word in user_message.lower() for word in negative_words):
-        detected_mood = "Concerned"
 
-    # Defaults for intent tracking (overridden in text chat branch)
-    intent = "general"
-    kb_match = None
-    response_source = "llm"
+def chat_context(data):
+    """Request fields and classifier results shared by every chat route."""
+    user_message = data.get('message', '')
+    hits = classify_message(user_message)
+    return {
+        "user_message": user_message,
+        "user_email": data.get('email', 'Anonymous'),
+        "user_name": data.get('name', 'Guest'),
+        "language": data.get('language', 'English'),
+        "chat_mode": data.get('mode', 'wellness'),
+        "hits": hits,
+        "suggest_checker": should_suggest_checker(user_message, hits),
+        "detected_mood": detect_mood(user_message, data.get('mood', 'Neutral'), hits)
+    }
 
+def finish_chat(ctx, bot_reply, ai_model_used, response_source, intent="general", kb_match=None, has_image=False):
+    """Save a chat turn and build the /chat response body."""
+    save_chat(
+        ctx["user_email"], ctx["user_name"], ctx["user_message"], bot_reply, ctx["detected_mood"], ctx["chat_mode"],
+        ctx["language"], ai_model_used, intent, response_source, kb_match, has_image=has_image,
+        is_crisis="crisis" in ctx["hits"], topics=ctx["hits"].get("topic")
+    )
+    return {"reply": bot_reply, "suggest_symptom_checker": ctx["suggest_checker"], "source": response_source}
+
+def text_chat_start(ctx):
+    """(intent, semantic partition, local_reply() result) for a text chat message."""
+    intent = detect_intent(ctx["user_message"], ctx["hits"])
+    partition = semantic_partition(ctx["chat_mode"], ctx["language"], ctx["detected_mood"])
+    return intent, partition, local_reply(ctx["user_message"], ctx["hits"], partition)
+
+def remember_reply(user_message, partition, bot_reply, ai_model_used):
+    if SEMANTIC_CACHE_ENABLED:
+        semantic_cache.store(user_message, partition, {"reply": bot_reply, "model": ai_model_used})
+
+def vision_job(ctx, image):
+    """Job function for an async image chat."""
+    def analyze(report):
+        report(0.2, "analyzing image")
+        return finish_chat(ctx, *vision_reply(image, ctx["user_message"]), has_image=True)
+    return analyze
+
+def chat_response(data, load_image=None):
+    """Shared body of /chat and /chat/upload.
+
+    `load_image()` returns the PreparedImage (or raises InvalidImage). It is
+    only called after the safety check, so a crisis message is answered even
+    when its image is unreadable.
+    """
+    ctx = chat_context(data)
+    user_message, hits = ctx["user_message"], ctx["hits"]
 
-    warning = safety_check(user_message)
+    warning = safety_check(user_message, hits)
     if warning: return jsonify({"reply": warning})
 
-    try:
-        ai_model_used = "Unknown"
+    image = None
+    if load_image:
+        try:
+            image = load_image()
+        except InvalidImage as e:
+            print(f"Invalid Image: {e}")
+            return jsonify({"reply": INVALID_IMAGE_REPLY}), 400
 
+    if image is not None and wants_async(data):
+        return submit_job("vision", vision_job(ctx, image), caller_email(data))
+
+    try:
         # Check for image (Vision Analysis)
-        if image_data:
-            response_source = "vision"
-            # Priority 1: Ollama Vision (LLaVA/Molmo)
+        if image:
+            return jsonify(finish_chat(ctx, *vision_reply(image, user_message), has_image=True))
+
+        # Normal text chat: AIML, Medical Knowledge Base, semantic cache, then LLM
+        intent, partition, local = text_chat_start(ctx)
+        bot_reply, ai_model_used, response_source, kb_match = local
+        if bot_reply is None:
+            full_prompt = build_chat_prompt(user_message, ctx["chat_mode"], ctx["detected_mood"], ctx["language"])
             try:
-                temp_image_data = image_data
-                if "," in temp_image_data:
-                    temp_image_data = temp_image_data.split(",")[1]
-                
-                vision_prompt = "You are a professional medical assistant. Thoroughly read and analyze the provided medical document, lab report, or prescription image. Extract all key information including test names, results, reference ranges, diagnoses, medications, dosages, and any instructions or doctor's notes mentioned. Provide a comprehensive summary of the findings in easy-to-understand language. Read all the text in the report carefully. User message: " + user_message
-                bot_reply = ask_ollama_vision(vision_prompt, temp_image_data)
-                ai_model_used = "Ollama-Vision"
-            except Exception as e:
-                print(f"Ollama Vision Error: {e}")
-                error_logs_col.insert_one({"model": "Ollama-Vision", "error": str(e), "timestamp": datetime.now()})
-                bot_reply = None
-
-            # Priority 2: Groq Vision
-            if bot_reply is None and client_groq:
-                try:
-                    temp_image_data = image_data
-                    if "," in temp_image_data:
-                        temp_image_data = temp_image_data.split(",")[1]
-                    
-                    vision_prompt = "You are a professional medical assistant. Thoroughly read and analyze the provided medical document, lab report, or prescription image. Extract all key information including test names, results, reference ranges, diagnoses, medications, dosages, and any instructions or doctor's notes mentioned. Provide a comprehensive summary of the findings in easy-to-understand language. Read all the text in the report carefully. User message: " + user_message
-                    
-                    completion = client_groq.chat.completions.create(
-                        model="llama-3.2-11b-vision-preview",
-                        messages=[
-                            {
-                                "role": "user",
-                                "content": [
-                                    {"type": "text", "text": vision_prompt},
-                                    {
-                                        "type": "image_url",
-                                        "image_url": {
-                                            "url": f"data:image/jpeg;base64,{temp_image_data}",
-                                        },
-                                    },
-                                ],
-                            }
-                        ],
-                        max_tokens=1024,
-                    )
-                    bot_reply = completion.choices[0].message.content
-                    ai_model_used = "Groq-Vision"
-                except Exception as e:
-                    print(f"Groq Vision Error: {e}")
-                    error_logs_col.insert_one({"model": "Groq-Vision", "error": str(e), "timestamp": datetime.now()})
-                    bot_reply = None
-
-            # Priority 3: Gemini Vision (Fallback)
-            if bot_reply is None and gemini_model:
-                try:
-                    if "," in image_data:
-                        image_data = image_data.split(",")[1]
-                    img_bytes = base64.b64decode(image_data)
-                    img = Image.open(io.BytesIO(img_bytes))
-                    vision_prompt = "You are a professional medical assistant. Thoroughly read and analyze the provided medical document, lab report, or prescription image. Extract all key information including test names, results, reference ranges, diagnoses, medications, dosages, and any instructions or doctor's notes mentioned. Provide a comprehensive summary of the findings in easy-to-understand language. Read all the text in the report carefully. User message: " + user_message
-                    response = gemini_model.generate_content([vision_prompt, img])
-                    bot_reply = response.text
-                    ai_model_used = "Gemini-Vision"
-                except Exception as e:
-                    print(f"Gemini Vision Error: {e}")
-                    error_logs_col.insert_one({"model": "Gemini-Vision", "error": str(e), "timestamp": datetime.now()})
-
-            # Priority 4: OpenAI Vision (Fallback)
-            if bot_reply is None and client_openai:
-                try:
-                    vision_prompt = "You are a professional medical assistant. Thoroughly read and analyze the provided medical document, lab report, or prescription image. Extract all key information including test names, results, reference ranges, diagnoses, medications, dosages, and any instructions or doctor's notes mentioned. Provide a comprehensive summary of the findings in easy-to-understand language. Read all the text in the report carefully. User message: " + user_message
-                    response = client_openai.chat.completions.create(
-                        model="gpt-4o-mini",
-                        messages=[
-                            {
-                                "role": "user",
-                                "content": [
-                                    {"type": "text", "text": vision_prompt},
-                                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_data}"}}
-                                ],
-                            }
-                        ],
-                        max_tokens=500,
-                    )
-                    bot_reply = response.choices[0].message.content
-                    ai_model_used = "OpenAI-Vision"
-                except Exception as e:
-                    error_logs_col.insert_one({"model": "OpenAI-Vision", "error": str(e), "timestamp": datetime.now()})
-
-            if bot_reply is None:
-                bot_reply = "Vision features are currently unavailable."
-                ai_model_used = "None"
-        else:
-            # Detect intent
-            intent = detect_intent(user_message)
-            kb_match = None
-            response_source = "llm"
-
-            # Normal text chat — try AIML first
-            aiml_response = kernel.respond(user_message.upper())
-            if aiml_response:
-                bot_reply = aiml_response
-                ai_model_used = "AIML"
-                response_source = "aiml"
-            else:
-                # Try Medical Knowledge Base before LLM
-                kb_reply, kb_match, response_source = get_kb_response(user_message)
-                if kb_reply:
-                    bot_reply = kb_reply
-                    ai_model_used = "KB"
+                if HEDGE_ENABLED:
+                    bot_reply, ai_model_used = router.hedged_complete(HEDGE_CHAIN, full_prompt, delay=HEDGE_DELAY, max_tokens=200)
                 else:
-                    response_source = "llm"
-                    system_prompt = "You are an empathetic wellness assistant named WellBot."
-                    if chat_mode == "mental":
-                        system_prompt = "You are a supportive mental health assistant. Focus on emotional well-being and listening."
-                    elif chat_mode == "nutrition":
-                        system_prompt = "You are a professional nutrition expert. Focus on diet, vitamins, and healthy eating habits."
-                    elif chat_mode == "fitness":
-                        system_prompt = "You are an energetic fitness coach. Focus on exercise, movement, and physical strength."
-
-                    full_prompt = f"{system_prompt} The user's mood is {detected_mood}. User prefers {language}. Respond in {language}. User says: {user_message}. Keep under 100 words."
-                    bot_reply = None
-
-                    if client_groq:
-                        try:
-                            res = client_groq.chat.completions.create(model="llama-3.3-70b-versatile", messages=[{"role": "user", "content": full_prompt}], max_tokens=200)
-                            bot_reply = res.choices[0].message.content
-                            ai_model_used = "Groq"
-                        except Exception as e:
-                            print(f"Groq Chat Error: {e}")
-                            error_logs_col.insert_one({"model": "Groq", "error": str(e), "timestamp": datetime.now()})
-
-                    # Priority 2: Gemini
-                    if bot_reply is None and gemini_model:
-                        try:
-                            response = gemini_model.generate_content(full_prompt)
-                            bot_reply = response.text
-                            ai_model_used = "Gemini"
-                        except Exception as e:
-                            print(f"Gemini Error: {e}")
-                            error_logs_col.insert_one({"model": "Gemini", "error": str(e), "timestamp": datetime.now()})
-
-                    # Priority 3: Ollama
-                    if bot_reply is None:
-                        try:
-                            bot_reply = ask_ollama(full_prompt)
-                            ai_model_used = "Ollama"
-                        except Exception as e:
-                            error_logs_col.insert_one({"model": "Ollama", "error": str(e), "timestamp": datetime.now()})
-                            bot_reply = "I'm having trouble connecting right now."
-                            ai_model_used = "None"
-
-        # Check for crisis content and flag it
-        is_crisis = safety_check(user_message) is not None
+                    bot_reply, ai_model_used = router.complete(TEXT_CHAIN, full_prompt, max_tokens=200)
+                remember_reply(user_message, partition, bot_reply, ai_model_used)
+            except AllProvidersFailed:
+                bot_reply = CONNECTION_TROUBLE
+                ai_model_used = "None"
 
-        # Store intent, source, kb_match for admin monitoring
-        chats_col.insert_one({
-            "user_email": user_email, "user_name": user_name,
-            "user_message": user_message, "bot_response": bot_reply,
-            "mood": detected_mood, "mode": chat_mode, "language": language,
-            "has_image": bool(image_data), "ai_model": ai_model_used,
-            "is_crisis": is_crisis,
-            "intent": intent if not image_data else "prescription",
-            "response_source": response_source if not image_data else "vision",
-            "kb_match": kb_match,
-            "timestamp": datetime.now()
-        })
-        return jsonify({"reply": bot_reply, "suggest_symptom_checker": suggest_checker, "source": response_source if not image_data else "vision"})
+        return jsonify(finish_chat(ctx, bot_reply, ai_model_used, response_source, intent, kb_match))
     except Exception as e:
         print("Chat Error:", e)
         return jsonify({"reply": "Server error."}), 500
 
 
+VISION_UNAVAILABLE = "Vision features are currently unavailable."
+
+def vision_lookup(image, user_message):
+    """(prompt, cache key, cached (reply, ai_model, response_source) or None) for an image chat."""
+    vision_prompt = VISION_PROMPT + user_message
+    key = vision_cache_key(image, vision_prompt)
+    cached = vision_cache.get(key) if VISION_CACHE_ENABLED else None
+    if cached:
+        return vision_prompt, key, (cached["reply"], cached["model"], "vision_cache")
+    return vision_prompt, key, None
+
+def vision_store(key, bot_reply, ai_model_used):
+    if VISION_CACHE_ENABLED:
+        vision_cache.set(key, {"reply": bot_reply, "model": ai_model_used}, namespace="vision",
+                         ttl=response_cache_ttl(VISION_CHAIN, ai_model_used))
+
+def vision_reply(image, user_message):
+    """(reply, ai_model, response_source) for an image, from the vision cache if possible."""
+    vision_prompt, key, cached = vision_lookup(image, user_message)
+    if cached:
+        return cached
+    try:
+        bot_reply, ai_model_used = router.complete(VISION_CHAIN, vision_prompt, image)
+    except AllProvidersFailed:
+        return VISION_UNAVAILABLE, "None", "vision"
+    vision_store(key, bot_reply, ai_model_used)
+    return bot_reply, ai_model_used, "vision"
+
+
+def sse_event(payload, event=None):
+    """Format a payload as a Server-Sent Events frame."""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json_module.dumps(payload, default=str)}\n\n"
+
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Text chat over Server-Sent Events.
+
+    Emits `data: {"token": ...}` frames as the provider produces them and a
+    final `event: done` frame carrying the full reply. The assembled reply is
+    stored in chats_col once the stream finishes. Images still go through /chat.
+    """
+    data = request.json or {}
+    if data.get('image'):
+        return jsonify({"success": False, "error": "Use /chat for image analysis."}), 400
+
+    ctx = chat_context(data)
+    user_message, hits = ctx["user_message"], ctx["hits"]
+
+    def generate():
+        warning = safety_check(user_message, hits)
+        if warning:
+            yield sse_event({"token": warning})
+            yield sse_event({"reply": warning, "source": "safety"}, event="done")
+            return
+
+        intent, partition, local = text_chat_start(ctx)
+        bot_reply, ai_model_used, response_source, kb_match = local
+
+        if bot_reply is not None:
+            yield sse_event({"token": bot_reply})
+        else:
+            full_prompt = build_chat_prompt(user_message, ctx["chat_mode"], ctx["detected_mood"], ctx["language"])
+            chunks = []
+            failed = False
+            try:
+                for name, token in router.stream(TEXT_CHAIN, full_prompt, max_tokens=200):
+                    ai_model_used = name
+                    chunks.append(token)
+                    yield sse_event({"token": token})
+            except AllProvidersFailed as e:
+                print(f"Chat Stream Error: {e}")
+                failed = True
+
+            bot_reply = "".join(chunks)
+            if not bot_reply:
+                bot_reply = CONNECTION_TROUBLE
+                yield sse_event({"token": bot_reply})
+            elif not failed:
+                remember_reply(user_message, partition, bot_reply, ai_model_used)
+
+        try:
+            done = finish_chat(ctx, bot_reply, ai_model_used, response_source, intent, kb_match)
+        except Exception as e:
+            print("Chat Stream Save Error:", e)
+            done = {"reply": bot_reply, "suggest_symptom_checker": ctx["suggest_checker"], "source": response_source}
+        yield sse_event(done, event="done")
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    job = jobs.get(job_id)
+    # Someone else's job looks the same as a missing one
+    if not job or not job_visible(job, caller_email()):
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify({"success": True, "job": job_view(job)})
+
+
+@app.route('/api/jobs/<job_id>/events')
+def job_events(job_id):
+    """Server-Sent Events for one job: a `progress` frame per change, then `done`."""
+    job = jobs.get(job_id)
+    if not job or not job_visible(job, caller_email()):
+        return jsonify({"success": False, "error": "Job not found"}), 404
+
+    def generate():
+        version = -1
+        deadline = time.monotonic() + JOB_EVENTS_MAX_SECONDS
+        while time.monotonic() < deadline:
+            job = jobs.wait(job_id, version, timeout=15)
+            if job is None:
+                yield sse_event({"error": "Job not found"}, event="error")
+                return
+            if job["status"] in ("done", "failed"):
+                yield sse_event(job_view(job), event="done")
+                return
+            if job["version"] > version:
+                version = job["version"]
+                yield sse_event(job_view(job), event="progress")
+            else:
+                yield ": keep-alive\n\n"
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+
 # ==========================================
 # ADMIN API ENDPOINTS - Enterprise Dashboard
 # ==========================================
 
 def admin_auth_check():
     """Helper to verify admin token from query params."""
-    token = request.args.get('token')
-    if not token or not users_col.find_one({"token": token, "role": "admin"}):
-        return False
-    return True
+    return session_cache.has_role(request.args.get('token'), "admin")
 
 
 @app.route('/api/admin/ai-decisions')
@@ -776,14 +1333,16 @@ def admin_ai_decisions():
              "ai_model": 1, "is_crisis": 1, "timestamp": 1}
         ).sort("timestamp", -1).limit(100))
 
-        # Source distribution summary
+        # Source/intent distribution over all chats, from the daily rollups
+        rollup = analytics_rollup.summary(rollups_col)
         source_counts = {}
         intent_counts = {}
-        for d in decisions:
-            s = d.get("response_source", "llm")
-            source_counts[s] = source_counts.get(s, 0) + 1
-            i = d.get("intent", "general")
-            intent_counts[i] = intent_counts.get(i, 0) + 1
+        for row in rollup["response_source"]:
+            s = row["_id"] or "llm"
+            source_counts[s] = source_counts.get(s, 0) + row["count"]
+        for row in rollup["intent"]:
+            i = row["_id"] or "general"
+            intent_counts[i] = intent_counts.get(i, 0) + row["count"]
 
         kb_hits = source_counts.get("kb", 0)
         llm_hits = source_counts.get("llm", 0) + source_counts.get("Groq", 0) + source_counts.get("Gemini", 0)
@@ -795,7 +1354,7 @@ def admin_ai_decisions():
             "intent_counts": intent_counts,
             "kb_hits": kb_hits,
             "llm_hits": llm_hits,
-            "total": len(decisions)
+            "total": rollup["total"]
         })
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -806,29 +1365,16 @@ def admin_chatbot_stats():
     if not admin_auth_check():
         return jsonify({"success": False, "error": "Unauthorized"}), 401
     try:
-        total_chats = chats_col.count_documents({})
-        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_chats = chats_col.count_documents({"timestamp": {"$gte": today}})
-        images_analyzed = chats_col.count_documents({"has_image": True})
-        images_success = chats_col.count_documents({"has_image": True, "ai_model": {"$ne": "None"}})
-        images_failed = images_analyzed - images_success
-        crisis_count = chats_col.count_documents({"is_crisis": True})
-
-        # Language usage
-        lang_data = list(chats_col.aggregate([
-            {"$group": {"_id": "$language", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}}
-        ]))
-
+        rollup = analytics_rollup.summary(rollups_col)
         return jsonify({
             "success": True,
-            "total_chats": total_chats,
-            "today_chats": today_chats,
-            "images_analyzed": images_analyzed,
-            "images_success": images_success,
-            "images_failed": images_failed,
-            "crisis_count": crisis_count,
-            "language_stats": lang_data
+            "total_chats": rollup["total"],
+            "today_chats": rollup["today"],
+            "images_analyzed": rollup["images_analyzed"],
+            "images_success": rollup["images_success"],
+            "images_failed": rollup["images_analyzed"] - rollup["images_success"],
+            "crisis_count": rollup["crisis"],
+            "language_stats": rollup["language"]
         })
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -839,10 +1385,7 @@ def admin_ai_usage():
     if not admin_auth_check():
         return jsonify({"success": False, "error": "Unauthorized"}), 401
     try:
-        model_data = list(chats_col.aggregate([
-            {"$group": {"_id": "$ai_model", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}}
-        ]))
+        model_data = analytics_rollup.summary(rollups_col)["ai_model"]
         return jsonify({"success": True, "model_usage": model_data})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -850,22 +1393,17 @@ def admin_ai_usage():
 
 @app.route('/api/admin/health-queries')
 def admin_health_queries():
+    """Top health topics over all chats, or the last ?days= days, from the topic rollups."""
     if not admin_auth_check():
         return jsonify({"success": False, "error": "Unauthorized"}), 401
     try:
-        health_keywords = ["headache", "fever", "stress", "anxiety", "depression", "cough", "cold",
-                           "pain", "fatigue", "insomnia", "nausea", "dizziness", "allergy",
-                           "diabetes", "blood pressure", "heart", "weight", "diet", "exercise"]
-        keyword_counts = {}
-        recent_messages = list(chats_col.find({}, {"user_message": 1, "_id": 0}).sort("timestamp", -1).limit(500))
-        for msg_doc in recent_messages:
-            msg = msg_doc.get("user_message", "").lower()
-            for kw in health_keywords:
-                if kw in msg:
-                    keyword_counts[kw] = keyword_counts.get(kw, 0) + 1
-
-        sorted_queries = sorted(keyword_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-        return jsonify({"success": True, "top_queries": [{"query": q, "count": c} for q, c in sorted_queries]})
+        days = int(request.args['days']) if request.args.get('days') else None
+    except ValueError:
+        return jsonify({"success": False, "error": "days must be an integer"}), 400
+    try:
+        since = datetime.now() - timedelta(days=days - 1) if days else None
+        top = analytics_rollup.top_topics(rollups_col, since=since, limit=10)
+        return jsonify({"success": True, "top_queries": [{"query": t, "count": c} for t, c in top]})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -889,64 +1427,79 @@ def admin_system_health():
     if not admin_auth_check():
         return jsonify({"success": False, "error": "Unauthorized"}), 401
 
-    services = []
+    if not health_prober.running:
+        health_prober.run_once()
 
-    # MongoDB
-    try:
-        client_db.admin.command('ping')
-        services.append({"name": "MongoDB", "status": "online", "icon": "database"})
-    except:
-        services.append({"name": "MongoDB", "status": "offline", "icon": "database"})
+    # Error logs count
+    recent_errors = error_logs_col.estimated_document_count()
 
-    # Groq
-    if client_groq:
-        try:
-            client_groq.chat.completions.create(model="llama-3.3-70b-versatile", messages=[{"role": "user", "content": "ping"}], max_tokens=5)
-            services.append({"name": "Groq API", "status": "online", "icon": "bolt"})
-        except:
-            services.append({"name": "Groq API", "status": "error", "icon": "bolt"})
-    else:
-        services.append({"name": "Groq API", "status": "not_configured", "icon": "bolt"})
+    return jsonify({
+        "success": True, "services": health_prober.snapshot(), "total_errors": recent_errors,
+        "probe_interval": health_prober.interval,
+        "write_behind": write_behind.stats(), "ollama": ollama.stats(), "jobs": jobs.stats()
+    })
 
-    # Gemini
-    if gemini_model:
-        try:
-            gemini_model.generate_content("ping")
-            services.append({"name": "Gemini API", "status": "online", "icon": "gem"})
-        except:
-            services.append({"name": "Gemini API", "status": "error", "icon": "gem"})
-    else:
-        services.append({"name": "Gemini API", "status": "not_configured", "icon": "gem"})
 
-    # Ollama
+@app.route('/api/admin/error-logs')
+def admin_error_logs():
+    if not admin_auth_check():
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
     try:
-        r = http_requests.get("http://localhost:11434/api/tags", timeout=3)
-        if r.status_code == 200:
-            services.append({"name": "Ollama (Local)", "status": "online", "icon": "server"})
-        else:
-            services.append({"name": "Ollama (Local)", "status": "error", "icon": "server"})
-    except:
-        services.append({"name": "Ollama (Local)", "status": "offline", "icon": "server"})
+        logs = list(error_logs_col.find({}, {"_id": 0}).sort("timestamp", -1).limit(50))
+        return jsonify({"success": True, "logs": logs})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
 
-    # OpenAI
-    if client_openai:
-        services.append({"name": "OpenAI API", "status": "configured", "icon": "brain"})
-    else:
-        services.append({"name": "OpenAI API", "status": "not_configured", "icon": "brain"})
 
-    # Error logs count
-    recent_errors = error_logs_col.count_documents({})
+@app.route('/api/admin/providers')
+def admin_providers():
+    if not admin_auth_check():
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    return jsonify({
+        "success": True,
+        "providers": router.snapshot(),
+        "chains": {"text": TEXT_CHAIN, "vision": VISION_CHAIN},
+        "hedging": {"enabled": HEDGE_ENABLED, "chain": HEDGE_CHAIN, "delay_ms": int(HEDGE_DELAY * 1000),
+                    "workers": HEDGE_WORKERS, "fired": router.hedges_fired, "skipped": router.hedges_skipped}
+    })
 
-    return jsonify({"success": True, "services": services, "total_errors": recent_errors})
 
+@app.route('/api/admin/cache-stats')
+def admin_cache_stats():
+    if not admin_auth_check():
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    return jsonify({
+        "success": True,
+        "response_cache": response_cache.stats(),
+        "vision_cache": vision_cache.stats(),
+        "translation_memory": translation_memory.stats(),
+        "semantic_cache": dict(semantic_cache.stats(), enabled=SEMANTIC_CACHE_ENABLED),
+        "session_cache": session_cache.stats()
+    })
+
+
+@app.route('/api/admin/kb/reload', methods=['POST'])
+def admin_kb_reload():
+    global message_matcher
+    if not admin_auth_check():
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    try:
+        knowledge_base.load()
+        message_matcher = build_message_matcher()
+        write_behind.insert("admin_logs", {"action": "kb_reload", "timestamp": datetime.now()})
+        return jsonify({"success": True, "knowledge_base": knowledge_base.stats()})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/admin/error-logs')
-def admin_error_logs():
+
+@app.route('/api/admin/aiml/reload', methods=['POST'])
+def admin_aiml_reload():
     if not admin_auth_check():
         return jsonify({"success": False, "error": "Unauthorized"}), 401
     try:
-        logs = list(error_logs_col.find({}, {"_id": 0}).sort("timestamp", -1).limit(50))
-        return jsonify({"success": True, "logs": logs})
+        aiml_brain.reload()
+        write_behind.insert("admin_logs", {"action": "aiml_reload", "timestamp": datetime.now()})
+        return jsonify({"success": True, "aiml": aiml_brain.stats()})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -962,101 +1515,206 @@ def admin_test_chat():
             return jsonify({"success": False, "error": "Message required"}), 400
 
         prompt = f"You are WellBot, an empathetic wellness assistant. User says: {message}. Keep under 100 words."
-        reply = None
-        model_used = "None"
-
-        if client_groq:
-            try:
-                res = client_groq.chat.completions.create(model="llama-3.3-70b-versatile", messages=[{"role": "user", "content": prompt}], max_tokens=200)
-                reply = res.choices[0].message.content
-                model_used = "Groq"
-            except: pass
-
-        if reply is None and gemini_model:
-            try:
-                response = gemini_model.generate_content(prompt)
-                reply = response.text
-                model_used = "Gemini"
-            except: pass
-
-        if reply is None:
-            try:
-                reply = ask_ollama(prompt)
-                model_used = "Ollama"
-            except:
-                reply = "AI services are currently unavailable."
+        try:
+            reply, model_used = router.complete(TEXT_CHAIN, prompt, max_tokens=200)
+        except AllProvidersFailed:
+            reply = "AI services are currently unavailable."
+            model_used = "None"
 
-        admin_logs_col.insert_one({"action": "test_chat", "message": message, "timestamp": datetime.now()})
+        write_behind.insert("admin_logs", {"action": "test_chat", "message": message, "timestamp": datetime.now()})
         return jsonify({"success": True, "reply": reply, "model": model_used})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+USER_STAT_SORTS = {"chat_count", "image_count", "last_active"}
+USER_ACTIVITY_SORTS = USER_STAT_SORTS | {"name", "email", "created_at"}
+USER_ACTIVITY_MAX_PAGE_SIZE = 200
+
+
+def user_activity_pipeline(match, sort_field="chat_count", descending=True, skip=0, limit=50):
+    """One aggregation for the user activity table: filter, page and join chat stats.
+
+    Chat stats are a primary-key $lookup into user_stats. When the sort key
+    lives on the user document the page is cut before the join, so only
+    `limit` users are looked up; sorting by a chat stat has to join first.
+    Descending chat-stat sorts use user_stats_page() instead.
+    """
+    join = [
+        {"$lookup": {"from": "user_stats", "localField": "email", "foreignField": "_id", "as": "stats"}},
+        {"$addFields": {"stats": {"$arrayElemAt": ["$stats", 0]}}},
+        {"$project": {
+            "_id": 0,
+            "name": {"$ifNull": ["$name", "Unknown"]},
+            "email": {"$ifNull": ["$email", ""]},
+            "role": {"$ifNull": ["$role", "user"]},
+            "chat_count": {"$ifNull": ["$stats.chat_count", 0]},
+            "image_count": {"$ifNull": ["$stats.image_count", 0]},
+            "last_active": {"$ifNull": ["$stats.last_active", "$created_at"]},
+            "created_at": 1
+        }}
+    ]
+    page = [
+        {"$sort": {sort_field: -1 if descending else 1, "email": 1}},
+        {"$skip": skip},
+        {"$limit": limit}
+    ]
+    users = page + join if sort_field in ("name", "email", "created_at") else join + page
+    return [
+        {"$match": match},
+        {"$facet": {"total": [{"$count": "count"}], "users": users}}
+    ]
+
+
+def stats_user_lookup(match):
+    # The user behind a user_stats doc, if it passes the table's filters
+    return {"$lookup": {
+        "from": "users", "localField": "_id", "foreignField": "email",
+        "pipeline": ([{"$match": match}] if match else []) + [{"$limit": 1}], "as": "user"
+    }}
+
+
+def stats_activity_pipeline(match, sort_field, skip=0, limit=50):
+    """Busiest users first, driven by a user_stats index.
+
+    The sort is index-backed, so the $lookup only runs for documents up to
+    the end of the page rather than for every user. Stats of emails with no
+    matching user (Anonymous, other roles) drop out at the $unwind.
+    """
+    return [
+        {"$sort": {sort_field: -1, "_id": 1}},
+        stats_user_lookup(match),
+        {"$unwind": "$user"},
+        {"$skip": skip},
+        {"$limit": limit},
+        {"$project": {
+            "_id": 0,
+            "name": {"$ifNull": ["$user.name", "Unknown"]},
+            "email": "$_id",
+            "role": {"$ifNull": ["$user.role", "user"]},
+            "chat_count": {"$ifNull": ["$chat_count", 0]},
+            "image_count": {"$ifNull": ["$image_count", 0]},
+            "last_active": {"$ifNull": ["$last_active", "$user.created_at"]},
+            "created_at": "$user.created_at"
+        }}
+    ]
+
+
+def idle_users_pipeline(match, sort_field, skip=0, limit=50):
+    """Users with no chat stats yet, which come after everyone who has chatted."""
+    # Their last_active is created_at, so that sort keeps newest members first
+    order = {"created_at": -1, "email": 1} if sort_field == "last_active" else {"email": 1}
+    return [
+        {"$match": match},
+        {"$lookup": {"from": "user_stats", "localField": "email", "foreignField": "_id", "as": "stats"}},
+        {"$match": {"stats": {"$size": 0}}},
+        {"$sort": order},
+        {"$skip": skip},
+        {"$limit": limit},
+        {"$project": {
+            "_id": 0,
+            "name": {"$ifNull": ["$name", "Unknown"]},
+            "email": {"$ifNull": ["$email", ""]},
+            "role": {"$ifNull": ["$role", "user"]},
+            "chat_count": {"$literal": 0},
+            "image_count": {"$literal": 0},
+            "last_active": "$created_at",
+            "created_at": 1
+        }}
+    ]
+
+
+def user_stats_page(match, sort_field, skip, limit):
+    """One page of a descending chat-stat sort: users with stats, then idle users."""
+    users = list(user_stats_col.aggregate(stats_activity_pipeline(match, sort_field, skip, limit)))
+    if len(users) == limit:
+        return users
+    if users or not skip:
+        with_stats = skip + len(users)
+    else:
+        # The page starts past the last user with stats; count them to find the offset
+        counted = next(user_stats_col.aggregate([stats_user_lookup(match), {"$unwind": "$user"}, {"$count": "count"}]), {})
+        with_stats = counted.get("count", 0)
+    idle = users_col.aggregate(idle_users_pipeline(match, sort_field, max(skip - with_stats, 0), limit - len(users)))
+    return users + list(idle)
+
+
 @app.route('/api/admin/user-activity')
 def admin_user_activity():
     if not admin_auth_check():
         return jsonify({"success": False, "error": "Unauthorized"}), 401
     try:
-        users = list(users_col.find({}, {"_id": 0, "password": 0, "token": 0}))
-        activity = []
-        for user in users:
-            email = user.get('email', '')
-            chat_count = chats_col.count_documents({"user_email": email})
-            image_count = chats_col.count_documents({"user_email": email, "has_image": True})
-            last_chat = chats_col.find_one({"user_email": email}, sort=[("timestamp", -1)])
-            last_active = last_chat["timestamp"] if last_chat else user.get("created_at")
-            activity.append({
-                "name": user.get("name", "Unknown"),
-                "email": email,
-                "role": user.get("role", "user"),
-                "chat_count": chat_count,
-                "image_count": image_count,
-                "last_active": last_active,
-                "created_at": user.get("created_at")
-            })
-        activity.sort(key=lambda x: x.get("chat_count", 0), reverse=True)
-        return jsonify({"success": True, "users": activity})
+        page = max(int(request.args.get('page', 1)), 1)
+        page_size = min(max(int(request.args.get('page_size', 50)), 1), USER_ACTIVITY_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"success": False, "error": "page and page_size must be integers"}), 400
+    sort_field = request.args.get('sort', 'chat_count')
+    if sort_field not in USER_ACTIVITY_SORTS:
+        return jsonify({"success": False, "error": f"sort must be one of {sorted(USER_ACTIVITY_SORTS)}"}), 400
+    descending = request.args.get('order', 'desc') != 'asc'
+
+    match = {}
+    if request.args.get('role'):
+        match["role"] = request.args['role']
+    search = request.args.get('q', '').strip()
+    if search:
+        pattern = {"$regex": re.escape(search), "$options": "i"}
+        match["$or"] = [{"name": pattern}, {"email": pattern}]
+
+    try:
+        skip = (page - 1) * page_size
+        if sort_field in USER_STAT_SORTS and descending:
+            users = user_stats_page(match, sort_field, skip, page_size)
+            total = users_col.count_documents(match)
+        else:
+            result = next(users_col.aggregate(
+                user_activity_pipeline(match, sort_field, descending, skip, page_size)
+            ), {})
+            users = result.get("users", [])
+            total = result["total"][0]["count"] if result.get("total") else 0
+        return jsonify({
+            "success": True,
+            "users": users,
+            "total": total,
+            "page": page,
+            "page_size": page_size
+        })
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
 @app.route('/api/admin/export/<export_type>')
 def admin_export(export_type):
+    """Stream a full export as csv, ndjson or json (?format=), optionally gzipped (?gzip=1).
+
+    since/until filter by date and cursor resumes after the last row received.
+    """
     if not admin_auth_check():
         return jsonify({"success": False, "error": "Unauthorized"}), 401
+    spec = EXPORTS.get(export_type)
+    if spec is None:
+        return jsonify({"success": False, "error": "Invalid export type"}), 400
     fmt = request.args.get('format', 'json')
-
+    if fmt not in EXPORT_RENDERERS:
+        return jsonify({"success": False, "error": f"format must be one of {sorted(EXPORT_RENDERERS)}"}), 400
     try:
-        if export_type == 'chats':
-            data = list(chats_col.find({}, {"_id": 0}).sort("timestamp", -1).limit(1000))
-        elif export_type == 'users':
-            data = list(users_col.find({}, {"_id": 0, "password": 0, "token": 0}))
-        elif export_type == 'feedback':
-            data = list(feedback_col.find({}, {"_id": 0}))
-        else:
-            return jsonify({"success": False, "error": "Invalid export type"}), 400
-
-        # Convert datetime objects to strings
-        for item in data:
-            for key, value in item.items():
-                if isinstance(value, datetime):
-                    item[key] = value.isoformat()
-
-        admin_logs_col.insert_one({"action": f"export_{export_type}", "format": fmt, "timestamp": datetime.now()})
-
-        if fmt == 'csv':
-            if not data:
-                return jsonify({"success": True, "csv": ""})
-            output = StringIO()
-            writer = csv.DictWriter(output, fieldnames=data[0].keys())
-            writer.writeheader()
-            writer.writerows(data)
-            return jsonify({"success": True, "csv": output.getvalue(), "filename": f"{export_type}_export.csv"})
-        else:
-            return jsonify({"success": True, "data": data, "filename": f"{export_type}_export.json"})
-    except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
-
+        since = parse_date(request.args['since']) if request.args.get('since') else None
+        until = parse_date(request.args['until']) if request.args.get('until') else None
+        query = export_query(spec, since, until, request.args.get('cursor'))
+    except (ValueError, InvalidCursor) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    write_behind.insert("admin_logs", {"action": f"export_{export_type}", "format": fmt, "timestamp": datetime.now()})
+
+    render, mimetype = EXPORT_RENDERERS[fmt]
+    body = render(iter_rows(db, spec, query), spec["fields"])
+    filename = f"{export_type}_export.{fmt}"
+    if request.args.get('gzip', '').lower() in ("1", "true", "yes"):
+        body, mimetype, filename = gzip_stream(body), "application/gzip", filename + ".gz"
+    return Response(body, mimetype=mimetype, headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "X-Accel-Buffering": "no"
+    })
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,419 @@
+"""
+Async (ASGI) serving mode for the WellBot backend.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 2
+
+The LLM-bound routes (/chat, /chat/stream, /symptom_checker,
+/api/diet-recommendation, /translate, /translate/batch) and /api/user_stats run natively on
+the event loop. They use async Groq/OpenAI/Gemini clients, httpx for Ollama
+and pymongo's AsyncMongoClient, so a request waiting on a model holds a
+coroutine rather than a worker thread. The request and response JSON is the
+same as the Flask routes. Every other route is served by the unchanged Flask
+app mounted underneath, so `python app.py` keeps working as before.
+"""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+import httpx
+from a2wsgi import WSGIMiddleware
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from groq import AsyncGroq
+from openai import AsyncOpenAI
+from pymongo import AsyncMongoClient
+
+from app import (
+    app as flask_app, router, response_cache, translation_memory, write_behind, gemini_model,
+    GROQ_API_KEY, OPENAI_API_KEY, MONGO_URI, OLLAMA_URL, OLLAMA_MODEL, OLLAMA_VISION_MODEL, ollama,
+    OLLAMA_POOL_SIZE, OLLAMA_RETRIES,
+    TEXT_CHAIN, VISION_CHAIN, TRANSLATE_CHAIN, TRANSLATE_BATCH_MAX_TOKENS, HEDGE_ENABLED, HEDGE_CHAIN, HEDGE_DELAY,
+    CONNECTION_TROUBLE, SYMPTOM_SYSTEM, DIET_SYSTEM, INVALID_IMAGE_REPLY, VISION_UNAVAILABLE,
+    TRANSLATE_UNAVAILABLE,
+    safety_check, chat_context, text_chat_start, remember_reply, finish_chat, build_chat_prompt, sse_event,
+    prepare_upload, vision_lookup, vision_store, vision_job, wants_async, enqueue_job, token_email, symptom_result, diet_result,
+    response_cache_key, response_cache_ttl, symptom_prompt, diet_prompt, translate_batch_texts, user_stats_payload,
+    translation_verified, translate_batch_payload
+)
+from image_pipeline import InvalidImage
+from llm_router import AllProvidersFailed
+from user_stats import stats_from_doc
+
+groq_async = AsyncGroq(api_key=GROQ_API_KEY) if GROQ_API_KEY else None
+openai_async = AsyncOpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+# Same pool size and connect retries as the blocking OllamaClient
+ollama_http = httpx.AsyncClient(
+    limits=httpx.Limits(max_keepalive_connections=OLLAMA_POOL_SIZE),
+    transport=httpx.AsyncHTTPTransport(retries=OLLAMA_RETRIES)
+)
+mongo_async = AsyncMongoClient(MONGO_URI)
+async_db = mongo_async.get_default_database()
+
+
+# ============================================================
+# ASYNC PROVIDERS (same signatures as the blocking ones in app.py)
+# ============================================================
+def image_message(prompt, image):
+    return [{
+        "role": "user",
+        "content": [
+            {"type": "text", "text": prompt},
+            {"type": "image_url", "image_url": {"url": image.data_url}}
+        ]
+    }]
+
+async def groq_acomplete(prompt, system=None, max_tokens=200, timeout=None):
+    messages = [{"role": "system", "content": system}] if system else []
+    messages.append({"role": "user", "content": prompt})
+    res = await groq_async.chat.completions.create(
+        model="llama-3.3-70b-versatile", messages=messages, max_tokens=max_tokens, timeout=timeout
+    )
+    return res.choices[0].message.content
+
+async def groq_astream(prompt, max_tokens=200, timeout=None):
+    stream = await groq_async.chat.completions.create(
+        model="llama-3.3-70b-versatile",
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=max_tokens,
+        stream=True,
+        timeout=timeout
+    )
+    async for chunk in stream:
+        token = chunk.choices[0].delta.content if chunk.choices else None
+        if token:
+            yield token
+
+async def groq_avision(prompt, image, timeout=None):
+    completion = await groq_async.chat.completions.create(
+        model="llama-3.2-11b-vision-preview", messages=image_message(prompt, image),
+        max_tokens=1024, timeout=timeout
+    )
+    return completion.choices[0].message.content
+
+async def gemini_acomplete(prompt, system=None, max_tokens=None, timeout=None):
+    request_options = {"timeout": timeout} if timeout else None
+    return (await gemini_model.generate_content_async(prompt, request_options=request_options)).text
+
+async def gemini_astream(prompt, max_tokens=None, timeout=None):
+    request_options = {"timeout": timeout} if timeout else None
+    response = await gemini_model.generate_content_async(prompt, stream=True, request_options=request_options)
+    async for chunk in response:
+        if chunk.text:
+            yield chunk.text
+
+async def gemini_avision(prompt, image, timeout=None):
+    request_options = {"timeout": timeout} if timeout else None
+    return (await gemini_model.generate_content_async([prompt, image.blob], request_options=request_options)).text
+
+async def ollama_acomplete(prompt, system=None, max_tokens=None, timeout=60):
+    payload = ollama.payload(OLLAMA_MODEL, prompt, False)
+    response = await ollama_http.post(OLLAMA_URL, json=payload, timeout=timeout)
+    response.raise_for_status()
+    return response.json()["response"]
+
+async def ollama_astream(prompt, max_tokens=None, timeout=60):
+    payload = ollama.payload(OLLAMA_MODEL, prompt, True)
+    async with ollama_http.stream("POST", OLLAMA_URL, json=payload, timeout=timeout) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            part = json.loads(line)
+            if part.get("response"):
+                yield part["response"]
+            if part.get("done"):
+                break
+
+async def ollama_avision(prompt, image, timeout=120):
+    payload = ollama.payload(OLLAMA_VISION_MODEL, prompt, False, images=[image.b64])
+    response = await ollama_http.post(OLLAMA_URL, json=payload, timeout=timeout)
+    response.raise_for_status()
+    return response.json()["response"]
+
+async def openai_avision(prompt, image, timeout=None):
+    response = await openai_async.chat.completions.create(
+        model="gpt-4o-mini", messages=image_message(prompt, image), max_tokens=500, timeout=timeout
+    )
+    return response.choices[0].message.content
+
+# Providers without an async form here still work: the router runs their
+# blocking call on a worker thread
+if groq_async:
+    router.attach_async("Groq", groq_acomplete, groq_astream)
+    router.attach_async("Groq-Vision", groq_avision)
+if gemini_model:
+    router.attach_async("Gemini", gemini_acomplete, gemini_astream)
+    router.attach_async("Gemini-Vision", gemini_avision)
+router.attach_async("Ollama", ollama_acomplete, ollama_astream)
+router.attach_async("Ollama-Vision", ollama_avision)
+if openai_async:
+    router.attach_async("OpenAI-Vision", openai_avision)
+
+
+async def acached_complete(namespace, chain, prompt, **kwargs):
+    """Async cached_complete(); the Mongo cache tier is read on a worker thread."""
+    key = response_cache_key(namespace, chain, prompt, kwargs)
+    shared = response_cache.collection is not None
+    cached = await asyncio.to_thread(response_cache.get, key) if shared else response_cache.get(key)
+    if cached:
+        return cached["reply"], cached["model"]
+    reply, model = await router.acomplete(chain, prompt, **kwargs)
+    ttl = response_cache_ttl(chain, model)
+    if shared:
+        await asyncio.to_thread(response_cache.set, key, {"reply": reply, "model": model}, namespace=namespace, ttl=ttl)
+    else:
+        response_cache.set(key, {"reply": reply, "model": model}, namespace=namespace, ttl=ttl)
+    return reply, model
+
+async def afinish_chat(*args, **kwargs):
+    """app.finish_chat(); with write-behind on it only enqueues, otherwise it writes on a thread."""
+    if write_behind.enabled:
+        return finish_chat(*args, **kwargs)
+    return await asyncio.to_thread(finish_chat, *args, **kwargs)
+
+async def avision_reply(image, user_message):
+    """app.vision_reply() with the provider call on the event loop and the cache on a thread."""
+    vision_prompt, key, cached = await asyncio.to_thread(vision_lookup, image, user_message)
+    if cached:
+        return cached
+    try:
+        bot_reply, ai_model_used = await router.acomplete(VISION_CHAIN, vision_prompt, image)
+    except AllProvidersFailed:
+        return VISION_UNAVAILABLE, "None", "vision"
+    await asyncio.to_thread(vision_store, key, bot_reply, ai_model_used)
+    return bot_reply, ai_model_used, "vision"
+
+async def acaller_email(request, data):
+    """app.caller_email(); the session lookup can hit Mongo, so it runs on a thread."""
+    token = request.query_params.get('token') or data.get('token')
+    return await asyncio.to_thread(token_email, token) if token else None
+
+async def json_body(request):
+    try:
+        return await request.json() or {}
+    except ValueError:
+        return {}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await ollama_http.aclose()
+    await mongo_async.close()
+
+app = FastAPI(title="WellBot", lifespan=lifespan, docs_url=None, redoc_url=None, openapi_url=None)
+
+
+# ============================================================
+# ASYNC ROUTES
+# ============================================================
+@app.post("/chat")
+async def chat(request: Request):
+    data = await json_body(request)
+    image_data = data.get('image')
+    ctx = chat_context(data)
+    user_message, hits = ctx["user_message"], ctx["hits"]
+
+    warning = safety_check(user_message, hits)
+    if warning:
+        return {"reply": warning}
+
+    image = None
+    if image_data:
+        try:
+            # Decoding and resizing are CPU work; keep them off the event loop
+            image = await asyncio.to_thread(prepare_upload, image_data)
+        except InvalidImage as e:
+            print(f"Invalid Image: {e}")
+            return JSONResponse({"reply": INVALID_IMAGE_REPLY}, status_code=400)
+
+    if image is not None and wants_async(data):
+        # Submitting persists the job to Mongo, so keep it off the event loop
+        payload, status, headers = await asyncio.to_thread(
+            enqueue_job, "vision", vision_job(ctx, image), await acaller_email(request, data)
+        )
+        return JSONResponse(payload, status_code=status, headers=headers)
+
+    try:
+        if image:
+            result = await avision_reply(image, user_message)
+            return await afinish_chat(ctx, *result, has_image=True)
+
+        intent, partition, local = text_chat_start(ctx)
+        bot_reply, ai_model_used, response_source, kb_match = local
+        if bot_reply is None:
+            full_prompt = build_chat_prompt(user_message, ctx["chat_mode"], ctx["detected_mood"], ctx["language"])
+            try:
+                if HEDGE_ENABLED:
+                    bot_reply, ai_model_used = await router.ahedged_complete(
+                        HEDGE_CHAIN, full_prompt, delay=HEDGE_DELAY, max_tokens=200
+                    )
+                else:
+                    bot_reply, ai_model_used = await router.acomplete(TEXT_CHAIN, full_prompt, max_tokens=200)
+                remember_reply(user_message, partition, bot_reply, ai_model_used)
+            except AllProvidersFailed:
+                bot_reply = CONNECTION_TROUBLE
+                ai_model_used = "None"
+
+        return await afinish_chat(ctx, bot_reply, ai_model_used, response_source, intent, kb_match)
+    except Exception as e:
+        print("Chat Error:", e)
+        return JSONResponse({"reply": "Server error."}, status_code=500)
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: Request):
+    """Async /chat/stream with the same SSE frames as the Flask route."""
+    data = await json_body(request)
+    if data.get('image'):
+        return JSONResponse({"success": False, "error": "Use /chat for image analysis."}, status_code=400)
+
+    ctx = chat_context(data)
+    user_message, hits = ctx["user_message"], ctx["hits"]
+
+    async def generate():
+        warning = safety_check(user_message, hits)
+        if warning:
+            yield sse_event({"token": warning})
+            yield sse_event({"reply": warning, "source": "safety"}, event="done")
+            return
+
+        intent, partition, local = text_chat_start(ctx)
+        bot_reply, ai_model_used, response_source, kb_match = local
+
+        if bot_reply is not None:
+            yield sse_event({"token": bot_reply})
+        else:
+            full_prompt = build_chat_prompt(user_message, ctx["chat_mode"], ctx["detected_mood"], ctx["language"])
+            chunks = []
+            failed = False
+            try:
+                async for name, token in router.astream(TEXT_CHAIN, full_prompt, max_tokens=200):
+                    ai_model_used = name
+                    chunks.append(token)
+                    yield sse_event({"token": token})
+            except AllProvidersFailed as e:
+                print(f"Chat Stream Error: {e}")
+                failed = True
+
+            bot_reply = "".join(chunks)
+            if not bot_reply:
+                bot_reply = CONNECTION_TROUBLE
+                yield sse_event({"token": bot_reply})
+            elif not failed:
+                remember_reply(user_message, partition, bot_reply, ai_model_used)
+
+        try:
+            done = await afinish_chat(ctx, bot_reply, ai_model_used, response_source, intent, kb_match)
+        except Exception as e:
+            print("Chat Stream Save Error:", e)
+            done = {"reply": bot_reply, "suggest_symptom_checker": ctx["suggest_checker"], "source": response_source}
+        yield sse_event(done, event="done")
+
+    return StreamingResponse(generate(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+
+@app.post("/symptom_checker")
+async def symptom_checker(request: Request):
+    data = await json_body(request)
+    symptom = data.get('symptom', '').strip()
+    language = data.get('language', 'English')
+
+    if not symptom:
+        return JSONResponse({"success": False, "error": "Please describe your symptoms."}, status_code=400)
+
+    if wants_async(data):
+        payload, status, headers = await asyncio.to_thread(
+            enqueue_job, "symptom", lambda report: symptom_result(symptom, language), await acaller_email(request, data)
+        )
+        return JSONResponse(payload, status_code=status, headers=headers)
+
+    try:
+        result, _ = await acached_complete(
+            "symptom", TEXT_CHAIN, symptom_prompt(symptom, language), max_tokens=600, system=SYMPTOM_SYSTEM
+        )
+    except AllProvidersFailed as e:
+        print(f"Symptom Checker Error: {e}")
+        result = "Unable to analyze symptoms at this time. Please try again later."
+
+    return {"success": True, "result": result}
+
+
+@app.post("/api/diet-recommendation")
+async def diet_recommendation(request: Request):
+    data = await json_body(request)
+    goal = data.get('goal', 'Balanced diet').strip()
+    language = data.get('language', 'English')
+
+    if wants_async(data):
+        payload, status, headers = await asyncio.to_thread(
+            enqueue_job, "diet", lambda report: diet_result(goal, language), await acaller_email(request, data)
+        )
+        return JSONResponse(payload, status_code=status, headers=headers)
+
+    try:
+        result, _ = await acached_complete(
+            "diet", TEXT_CHAIN, diet_prompt(goal, language), max_tokens=600, system=DIET_SYSTEM
+        )
+    except AllProvidersFailed as e:
+        print(f"Diet Error: {e}")
+        result = "Unable to generate diet recommendations at this time."
+
+    return {"success": True, "recommendation": result}
+
+
+async def translate_acomplete(prompt):
+    return await router.acomplete(TRANSLATE_CHAIN, prompt, max_tokens=TRANSLATE_BATCH_MAX_TOKENS)
+
+
+@app.post("/translate")
+async def translate_api(request: Request):
+    data = await json_body(request)
+    text = data.get('text')
+    target_lang = data.get('language', 'English')
+
+    if not text:
+        return JSONResponse({"success": False, "error": "Text required"}, status_code=400)
+    if not router.has_any(TRANSLATE_CHAIN):
+        return JSONResponse(TRANSLATE_UNAVAILABLE, status_code=503)
+
+    try:
+        translated = (await translation_memory.atranslate([text], target_lang, translate_acomplete))[0]
+        return {"success": True, "translated": translated.strip(), "verified": translation_verified(translated)}
+    except Exception as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+
+@app.post("/translate/batch")
+async def translate_batch_api(request: Request):
+    data = await json_body(request)
+    texts, error = translate_batch_texts(data)
+    if error:
+        return JSONResponse({"success": False, "error": error}, status_code=400)
+    target_lang = data.get('language', 'English')
+    if not router.has_any(TRANSLATE_CHAIN):
+        return JSONResponse(TRANSLATE_UNAVAILABLE, status_code=503)
+
+    try:
+        translations = await translation_memory.atranslate(texts, target_lang, translate_acomplete)
+        return translate_batch_payload(translations)
+    except Exception as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+
+@app.get("/api/user_stats")
+async def user_stats(email: str = None):
+    if not email:
+        return JSONResponse({"success": False, "error": "Email required"}, status_code=400)
+    try:
+        doc = await async_db.user_stats.find_one({"_id": email})
+        return user_stats_payload(stats_from_doc(doc))
+    except Exception as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+
+# Everything else (pages, auth, admin API, exports) is the Flask app
+app.mount("/", WSGIMiddleware(flask_app))
@@ -0,0 +1,70 @@
+"""
+Microbenchmark: per-message classification cost of the compiled
+KeywordMatcher versus the old `any(w in msg for w in words)` scans, as the
+keyword lists grow.
+
+Usage:
+    python bench_keyword_matcher.py
+"""
+import random
+import string
+import timeit
+from keyword_matcher import KeywordMatcher
+
+MESSAGES = [
+    "I have had a headache and mild fever since yesterday, what should I do?",
+    "Feeling really stressed and overwhelmed with exams, can't sleep well",
+    "What is a healthy breakfast for weight loss with enough protein?",
+    "My chest pain gets worse when breathing deeply and I feel dizzy",
+    "Hello, I just wanted to say thanks for the tips last week!",
+]
+CATEGORIES = ["crisis", "intent:symptom", "intent:mental", "intent:nutrition",
+              "suggest_checker", "mood:negative", "kb"]
+
+
+def synthetic_terms(n, rng):
+    terms = set()
+    while len(terms) < n:
+        words = rng.randint(1, 2)
+        terms.add(" ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))) for _ in range(words)))
+    return sorted(terms)
+
+
+def build_lists(total_terms, rng):
+    """Split `total_terms` synthetic terms across the classifier categories."""
+    per_category = max(total_terms // len(CATEGORIES), 1)
+    real = ["headache", "fever", "stress", "overwhelmed", "protein", "chest pain", "dizzy", "weight"]
+    lists = {}
+    for i, category in enumerate(CATEGORIES):
+        lists[category] = synthetic_terms(per_category, rng) + [real[i % len(real)]]
+    return lists
+
+
+def legacy_classify(msg, lists):
+    m = msg.lower()
+    return {c for c, words in lists.items() if any(w in m for w in words)}
+
+
+def bench(total_terms, rng, number=200):
+    lists = build_lists(total_terms, rng)
+    matcher = KeywordMatcher()
+    for category, words in lists.items():
+        matcher.add(category, words)
+    matcher.compile()
+
+    legacy = timeit.timeit(lambda: [legacy_classify(m, lists) for m in MESSAGES], number=number)
+    compiled = timeit.timeit(lambda: [matcher.match(m) for m in MESSAGES], number=number)
+    calls = number * len(MESSAGES)
+    return legacy / calls * 1e6, compiled / calls * 1e6
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'terms':>8} {'any() scans (us/msg)':>22} {'compiled (us/msg)':>19} {'speedup':>9}")
+    for total in (50, 500, 2000, 5000):
+        legacy_us, compiled_us = bench(total, rng)
+        print(f"{total:>8} {legacy_us:>22.1f} {compiled_us:>19.1f} {legacy_us / compiled_us:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
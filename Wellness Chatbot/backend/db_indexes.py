@@ -0,0 +1,75 @@
+"""
+Index definitions for every collection the backend queries.
+
+`ensure_indexes(db)` is run once at startup. create_indexes() is a no-op for
+indexes that already exist with the same keys and options, so running it on
+every boot is safe. Each index is named after the route shape it serves, and
+query_audit.py checks that those shapes really use it.
+"""
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import PyMongoError
+
+INDEX_SPECS = {
+    "users": [
+        # admin_auth_check runs on every admin call: {token, role}
+        IndexModel([("token", ASCENDING), ("role", ASCENDING)], name="token_role"),
+        # login {email, password}, registration and Google sign-in {email}
+        IndexModel([("email", ASCENDING)], name="email"),
+        # admin dashboard user list, newest first
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+    ],
+    "chats": [
+        # per-user chat log pages and the user_stats rebuild: {user_email} by timestamp
+        IndexModel([("user_email", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+                   name="user_email_timestamp_id"),
+        # chat logs keyset pages, AI decisions sort and rollup backfills by date
+        IndexModel([("timestamp", DESCENDING), ("_id", DESCENDING)], name="timestamp_id"),
+        # ad-hoc topic counts over a time window: {topics, timestamp}
+        IndexModel([("topics", ASCENDING), ("timestamp", DESCENDING)], name="topics_timestamp"),
+        # crisis alerts: {is_crisis: true} newest first
+        IndexModel([("is_crisis", ASCENDING), ("timestamp", DESCENDING)], name="is_crisis_timestamp"),
+    ],
+    "user_stats": [
+        # admin user activity pages sorted by a chat stat, busiest first
+        IndexModel([("chat_count", DESCENDING), ("_id", ASCENDING)], name="chat_count_id"),
+        IndexModel([("image_count", DESCENDING), ("_id", ASCENDING)], name="image_count_id"),
+        IndexModel([("last_active", DESCENDING), ("_id", ASCENDING)], name="last_active_id"),
+    ],
+    "chat_rollups": [
+        # dashboard summaries read daily buckets by date
+        IndexModel([("granularity", ASCENDING), ("bucket", ASCENDING)], name="granularity_bucket"),
+        # only hourly buckets carry expires_at, so daily ones are kept
+        IndexModel([("expires_at", ASCENDING)], name="expires_at", expireAfterSeconds=0),
+    ],
+    "jobs": [
+        # finished jobs are dropped JOB_TTL seconds after their last update
+        IndexModel([("expires_at", ASCENDING)], name="expires_at", expireAfterSeconds=0),
+    ],
+    "error_logs": [
+        IndexModel([("timestamp", DESCENDING)], name="timestamp"),
+    ],
+    "issues": [
+        IndexModel([("timestamp", DESCENDING)], name="timestamp"),
+    ],
+    "feedback": [
+        IndexModel([("timestamp", DESCENDING)], name="timestamp"),
+    ],
+    "admin_logs": [
+        IndexModel([("timestamp", DESCENDING)], name="timestamp"),
+    ],
+}
+
+
+def ensure_indexes(db, specs=None):
+    """Create any missing indexes; returns {collection: [index names]}.
+
+    A failure on one collection (e.g. an existing index with the same keys
+    but a different name) is logged and does not stop the others.
+    """
+    created = {}
+    for name, models in (specs or INDEX_SPECS).items():
+        try:
+            created[name] = db[name].create_indexes(models)
+        except PyMongoError as e:
+            print(f"Index Setup Error ({name}): {e}")
+    return created
@@ -0,0 +1,134 @@
+"""
+Streaming exports of chats, users and feedback as CSV, NDJSON or JSON.
+
+Rows are read from a Mongo cursor in batches and written out a few hundred
+at a time, so an export of millions of chats needs about as much memory as
+an export of ten. Each row ends with a `cursor` field. If a download dies,
+pass the last `cursor` received back as ?cursor= to continue after that row.
+"""
+import csv
+import json
+import zlib
+from datetime import datetime
+from io import StringIO
+from bson import ObjectId
+from bson.errors import InvalidId
+from pagination import SORT, InvalidCursor, after_cursor, encode_cursor
+
+BATCH_SIZE = 500
+
+# collection, exported fields, date field for since/until, keyset ("timestamp"
+# walks the (timestamp, _id) index newest first; "_id" walks _id oldest first)
+EXPORTS = {
+    "chats": {
+        "collection": "chats",
+        "fields": ["timestamp", "user_email", "user_name", "user_message", "bot_response", "mood", "mode",
+                   "language", "has_image", "ai_model", "is_crisis", "intent", "response_source", "kb_match"],
+        "date_field": "timestamp",
+        "keyset": "timestamp"
+    },
+    "users": {
+        "collection": "users",
+        "fields": ["name", "email", "language", "role", "auth_provider", "created_at"],
+        "date_field": "created_at",
+        "keyset": "_id"
+    },
+    "feedback": {
+        "collection": "feedback",
+        "fields": ["user_email", "rating", "comment", "timestamp"],
+        "date_field": "timestamp",
+        "keyset": "_id"
+    }
+}
+
+
+def export_query(spec, since=None, until=None, cursor=None):
+    query = {}
+    if since or until:
+        query[spec["date_field"]] = {}
+        if since:
+            query[spec["date_field"]]["$gte"] = since
+        if until:
+            query[spec["date_field"]]["$lt"] = until
+    if spec["keyset"] == "timestamp":
+        return after_cursor(query, cursor)
+    if cursor:
+        try:
+            query["_id"] = {"$gt": ObjectId(cursor)}
+        except (InvalidId, TypeError) as e:
+            raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+    return query
+
+
+def iter_rows(db, spec, query):
+    """Yield flat dicts with the spec's fields plus the row's resume cursor."""
+    projection = dict.fromkeys(spec["fields"], 1)
+    sort = SORT if spec["keyset"] == "timestamp" else [("_id", 1)]
+    for doc in db[spec["collection"]].find(query, projection).sort(sort).batch_size(BATCH_SIZE):
+        row = {f: _plain(doc.get(f)) for f in spec["fields"]}
+        row["cursor"] = encode_cursor(doc) if spec["keyset"] == "timestamp" else str(doc["_id"])
+        yield row
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    return value
+
+
+def _batched(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def render_csv(rows, fields):
+    out = StringIO()
+    writer = csv.DictWriter(out, fieldnames=fields + ["cursor"], extrasaction="ignore")
+    writer.writeheader()
+    yield out.getvalue()
+    for batch in _batched(rows):
+        out.seek(0)
+        out.truncate()
+        writer.writerows(batch)
+        yield out.getvalue()
+
+
+def render_ndjson(rows, fields=None):
+    for batch in _batched(rows):
+        yield "".join(json.dumps(row, default=str) + "\n" for row in batch)
+
+
+def render_json(rows, fields=None):
+    """A JSON array, streamed: '[' + rows joined by ',' + ']'."""
+    yield "["
+    first = True
+    for batch in _batched(rows):
+        chunk = ",".join(json.dumps(row, default=str) for row in batch)
+        yield chunk if first else "," + chunk
+        first = False
+    yield "]"
+
+
+RENDERERS = {
+    "csv": (render_csv, "text/csv"),
+    "ndjson": (render_ndjson, "application/x-ndjson"),
+    "json": (render_json, "application/json")
+}
+
+
+def gzip_stream(chunks, level=6):
+    """Gzip a stream of text chunks without buffering the whole body."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,123 @@
+"""
+Background health checks for the services on the admin dashboard.
+
+Every `interval` seconds each registered check runs on its own worker
+thread, so one slow service never delays the others. Each check keeps its
+latest status and latency plus the last `history` results.
+/api/admin/system-health only reads that snapshot; it no longer calls five
+services on every refresh.
+
+Checks are linked to the router providers whose model they actually check
+(e.g. a model lookup for that provider's model). A failing check counts
+against their circuit breakers, so the chat path skips a dead provider
+without paying a timeout to find out. A passing check only moves an open
+breaker to half-open: a model lookup says nothing about rate limits, quota
+or overload, so one real call decides whether it closes. Don't link a
+provider the probe says nothing about, such as a vision model behind the
+same API key.
+Probes should be free: look up models or ping, never generate.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+class ServiceCheck:
+    def __init__(self, name, icon, probe=None, providers=(), status=None, history=20):
+        self.name = name
+        self.icon = icon
+        self.probe = probe
+        self.providers = list(providers)
+        # Checks without a probe (not configured) keep their fixed status
+        self.status = status or ("unknown" if probe else "not_configured")
+        self.latency = None
+        self.checked_at = None
+        self.error = None
+        self.history = deque(maxlen=history)
+
+    def run(self):
+        started = time.monotonic()
+        try:
+            # A probe returns False when the service is unreachable and raises
+            # when it answers with an error
+            status = "offline" if self.probe() is False else "online"
+            error = None
+        except Exception as e:
+            status, error = "error", str(e)
+        self.latency = time.monotonic() - started
+        self.status = status
+        self.error = error
+        self.checked_at = datetime.now()
+        self.history.append(status == "online")
+        for provider in self.providers:
+            # Breaker only: a probe is far cheaper than a real completion, so
+            # it would skew the provider's latency and success counters
+            if status == "online":
+                provider.breaker.half_open()
+            else:
+                provider.breaker.record_failure()
+        return status
+
+    def snapshot(self):
+        return {
+            "name": self.name,
+            "icon": self.icon,
+            "status": self.status,
+            "latency_ms": round(self.latency * 1000) if self.latency is not None else None,
+            "checked_at": self.checked_at,
+            "error": self.error,
+            "uptime": round(100 * sum(self.history) / len(self.history)) if self.history else None,
+            "history": list(self.history)
+        }
+
+
+class HealthProber:
+    def __init__(self, interval=30, history=20):
+        self.interval = interval
+        self.history = history
+        self.checks = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def add(self, name, icon, probe=None, providers=(), status=None):
+        check = ServiceCheck(name, icon, probe, providers, status, self.history)
+        self.checks.append(check)
+        return check
+
+    def run_once(self):
+        """Run every probe in parallel and wait for all of them."""
+        checks = [c for c in self.checks if c.probe]
+        if not checks:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=len(checks), thread_name_prefix="health-probe")
+        for future in [self._executor.submit(c.run) for c in checks]:
+            future.result()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Health Prober Error: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="health-prober", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self):
+        return [c.snapshot() for c in self.checks]
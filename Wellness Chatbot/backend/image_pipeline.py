@@ -0,0 +1,116 @@
+"""
+One-pass preprocessing for images sent to the vision chain.
+
+An upload is base64-decoded once and opened once with Pillow, which also
+checks that it is a supported format. The orientation in its EXIF data is
+applied, and the image is downscaled so its longest side is at most
+`max_side`. It is then re-encoded as a JPEG with no metadata. Every vision
+provider gets the same PreparedImage: raw bytes for Gemini, base64 for
+Ollama and a data URL for Groq/OpenAI. Each form is computed at most once.
+
+Phone photos of prescriptions and lab reports are often 4000px and 3-6 MB,
+while the vision models read text reliably at about 1600px. So one
+preprocessing pass shrinks the upload sent to each provider by roughly an
+order of magnitude.
+"""
+import base64
+import binascii
+import hashlib
+import io
+from functools import cached_property
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+ALLOWED_FORMATS = {"JPEG", "PNG", "WEBP", "GIF", "BMP", "TIFF"}
+MAX_SIDE = 1600
+JPEG_QUALITY = 85
+MAX_UPLOAD_BYTES = 15 * 1024 * 1024
+MAX_PIXELS = 50_000_000  # anything larger is rejected as a decompression bomb
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+class PreparedImage:
+    def __init__(self, data, width, height, original_size, mime_type="image/jpeg"):
+        self.data = data
+        self.width = width
+        self.height = height
+        self.original_size = original_size
+        self.mime_type = mime_type
+
+    @cached_property
+    def b64(self):
+        return base64.b64encode(self.data).decode("ascii")
+
+    @cached_property
+    def digest(self):
+        """Content hash of the prepared bytes; the same upload always hashes the same."""
+        return hashlib.sha256(self.data).hexdigest()
+
+    @property
+    def data_url(self):
+        return f"data:{self.mime_type};base64,{self.b64}"
+
+    @property
+    def blob(self):
+        """Inline part for google.generativeai: no PIL round trip."""
+        return {"mime_type": self.mime_type, "data": self.data}
+
+    def stats(self):
+        return {"width": self.width, "height": self.height,
+                "original_bytes": self.original_size, "prepared_bytes": len(self.data)}
+
+
+def decode_data_url(image_data):
+    """Raw bytes from a base64 string, with or without a `data:image/...;base64,` prefix."""
+    if "," in image_data:
+        image_data = image_data.split(",", 1)[1]
+    try:
+        return base64.b64decode(image_data, validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise InvalidImage("Image is not valid base64") from e
+
+
+def prepare_image(raw, **kwargs):
+    """Validate, orient, downscale and re-encode `raw` image bytes once."""
+    return prepare_file(io.BytesIO(raw), **kwargs)
+
+
+def prepare_file(fileobj, max_side=MAX_SIDE, quality=JPEG_QUALITY, max_bytes=MAX_UPLOAD_BYTES):
+    """prepare_image() for a seekable file, e.g. a spooled upload; Pillow reads it directly."""
+    fileobj.seek(0, io.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    if not size:
+        raise InvalidImage("Image is empty")
+    if size > max_bytes:
+        raise InvalidImage(f"Image is larger than {max_bytes // (1024 * 1024)} MB")
+    try:
+        img = Image.open(fileobj)
+        if img.format not in ALLOWED_FORMATS:
+            raise InvalidImage(f"Unsupported image format: {img.format}")
+        if img.width * img.height > MAX_PIXELS:
+            raise InvalidImage("Image dimensions are too large")
+        # Rotate per EXIF before it is dropped, or sideways photos stay sideways
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+        out = io.BytesIO()
+        # No exif= argument, so no metadata is written
+        img.save(out, "JPEG", quality=quality, optimize=True)
+    except InvalidImage:
+        raise
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise InvalidImage("Image could not be read") from e
+    return PreparedImage(out.getvalue(), img.width, img.height, size)
+
+
+def prepare_data_url(image_data, **kwargs):
+    return prepare_image(decode_data_url(image_data), **kwargs)
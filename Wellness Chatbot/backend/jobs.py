@@ -0,0 +1,151 @@
+"""
+Background jobs for long LLM analyses (vision, symptom checker, diet plans).
+
+An endpoint called with `async: true` submits its work here and returns a
+job id straight away (202). The work then runs on a fixed pool of
+`workers` threads rather than holding a web worker for up to two minutes.
+Clients poll GET /api/jobs/<id> or subscribe to /api/jobs/<id>/events.
+
+At most `max_pending` jobs may be queued or running. Past that, submit()
+raises QueueFull so the endpoint can answer 503 at once, before it builds
+a backlog nobody will wait for.
+
+A job moves queued -> running -> done | failed, with a 0-1 `progress` and
+a `stage` label along the way. Jobs live in memory and each change is
+passed to `persist` (a Mongo write in app.py). `lookup` reads a job this
+process doesn't hold, so a poll can land on any worker. Finished jobs are
+dropped from memory after `ttl` seconds.
+"""
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+FINISHED = ("done", "failed")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    def __init__(self, workers=4, max_pending=50, ttl=3600, persist=None, lookup=None):
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.persist = persist
+        self.lookup = lookup
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self._jobs = {}
+        self._pending = 0
+        self._changed = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+
+    def submit(self, kind, fn, owner=None):
+        """Queue `fn(report)` and return the new job; raises QueueFull when saturated.
+
+        `fn` gets a `report(progress, stage)` callback and returns the
+        JSON-able result.
+        """
+        with self._changed:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise QueueFull(f"{self._pending} jobs already pending")
+            self._pending += 1
+            self.submitted += 1
+            self._prune()
+            now = datetime.now()
+            job = {
+                "id": secrets.token_urlsafe(16), "kind": kind, "owner": owner,
+                "status": "queued", "progress": 0.0, "stage": "queued",
+                "result": None, "error": None, "version": 0,
+                "created_at": now, "updated_at": now, "finished_at": None
+            }
+            self._jobs[job["id"]] = job
+        self._save(job)
+        self._executor.submit(self._run, job["id"], fn)
+        return dict(job)
+
+    def _run(self, job_id, fn):
+        self._update(job_id, status="running", stage="running", progress=0.05)
+        try:
+            result = fn(lambda progress, stage=None: self._update(job_id, progress=progress, stage=stage))
+        except Exception as e:
+            print(f"Job Error ({job_id}): {e}")
+            self.failed += 1
+            self._update(job_id, status="failed", stage="failed", error=str(e), finished=True)
+        else:
+            self.completed += 1
+            self._update(job_id, status="done", stage="done", progress=1.0, result=result, finished=True)
+
+    def _update(self, job_id, finished=False, **changes):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update((k, v) for k, v in changes.items() if v is not None)
+            job["version"] += 1
+            job["updated_at"] = datetime.now()
+            if finished:
+                job["finished_at"] = job["updated_at"]
+                self._pending -= 1
+            snapshot = dict(job)
+            self._changed.notify_all()
+        self._save(snapshot)
+
+    def _save(self, job):
+        if self.persist:
+            try:
+                self.persist(job)
+            except Exception as e:
+                print(f"Job Persist Error: {e}")
+
+    def _prune(self):
+        cutoff = datetime.now() - timedelta(seconds=self.ttl)
+        for job_id in [i for i, j in self._jobs.items() if j["finished_at"] and j["finished_at"] < cutoff]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        return self.lookup(job_id) if self.lookup else None
+
+    def wait(self, job_id, after_version=-1, timeout=15):
+        """Block until the job's version passes `after_version`, then return it.
+
+        Returns the current job on timeout and None if it doesn't exist.
+        Jobs held by another process are re-read once a second.
+        """
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while job_id in self._jobs:
+                job = self._jobs[job_id]
+                remaining = deadline - time.monotonic()
+                if job["version"] > after_version or remaining <= 0:
+                    return dict(job)
+                self._changed.wait(remaining)
+        job = self.get(job_id)
+        if job is not None and job.get("version", 0) <= after_version and job["status"] not in FINISHED:
+            time.sleep(min(1.0, max(deadline - time.monotonic(), 0)))
+            job = self.get(job_id)
+        return job
+
+    def stats(self):
+        with self._changed:
+            pending = self._pending
+        return {
+            "pending": pending,
+            "max_pending": self.max_pending,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected
+        }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
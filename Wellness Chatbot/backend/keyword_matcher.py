@@ -0,0 +1,86 @@
+"""
+Compiled multi-pattern keyword matcher.
+
+All keyword lists used to classify a chat message (crisis words, intents,
+mood words, knowledge-base conditions...) are merged into one trie-shaped
+regular expression. A single scan of the message returns every category that
+was hit, instead of one `any(w in msg for w in words)` loop per list.
+
+Matches respect word boundaries ("pain" does not fire on "painting") while
+still accepting common inflections ("pains", "bleeding", "stressed").
+Multi-word terms match across any run of spaces or hyphens, so "self harm"
+also catches "self-harm".
+"""
+import re
+
+# Inflections accepted after a term, tried longest first
+SUFFIXES = ("ing", "es", "ed", "s")
+
+
+def _normalize(term):
+    return " ".join(term.lower().replace("-", " ").split())
+
+
+class KeywordMatcher:
+    def __init__(self):
+        self._categories = {}  # term -> set of categories
+        self._pattern = None
+
+    def add(self, category, terms):
+        for term in terms:
+            term = _normalize(term)
+            if term:
+                self._categories.setdefault(term, set()).add(category)
+        self._pattern = None
+        return self
+
+    def compile(self):
+        trie = {}
+        for term in self._categories:
+            node = trie
+            for ch in term:
+                node = node.setdefault(ch, {})
+            node[""] = True
+        body = self._trie_regex(trie) if trie else r"(?!x)x"
+        suffixes = "|".join(SUFFIXES)
+        # Zero-width lookahead so overlapping terms ("chest pain" and "pain")
+        # are all reported; the trie is greedy, giving the longest term per start.
+        self._pattern = re.compile(rf"(?=\b({body})(?:{suffixes})?\b)")
+        return self
+
+    def _trie_regex(self, node):
+        is_end = "" in node
+        branches = []
+        for ch in sorted(k for k in node if k):
+            piece = r"[\s\-]+" if ch == " " else re.escape(ch)
+            branches.append(piece + self._trie_regex(node[ch]))
+        if not branches:
+            return ""
+        inner = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Optional continuation is greedy, so longer terms win over prefixes
+        return f"(?:{inner})?" if is_end else inner
+
+    def find_terms(self, text):
+        """Return the set of known terms found in `text`."""
+        if self._pattern is None:
+            self.compile()
+        found = set()
+        for m in self._pattern.finditer(text.lower()):
+            term = _normalize(m.group(1))
+            found.add(term)
+            # Shorter multi-word prefixes at the same start ("blood" inside
+            # "blood pressure") are terms in their own right
+            words = term.split(" ")
+            for i in range(1, len(words)):
+                prefix = " ".join(words[:i])
+                if prefix in self._categories:
+                    found.add(prefix)
+        return found
+
+    def match(self, text):
+        """Return {category: set(matched terms)} for every category hit."""
+        hits = {}
+        for term in self.find_terms(text):
+            for category in self._categories.get(term, ()):
+                hits.setdefault(category, set()).add(term)
+        return hits
@@ -0,0 +1,101 @@
+"""
+Indexed medical knowledge base.
+
+Conditions live in an external JSON file and are loaded into an inverted
+index from term (condition name or symptom) to the conditions it points at.
+A message is scored against every condition its terms hit, so matching cost
+depends on how many terms the message contains, not on how big the KB is.
+The file is re-read when it changes on disk, without a restart.
+"""
+import json
+import os
+import threading
+import time
+
+NAME_WEIGHT = 2.0     # the message names the condition outright
+SYMPTOM_WEIGHT = 1.0  # the message mentions one of its symptoms
+
+
+def _term(text):
+    return " ".join(text.lower().replace("-", " ").split())
+
+
+class KnowledgeBase:
+    def __init__(self, path, reload_interval=5):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.conditions = {}
+        self.index = {}
+        self.loaded_at = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """(Re)build the index from disk and swap it in atomically."""
+        with open(self.path, encoding="utf-8") as f:
+            conditions = json.load(f)["conditions"]
+        index = {}
+        for name, data in conditions.items():
+            entries = [(_term(name), NAME_WEIGHT)] + [(_term(s), SYMPTOM_WEIGHT) for s in data.get("symptoms", [])]
+            for term, weight in entries:
+                postings = index.setdefault(term, {})
+                postings[name] = max(postings.get(name, 0.0), weight)
+        mtime = os.path.getmtime(self.path)
+        # Readers grab one reference, so they never see a half-built index
+        self.conditions, self.index = conditions, index
+        self._mtime = mtime
+        self.loaded_at = time.time()
+        return len(conditions)
+
+    def reload_if_changed(self):
+        """Reload when the file's mtime moved; checks at most every reload_interval s.
+
+        Returns True when a reload happened.
+        """
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return False
+        with self._lock:
+            if now - self._checked_at < self.reload_interval:
+                return False
+            self._checked_at = now
+            try:
+                if os.path.getmtime(self.path) == self._mtime:
+                    return False
+                self.load()
+            except (OSError, ValueError, KeyError) as e:
+                # Keep serving the previous index if the new file is broken
+                print(f"Knowledge Base Reload Error: {e}")
+                return False
+        return True
+
+    def terms(self):
+        return list(self.index)
+
+    def rank(self, terms, top_k=3):
+        """Score conditions hit by `terms`; return the top_k as (name, score, matched_terms)."""
+        conditions, index = self.conditions, self.index
+        scores = {}
+        matched = {}
+        for term in terms:
+            for name, weight in index.get(_term(term), {}).items():
+                scores[name] = scores.get(name, 0.0) + weight
+                matched.setdefault(name, set()).add(term)
+        ranked = sorted(
+            (n for n in scores if n in conditions),
+            key=lambda n: (-scores[n], -len(matched[n]), n)
+        )
+        return [(n, scores[n], sorted(matched[n])) for n in ranked[:top_k]]
+
+    def get(self, name):
+        return self.conditions.get(name)
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "conditions": len(self.conditions),
+            "terms": len(self.index),
+            "loaded_at": self.loaded_at
+        }
@@ -0,0 +1,500 @@
+"""
+LLM provider router for WellBot.
+
+Replaces the hand-written Groq -> Gemini -> Ollama fallback ladders with a
+single router. Every provider gets its own circuit breaker, a rolling health
+score and a timeout budget, so a provider that is down is skipped instantly
+instead of costing every request its full timeout.
+
+Providers can also carry native async callables (see attach_async) for the
+ASGI server; the a* methods fall back to running the blocking call on a
+worker thread for providers that don't.
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class AllProvidersFailed(Exception):
+    """Raised when every provider in a chain failed or was skipped."""
+
+
+class CircuitBreaker:
+    """Classic closed -> open -> half-open breaker.
+
+    After `failure_threshold` consecutive failures the breaker opens and all
+    calls are rejected for `reset_timeout` seconds. Then a single half-open
+    probe is let through: success closes the breaker, failure re-opens it.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=3, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            # Half-open: exactly one probe at a time
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN:
+                self._trip()
+                return
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self._trip()
+
+    def half_open(self):
+        """End an open period early: the next real call is the half-open probe."""
+        with self._lock:
+            if self.state == self.OPEN:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+
+    def release_probe(self):
+        """Give back a half-open probe slot whose call was cancelled."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _trip(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+
+
+class Provider:
+    """One LLM backend.
+
+    `call(*args, timeout=..., **kwargs)` returns the full reply text and
+    `stream(*args, timeout=..., **kwargs)` (optional) yields text chunks.
+    `acall` and `astream` are the optional coroutine / async generator forms.
+    """
+
+    def __init__(self, name, call, stream=None, timeout=30, failure_threshold=3, reset_timeout=30,
+                 acall=None, astream=None):
+        self.name = name
+        self.call = call
+        self.stream = stream
+        self.acall = acall
+        self.astream = astream
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.successes = 0
+        self.failures = 0
+        self.skipped = 0
+        self.avg_latency = None
+        # Exponentially weighted success rate, 1.0 = perfectly healthy
+        self.success_rate = 1.0
+        self._lock = threading.Lock()
+
+    def record(self, ok, latency=None):
+        with self._lock:
+            if ok:
+                self.successes += 1
+            else:
+                self.failures += 1
+            self.success_rate = 0.8 * self.success_rate + 0.2 * (1.0 if ok else 0.0)
+            if latency is not None:
+                self.avg_latency = latency if self.avg_latency is None else 0.8 * self.avg_latency + 0.2 * latency
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    @property
+    def health(self):
+        """0-100 score from the rolling success rate, penalised by slowness."""
+        score = self.success_rate
+        if self.avg_latency is not None and self.timeout:
+            score *= max(0.0, 1.0 - 0.5 * min(self.avg_latency / self.timeout, 1.0))
+        return round(score * 100)
+
+    def snapshot(self):
+        return {
+            "name": self.name,
+            "state": self.breaker.state,
+            "health": self.health,
+            "successes": self.successes,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "avg_latency_ms": round(self.avg_latency * 1000) if self.avg_latency is not None else None,
+            "timeout": self.timeout
+        }
+
+
+class LLMRouter:
+    """Routes a request through an ordered chain of providers.
+
+    Providers whose breaker is open are skipped without being called.
+    Degraded providers (health below `degraded_health`) are moved to the end
+    of the chain so healthier ones are tried first. `budget` caps the total
+    time a single request may spend across all providers.
+    """
+
+    def __init__(self, budget=90, degraded_health=30, on_error=None, hedge_workers=8):
+        self.providers = {}
+        self.budget = budget
+        self.degraded_health = degraded_health
+        self.on_error = on_error
+        self.hedge_workers = hedge_workers
+        self.hedges_fired = 0
+        self.hedges_skipped = 0
+        self._hedge_slots = threading.BoundedSemaphore(hedge_workers)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def register(self, provider):
+        self.providers[provider.name] = provider
+        return provider
+
+    def attach_async(self, name, acall=None, astream=None):
+        """Give a registered provider native async call/stream functions."""
+        provider = self.providers.get(name)
+        if provider is None:
+            return None
+        if acall is not None:
+            provider.acall = acall
+        if astream is not None:
+            provider.astream = astream
+        return provider
+
+    def has_any(self, chain):
+        return any(name in self.providers for name in chain)
+
+    def _ordered(self, chain):
+        providers = [self.providers[name] for name in chain if name in self.providers]
+        # Stable sort keeps the configured priority within each group
+        return sorted(providers, key=lambda p: p.health < self.degraded_health)
+
+    def _report(self, provider, error):
+        print(f"{provider.name} Error: {error}")
+        if self.on_error:
+            try:
+                self.on_error(provider.name, error)
+            except Exception as e:
+                print(f"Router error hook failed: {e}")
+
+    def _attempt(self, provider, timeout, args, kwargs):
+        """Call one provider and feed the outcome into its breaker and health."""
+        started = time.monotonic()
+        try:
+            reply = provider.call(*args, timeout=timeout, **kwargs)
+            if not reply:
+                raise ValueError("Empty response")
+        except Exception as e:
+            provider.record(False, time.monotonic() - started)
+            self._report(provider, e)
+            raise
+        provider.record(True, time.monotonic() - started)
+        return reply
+
+    def complete(self, chain, *args, **kwargs):
+        """Return (reply, provider_name) from the first provider that answers."""
+        deadline = time.monotonic() + self.budget
+        last_error = None
+        for provider in self._ordered(chain):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not provider.breaker.allow_request():
+                provider.skipped += 1
+                continue
+            try:
+                return self._attempt(provider, min(provider.timeout, remaining), args, kwargs), provider.name
+            except Exception as e:
+                last_error = e
+        raise AllProvidersFailed(str(last_error) if last_error else "No provider available")
+
+    def _pool(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.hedge_workers, thread_name_prefix="llm-hedge")
+            return self._executor
+
+    def _start(self, provider, timeout, args, kwargs):
+        """Run one attempt on its own thread, outside the hedge pool; returns a Future."""
+        future = Future()
+
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(self._attempt(provider, timeout, args, kwargs))
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="llm-primary", daemon=True).start()
+        return future
+
+    def hedged_complete(self, chain, *args, delay=1.0, **kwargs):
+        """Latency-optimised variant of complete().
+
+        The first available provider is called straight away. If it has not
+        answered within `delay` seconds the next one is fired as well, and
+        whichever valid reply lands first wins. A provider that fails is
+        replaced by the next one in the chain. Losers cannot be interrupted
+        mid-request (blocking SDK calls), so a running one finishes in the
+        background; its outcome still updates that provider's breaker and
+        health score.
+
+        Only the hedges use the shared pool of `hedge_workers` threads; the
+        primary gets a thread of its own, so slow primaries can't starve
+        other requests' hedges. When every hedge slot is busy the hedge
+        waits another `delay` rather than queueing behind them.
+        """
+        deadline = time.monotonic() + self.budget
+        candidates = self._ordered(chain)
+        finished = queue.Queue()
+        in_flight = {}
+        last_error = None
+
+        def launch(hedge=False):
+            """True once a call is started, False when the chain is spent, None if the pool is full."""
+            if hedge and not self._hedge_slots.acquire(blocking=False):
+                self.hedges_skipped += 1
+                return None
+            while candidates:
+                provider = candidates.pop(0)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if not provider.breaker.allow_request():
+                    provider.skipped += 1
+                    continue
+                timeout = min(provider.timeout, remaining)
+                if hedge:
+                    self.hedges_fired += 1
+                    future = self._pool().submit(self._attempt, provider, timeout, args, kwargs)
+                    future.add_done_callback(lambda f: self._hedge_slots.release())
+                else:
+                    future = self._start(provider, timeout, args, kwargs)
+                future.add_done_callback(lambda f, p=provider: finished.put((p, f)))
+                in_flight[future] = provider
+                return True
+            if hedge:
+                self._hedge_slots.release()
+            return False
+
+        hedge_pending = launch()
+        try:
+            while in_flight:
+                wait = delay if hedge_pending else deadline - time.monotonic()
+                try:
+                    provider, future = finished.get(timeout=max(min(wait, deadline - time.monotonic()), 0))
+                except queue.Empty:
+                    if hedge_pending and time.monotonic() < deadline:
+                        hedge_pending = launch(hedge=True) is None
+                        continue
+                    break
+                in_flight.pop(future)
+                if future.cancelled():
+                    continue
+                if future.exception() is None:
+                    return future.result(), provider.name
+                last_error = future.exception()
+                if not in_flight:
+                    # Nothing left racing - promote the next provider immediately
+                    launch()
+        finally:
+            for future, provider in in_flight.items():
+                # An attempt that never started gives back the probe it reserved
+                if future.cancel():
+                    provider.breaker.release_probe()
+        raise AllProvidersFailed(str(last_error) if last_error else "No provider available")
+
+    def stream(self, chain, *args, **kwargs):
+        """Yield (provider_name, chunk) pairs from the first provider that streams.
+
+        A provider that fails before emitting anything falls through to the
+        next one. Once chunks have reached the caller the reply is not
+        restarted on another provider; AllProvidersFailed is raised instead so
+        the caller can keep the partial text without treating it as complete.
+        """
+        deadline = time.monotonic() + self.budget
+        last_error = None
+        for provider in self._ordered(chain):
+            if provider.stream is None:
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not provider.breaker.allow_request():
+                provider.skipped += 1
+                continue
+            started = time.monotonic()
+            emitted = False
+            try:
+                for chunk in provider.stream(*args, timeout=min(provider.timeout, remaining), **kwargs):
+                    emitted = True
+                    yield provider.name, chunk
+            except Exception as e:
+                provider.record(False, time.monotonic() - started)
+                self._report(provider, e)
+                last_error = e
+                if emitted:
+                    raise AllProvidersFailed(f"{provider.name} stream interrupted: {e}") from e
+                continue
+            except BaseException:
+                # The caller went away (GeneratorExit): not the provider's fault
+                provider.breaker.release_probe()
+                raise
+            if emitted:
+                provider.record(True, time.monotonic() - started)
+                return
+            provider.record(False, time.monotonic() - started)
+            last_error = ValueError("Empty response")
+        raise AllProvidersFailed(str(last_error) if last_error else "No provider available")
+
+    # ---- async variants, for use on an event loop ----
+    async def _aattempt(self, provider, timeout, args, kwargs):
+        started = time.monotonic()
+        try:
+            if provider.acall is not None:
+                reply = await asyncio.wait_for(provider.acall(*args, timeout=timeout, **kwargs), timeout)
+            else:
+                reply = await asyncio.to_thread(provider.call, *args, timeout=timeout, **kwargs)
+            if not reply:
+                raise ValueError("Empty response")
+        except asyncio.CancelledError:
+            # Lost a hedge race: neither a success nor a failure
+            provider.breaker.release_probe()
+            raise
+        except Exception as e:
+            provider.record(False, time.monotonic() - started)
+            self._report(provider, e)
+            raise
+        provider.record(True, time.monotonic() - started)
+        return reply
+
+    async def acomplete(self, chain, *args, **kwargs):
+        """Async complete(): (reply, provider_name) from the first provider that answers."""
+        deadline = time.monotonic() + self.budget
+        last_error = None
+        for provider in self._ordered(chain):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not provider.breaker.allow_request():
+                provider.skipped += 1
+                continue
+            try:
+                return await self._aattempt(provider, min(provider.timeout, remaining), args, kwargs), provider.name
+            except Exception as e:
+                last_error = e
+        raise AllProvidersFailed(str(last_error) if last_error else "No provider available")
+
+    async def ahedged_complete(self, chain, *args, delay=1.0, **kwargs):
+        """Async hedged_complete(). Losers are tasks, so they are cancelled outright."""
+        deadline = time.monotonic() + self.budget
+        candidates = self._ordered(chain)
+        in_flight = {}
+        last_error = None
+
+        def launch():
+            while candidates:
+                provider = candidates.pop(0)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                if not provider.breaker.allow_request():
+                    provider.skipped += 1
+                    continue
+                task = asyncio.ensure_future(self._aattempt(provider, min(provider.timeout, remaining), args, kwargs))
+                in_flight[task] = provider
+                return True
+            return False
+
+        hedge_pending = launch()
+        try:
+            while in_flight:
+                wait = delay if hedge_pending else deadline - time.monotonic()
+                done, _ = await asyncio.wait(in_flight, timeout=max(wait, 0), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if hedge_pending:
+                        hedge_pending = False
+                        launch()
+                        continue
+                    break
+                for task in done:
+                    provider = in_flight.pop(task)
+                    if task.exception() is None:
+                        return task.result(), provider.name
+                    last_error = task.exception()
+                if not in_flight:
+                    launch()
+        finally:
+            for task, provider in in_flight.items():
+                # A task cancelled before it starts never reaches _aattempt's handler
+                if task.cancel():
+                    provider.breaker.release_probe()
+        raise AllProvidersFailed(str(last_error) if last_error else "No provider available")
+
+    async def astream(self, chain, *args, **kwargs):
+        """Async stream(): yields (provider_name, chunk) with the same fallback rules.
+
+        Only providers with an `astream` take part.
+        """
+        deadline = time.monotonic() + self.budget
+        last_error = None
+        for provider in self._ordered(chain):
+            if provider.astream is None:
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not provider.breaker.allow_request():
+                provider.skipped += 1
+                continue
+            started = time.monotonic()
+            emitted = False
+            try:
+                async for chunk in provider.astream(*args, timeout=min(provider.timeout, remaining), **kwargs):
+                    emitted = True
+                    yield provider.name, chunk
+            except Exception as e:
+                provider.record(False, time.monotonic() - started)
+                self._report(provider, e)
+                last_error = e
+                if emitted:
+                    raise AllProvidersFailed(f"{provider.name} stream interrupted: {e}") from e
+                continue
+            except BaseException:
+                # The caller went away (CancelledError): not the provider's fault
+                provider.breaker.release_probe()
+                raise
+            if emitted:
+                provider.record(True, time.monotonic() - started)
+                return
+            provider.record(False, time.monotonic() - started)
+            last_error = ValueError("Empty response")
+        raise AllProvidersFailed(str(last_error) if last_error else "No provider available")
+
+    def snapshot(self):
+        return [p.snapshot() for p in self.providers.values()]
@@ -0,0 +1,59 @@
+"""
+Maintenance commands for derived collections.
+
+Usage:
+    python maintenance.py rebuild-user-stats
+    python maintenance.py rebuild-rollups [--since YYYY-MM-DD]
+    python maintenance.py tag-topics
+"""
+import argparse
+import os
+from datetime import datetime
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from user_stats import rebuild_user_stats
+from analytics_rollup import rebuild_rollups
+from topics import tag_chats
+
+
+def get_db():
+    load_dotenv()
+    return MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/wellbot")).get_default_database()
+
+
+def cmd_rebuild_user_stats(db, args):
+    users = rebuild_user_stats(db.chats, db.user_stats, batch_size=args.batch_size)
+    print(f"Rebuilt stats for {users} users")
+
+
+def cmd_rebuild_rollups(db, args):
+    since = datetime.strptime(args.since, "%Y-%m-%d") if args.since else None
+    rows = rebuild_rollups(db.chats, db.chat_rollups, since=since, batch_size=args.batch_size)
+    print(f"Wrote {rows} rollup buckets")
+
+
+def cmd_tag_topics(db, args):
+    chats = tag_chats(db.chats, batch_size=args.batch_size)
+    print(f"Tagged {chats} chats; run rebuild-rollups to count them")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WellBot maintenance commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild = sub.add_parser("rebuild-user-stats", help="recompute user_stats from the chats collection")
+    rebuild.add_argument("--batch-size", type=int, default=500)
+    rebuild.set_defaults(func=cmd_rebuild_user_stats)
+    rollups = sub.add_parser("rebuild-rollups", help="recompute chat_rollups buckets from the chats collection")
+    rollups.add_argument("--since", help="only rebuild days from this date (YYYY-MM-DD)")
+    rollups.add_argument("--batch-size", type=int, default=500)
+    rollups.set_defaults(func=cmd_rebuild_rollups)
+    tag = sub.add_parser("tag-topics", help="set health topics on chats stored before topic tagging")
+    tag.add_argument("--batch-size", type=int, default=500)
+    tag.set_defaults(func=cmd_tag_topics)
+
+    args = parser.parse_args(argv)
+    args.func(get_db(), args)
+
+
+if __name__ == '__main__':
+    main()
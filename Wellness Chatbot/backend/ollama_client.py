@@ -0,0 +1,148 @@
+"""
+Pooled HTTP client for the local Ollama server.
+
+One requests.Session is shared by every thread. Its keep-alive pool holds
+up to `pool_size` open connections, so a chat reuses an open socket instead
+of paying a TCP handshake per call. Connection errors are retried with
+exponential backoff; the request never reached Ollama, so that is safe even
+for POSTs. Read timeouts and HTTP errors are not retried, because the router
+already falls back to the next provider.
+
+Each call measures wall time and splits it using the durations Ollama
+reports: `generation` is Ollama's own total_duration, `overhead` is the rest
+(connect, queueing, transfer). Every measurement goes to `on_metrics` when
+set, and rolling averages are kept for stats().
+"""
+import json
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class OllamaClient:
+    def __init__(self, base_url="http://localhost:11434", pool_size=10, retries=2, backoff=0.25,
+                 connect_timeout=3.05, keep_alive=None, on_metrics=None):
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.keep_alive = keep_alive
+        self.on_metrics = on_metrics
+        self.requests = 0
+        self.errors = 0
+        self.avg_overhead = None
+        self.avg_generation = None
+        self._lock = threading.Lock()
+
+        # Only connection failures are retried: read=0 and status=0 mean a
+        # request Ollama may have started is never sent twice
+        retry = Retry(total=retries, connect=retries, read=0, status=0, other=0,
+                      backoff_factor=backoff, raise_on_status=False)
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+
+    def payload(self, model, prompt, stream, images=None):
+        payload = {"model": model, "prompt": prompt, "stream": stream}
+        if images:
+            payload["images"] = images
+        if self.keep_alive is not None:
+            # How long Ollama keeps the model loaded after this call
+            payload["keep_alive"] = self.keep_alive
+        return payload
+
+    def generate(self, model, prompt, images=None, timeout=60):
+        """Full reply text for `prompt`."""
+        started = time.monotonic()
+        try:
+            response = self.session.post(
+                f"{self.base_url}/api/generate", json=self.payload(model, prompt, False, images),
+                timeout=(self.connect_timeout, timeout)
+            )
+            response.raise_for_status()
+            body = response.json()
+        except Exception:
+            self._record("generate", model, time.monotonic() - started, None, ok=False)
+            raise
+        self._record("generate", model, time.monotonic() - started, body.get("total_duration"))
+        return body["response"]
+
+    def stream(self, model, prompt, timeout=60):
+        """Yield reply chunks as Ollama produces them."""
+        started = time.monotonic()
+        generation = None
+        try:
+            with self.session.post(
+                f"{self.base_url}/api/generate", json=self.payload(model, prompt, True),
+                timeout=(self.connect_timeout, timeout), stream=True
+            ) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    part = json.loads(line)
+                    if part.get("response"):
+                        yield part["response"]
+                    if part.get("done"):
+                        generation = part.get("total_duration")
+                        break
+        except Exception:
+            self._record("stream", model, time.monotonic() - started, None, ok=False)
+            raise
+        self._record("stream", model, time.monotonic() - started, generation)
+
+    def ping(self, timeout=3):
+        """True if the server answers /api/tags."""
+        try:
+            return self.session.get(f"{self.base_url}/api/tags", timeout=(self.connect_timeout, timeout)).ok
+        except requests.RequestException:
+            return False
+
+    def models(self, timeout=3):
+        """Names of the locally pulled models, or None if the server is unreachable."""
+        try:
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=(self.connect_timeout, timeout))
+            response.raise_for_status()
+        except requests.RequestException:
+            return None
+        return [m["name"] for m in response.json().get("models", [])]
+
+    def warm(self):
+        """Open a pooled connection ahead of the first chat."""
+        if not self.ping():
+            print(f"Ollama not reachable at {self.base_url}; connections will be opened on demand")
+
+    def _record(self, endpoint, model, wall, total_duration_ns, ok=True):
+        generation = total_duration_ns / 1e9 if total_duration_ns else None
+        overhead = max(wall - generation, 0.0) if generation is not None else None
+        with self._lock:
+            self.requests += 1
+            if not ok:
+                self.errors += 1
+            if overhead is not None:
+                self.avg_overhead = overhead if self.avg_overhead is None else 0.8 * self.avg_overhead + 0.2 * overhead
+                self.avg_generation = generation if self.avg_generation is None else 0.8 * self.avg_generation + 0.2 * generation
+        if self.on_metrics:
+            try:
+                self.on_metrics({"endpoint": endpoint, "model": model, "ok": ok, "wall": wall,
+                                 "generation": generation, "overhead": overhead})
+            except Exception as e:
+                print(f"Ollama metrics hook failed: {e}")
+
+    def _connections_opened(self):
+        pools = self._adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def stats(self):
+        return {
+            "base_url": self.base_url,
+            "requests": self.requests,
+            "errors": self.errors,
+            "connections_opened": self._connections_opened(),
+            "avg_overhead_ms": round(self.avg_overhead * 1000) if self.avg_overhead is not None else None,
+            "avg_generation_ms": round(self.avg_generation * 1000) if self.avg_generation is not None else None
+        }
+
+    def close(self):
+        self.session.close()
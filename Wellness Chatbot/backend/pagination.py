@@ -0,0 +1,55 @@
+"""
+Keyset pagination over (timestamp, _id), newest first.
+
+A page ends with an opaque cursor holding the last row's timestamp and _id.
+The next page asks for rows strictly "older" than that pair. This walks the
+timestamp index directly, unlike skip(), which re-reads every earlier row.
+Rows inserted while a client is paging never shift or duplicate its pages.
+"""
+import base64
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+
+SORT = [("timestamp", -1), ("_id", -1)]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(doc):
+    raw = f"{doc['timestamp'].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Return (timestamp, ObjectId) from a cursor made by encode_cursor."""
+    try:
+        timestamp, oid = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(timestamp), ObjectId(oid)
+    except (ValueError, InvalidId, UnicodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def after_cursor(query, cursor):
+    """Narrow `query` to rows that sort after `cursor` in SORT order."""
+    if not cursor:
+        return query
+    timestamp, oid = decode_cursor(cursor)
+    keyset = {"$or": [
+        {"timestamp": {"$lt": timestamp}},
+        {"timestamp": timestamp, "_id": {"$lt": oid}}
+    ]}
+    return {"$and": [query, keyset]} if query else keyset
+
+
+def fetch_page(collection, query, projection, limit, cursor=None):
+    """Return (rows, next_cursor); next_cursor is None on the last page."""
+    docs = list(collection.find(after_cursor(query, cursor), projection).sort(SORT).limit(limit + 1))
+    more = len(docs) > limit
+    docs = docs[:limit]
+    next_cursor = encode_cursor(docs[-1]) if more else None
+    for doc in docs:
+        doc.pop("_id", None)
+    return docs, next_cursor
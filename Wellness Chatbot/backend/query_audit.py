@@ -0,0 +1,82 @@
+"""
+Query-shape audit: runs explain() on the filter/sort shape behind each hot
+route and fails if any of them would scan a whole collection.
+
+Usage:
+    python query_audit.py [--ensure]
+
+--ensure creates the indexes from db_indexes.py before auditing. Exits 1
+when a COLLSCAN is found, so it can gate a deploy.
+"""
+import os
+import sys
+from datetime import datetime
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from db_indexes import ensure_indexes
+
+SAMPLE_EMAIL = "audit@example.com"
+TODAY = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+# (route, collection, filter, sort); routes are the paths in app.py
+QUERY_SHAPES = [
+    ("admin_auth_check (every /api/admin/* route)", "users", {"token": "x", "role": "admin"}, None),
+    ("/login", "users", {"email": SAMPLE_EMAIL, "password": "x"}, None),
+    ("/signup, /auth/google/callback", "users", {"email": SAMPLE_EMAIL}, None),
+    ("/api/admin/stats", "users", {}, [("created_at", -1)]),
+    ("maintenance.py rebuild-user-stats", "chats", {"user_email": {"$exists": True}}, [("user_email", 1), ("timestamp", -1)]),
+    ("/api/admin/chat-logs, /api/admin/ai-decisions", "chats", {}, [("timestamp", -1), ("_id", -1)]),
+    ("/api/admin/chat-logs?email=", "chats", {"user_email": SAMPLE_EMAIL}, [("timestamp", -1), ("_id", -1)]),
+    ("/api/admin/user-activity?sort=chat_count", "user_stats", {}, [("chat_count", -1), ("_id", 1)]),
+    ("/api/admin/user-activity?sort=image_count", "user_stats", {}, [("image_count", -1), ("_id", 1)]),
+    ("/api/admin/user-activity?sort=last_active", "user_stats", {}, [("last_active", -1), ("_id", 1)]),
+    ("maintenance.py rebuild-rollups", "chats", {"timestamp": {"$gte": TODAY}}, None),
+    ("/api/admin/stats, /api/admin/chatbot-stats, /api/admin/ai-usage", "chat_rollups",
+     {"granularity": "day", "bucket": {"$gte": TODAY}}, None),
+    ("/api/admin/health-queries", "chat_rollups", {"granularity": "topic", "bucket": {"$gte": TODAY}}, None),
+    ("/api/admin/crisis-alerts", "chats", {"is_crisis": True}, [("timestamp", -1)]),
+    ("/api/admin/stats", "issues", {}, [("timestamp", -1)]),
+    ("/api/admin/error-logs", "error_logs", {}, [("timestamp", -1)]),
+]
+
+
+def find_stages(plan, stage):
+    """Return True if `stage` appears anywhere in an explain() plan tree."""
+    if isinstance(plan, dict):
+        if plan.get("stage") == stage:
+            return True
+        return any(find_stages(v, stage) for v in plan.values())
+    if isinstance(plan, list):
+        return any(find_stages(v, stage) for v in plan)
+    return False
+
+
+def audit(db, shapes=QUERY_SHAPES):
+    """Return [(route, collection, plan_has_collscan)] for each query shape."""
+    results = []
+    for route, collection, query, sort in shapes:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.limit(1).explain().get("queryPlanner", {}).get("winningPlan", {})
+        results.append((route, collection, find_stages(plan, "COLLSCAN")))
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    load_dotenv()
+    db = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/wellbot")).get_default_database()
+    if "--ensure" in argv:
+        ensure_indexes(db)
+
+    failures = 0
+    for route, collection, collscan in audit(db):
+        failures += collscan
+        print(f"{'COLLSCAN' if collscan else 'ok':>8}  {collection:<12} {route}")
+    print(f"\n{len(QUERY_SHAPES) - failures}/{len(QUERY_SHAPES)} query shapes use an index")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
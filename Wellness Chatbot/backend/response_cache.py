@@ -0,0 +1,87 @@
+"""
+Exact-match cache for deterministic LLM prompts.
+
+Two tiers: an in-process TTL/LRU cache answers repeats in microseconds, and
+an optional shared Mongo collection (with a TTL index) lets every worker
+reuse answers another worker already paid for.
+"""
+import hashlib
+import re
+from datetime import datetime, timedelta
+from ttl_cache import TTLCache
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so indentation-only differences hit the same entry."""
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+class ResponseCache:
+    def __init__(self, maxsize=1000, ttl=86400, collection=None):
+        self.ttl = ttl
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.collection = collection
+        self.shared_hits = 0
+        self.shared_errors = 0
+        self._index_ready = False
+
+    @staticmethod
+    def make_key(namespace, prompt, model):
+        raw = f"{namespace}\x00{model}\x00{normalize_prompt(prompt)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _ensure_index(self):
+        if not self._index_ready:
+            # Mongo's TTL monitor removes documents once expires_at has passed
+            self.collection.create_index("expires_at", expireAfterSeconds=0)
+            self._index_ready = True
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None or self.collection is None:
+            return value
+        try:
+            doc = self.collection.find_one({"_id": key, "expires_at": {"$gt": datetime.now()}})
+        except Exception as e:
+            self.shared_errors += 1
+            print(f"Response Cache Read Error: {e}")
+            return None
+        if not doc:
+            return None
+        self.shared_hits += 1
+        value = doc["value"]
+        remaining = (doc["expires_at"] - datetime.now()).total_seconds()
+        self.local.set(key, value, ttl=max(remaining, 1))
+        return value
+
+    def set(self, key, value, namespace=None, ttl=None):
+        """Store `value` for `ttl` seconds (the cache's own TTL by default)."""
+        ttl = self.ttl if ttl is None else ttl
+        self.local.set(key, value, ttl=ttl)
+        if self.collection is None:
+            return
+        try:
+            self._ensure_index()
+            now = datetime.now()
+            self.collection.replace_one({"_id": key}, {
+                "_id": key, "namespace": namespace, "value": value,
+                "created_at": now, "expires_at": now + timedelta(seconds=ttl)
+            }, upsert=True)
+        except Exception as e:
+            self.shared_errors += 1
+            print(f"Response Cache Write Error: {e}")
+
+    def stats(self):
+        stats = self.local.stats()
+        # Local misses include lookups the shared tier then answered
+        lookups = self.local.hits + self.local.misses
+        stats.update({
+            "local_hits": self.local.hits,
+            "shared_enabled": self.collection is not None,
+            "shared_hits": self.shared_hits,
+            "shared_errors": self.shared_errors,
+            "hits": self.local.hits + self.shared_hits,
+            "misses": self.local.misses - self.shared_hits,
+            "hit_rate": round((self.local.hits + self.shared_hits) / lookups, 3) if lookups else 0.0
+        })
+        return stats
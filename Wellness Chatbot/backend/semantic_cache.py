@@ -0,0 +1,200 @@
+"""
+Semantic response cache for near-duplicate chat questions.
+
+Messages are embedded with a CPU-only hashed bag-of-words vectoriser (no
+model download, no numpy) and looked up in an in-memory inverted vector
+index partitioned by chat context. A stored reply is served when the cosine
+similarity clears the configured threshold, so paraphrases like "how do I
+sleep better" and "tips for better sleep" share one LLM answer.
+
+Similarity alone is not enough for a health bot: "I am pregnant, can I take
+ibuprofen for a headache" still scores above 0.85 against the same question
+without "pregnant". A stored reply is therefore only served when it covers
+every content word of the new message; anything the question adds is a miss.
+"""
+import hashlib
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Function words carry no topic; negations are deliberately kept so that
+# "I can't sleep" and "I can sleep" do not collapse into one vector.
+STOP_WORDS = {
+    "a", "an", "the", "i", "me", "my", "myself", "we", "our", "you", "your", "it", "its",
+    "is", "am", "are", "was", "were", "be", "been", "being", "do", "does", "did", "doing",
+    "have", "has", "had", "to", "of", "in", "on", "at", "for", "with", "about", "from",
+    "by", "as", "and", "or", "so", "if", "that", "this", "these", "those", "what", "how",
+    "can", "could", "should", "would", "will", "some", "any", "get", "please", "tell",
+    "give", "tips", "tip", "way", "ways", "there", "here", "just", "really", "very"
+}
+NEGATIONS = {"not", "no", "never", "cannot", "can't", "cant", "don't", "dont", "won't", "without"}
+SUFFIXES = ("ing", "edly", "ed", "ly", "er", "est", "es", "s")
+
+
+def stem(word):
+    """Very light suffix stripping so 'sleeping'/'sleeps'/'sleep' share a feature."""
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text):
+    tokens = []
+    for word in re.findall(r"[a-z0-9']+|[^\W\d_]+", text.lower()):
+        if word in NEGATIONS:
+            tokens.append("not")
+        elif word not in STOP_WORDS:
+            tokens.append(stem(word.strip("'")))
+    return [t for t in tokens if t]
+
+
+class HashingVectorizer:
+    """Maps text to an L2-normalised sparse vector {bucket: weight}.
+
+    Features are stemmed words plus adjacent word pairs, hashed into
+    `n_features` buckets with sublinear term frequency.
+    """
+
+    def __init__(self, n_features=2 ** 18, bigram_weight=0.5):
+        self.n_features = n_features
+        self.bigram_weight = bigram_weight
+
+    def _bucket(self, feature):
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % self.n_features
+
+    def transform(self, text):
+        tokens = tokenize(text)
+        counts = {}
+        for token in tokens:
+            b = self._bucket(token)
+            counts[b] = counts.get(b, 0.0) + 1.0
+        for left, right in zip(tokens, tokens[1:]):
+            b = self._bucket(f"{left} {right}")
+            counts[b] = counts.get(b, 0.0) + self.bigram_weight
+        vector = {b: 1.0 + math.log(c) if c >= 1 else c for b, c in counts.items()}
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        if not norm:
+            return {}
+        return {b: w / norm for b, w in vector.items()}
+
+
+class _Partition:
+    """One (mode, language, mood) slice of the index with its own LRU order."""
+
+    def __init__(self):
+        self.entries = OrderedDict()  # entry_id -> (vector, value, expires_at, terms)
+        self.postings = {}            # bucket -> set(entry_id)
+
+    def add(self, entry_id, vector, value, expires_at, terms):
+        self.entries[entry_id] = (vector, value, expires_at, terms)
+        for b in vector:
+            self.postings.setdefault(b, set()).add(entry_id)
+
+    def remove(self, entry_id):
+        vector = self.entries.pop(entry_id)[0]
+        for b in vector:
+            ids = self.postings.get(b)
+            if ids:
+                ids.discard(entry_id)
+                if not ids:
+                    del self.postings[b]
+
+    def best_match(self, vector, terms=None):
+        """Return (similarity, entry_id) of the closest stored vector.
+
+        With `terms`, only entries whose own terms include all of them count.
+        """
+        scores = {}
+        for b, w in vector.items():
+            for entry_id in self.postings.get(b, ()):
+                scores[entry_id] = scores.get(entry_id, 0.0) + w * self.entries[entry_id][0][b]
+        if terms is not None:
+            scores = {i: s for i, s in scores.items() if terms <= self.entries[i][3]}
+        if not scores:
+            return 0.0, None
+        entry_id = max(scores, key=scores.get)
+        return scores[entry_id], entry_id
+
+
+class SemanticCache:
+    def __init__(self, threshold=0.85, max_entries=500, ttl=86400, min_tokens=2, vectorizer=None):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.uncovered = 0
+        self._partitions = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _embed(self, message):
+        tokens = tokenize(message)
+        if len(tokens) < self.min_tokens:
+            # Too little content to judge similarity safely
+            return None, None
+        return self.vectorizer.transform(message) or None, frozenset(tokens)
+
+    def lookup(self, message, partition):
+        """Return (value, similarity) for the closest cached reply, or (None, score)."""
+        vector, terms = self._embed(message)
+        with self._lock:
+            part = self._partitions.get(partition)
+            if vector is None or part is None:
+                self.misses += 1
+                return None, 0.0
+            similarity, entry_id = part.best_match(vector, terms)
+            if entry_id is not None and part.entries[entry_id][2] < time.monotonic():
+                part.remove(entry_id)
+                similarity, entry_id = part.best_match(vector, terms)
+            if entry_id is None or similarity < self.threshold:
+                if similarity < self.threshold and part.best_match(vector)[0] >= self.threshold:
+                    # Close enough, but the message adds words (a condition, an age, ...) the entry lacks
+                    self.uncovered += 1
+                self.misses += 1
+                return None, similarity
+            part.entries.move_to_end(entry_id)
+            self.hits += 1
+            return part.entries[entry_id][1], similarity
+
+    def store(self, message, partition, value):
+        vector, terms = self._embed(message)
+        if vector is None:
+            return False
+        with self._lock:
+            part = self._partitions.setdefault(partition, _Partition())
+            self._next_id += 1
+            part.add(self._next_id, vector, value, time.monotonic() + self.ttl, terms)
+            self.stores += 1
+            while len(part.entries) > self.max_entries:
+                part.remove(next(iter(part.entries)))
+                self.evictions += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._partitions.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "threshold": self.threshold,
+            "partitions": len(self._partitions),
+            "entries": sum(len(p.entries) for p in self._partitions.values()),
+            "max_entries_per_partition": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "uncovered": self.uncovered,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
@@ -0,0 +1,61 @@
+"""
+In-process token -> user cache for auth checks.
+
+The admin dashboard fires a dozen parallel API calls per load and every one
+of them used to look its token up in Mongo. Resolved users are kept in a
+TTL/LRU cache, so only the first call pays the round trip. Unknown tokens
+are not cached, so a newly created account works straight away.
+
+Anything that changes a user's role or token must call invalidate() or
+invalidate_user(). Changes made outside this process (setup_admin.py,
+create_admin.py) become visible once the TTL runs out.
+"""
+import threading
+from ttl_cache import TTLCache
+
+
+class SessionCache:
+    def __init__(self, lookup, maxsize=1000, ttl=60):
+        """`lookup(token)` returns the user document for a token, or None."""
+        self.lookup = lookup
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.invalidations = 0
+        self._tokens_by_email = {}
+        self._lock = threading.Lock()
+
+    def get_user(self, token):
+        if not token:
+            return None
+        user = self.cache.get(token)
+        if user is not None:
+            return user
+        user = self.lookup(token)
+        if user:
+            self.cache.set(token, user)
+            if user.get("email"):
+                with self._lock:
+                    self._tokens_by_email.setdefault(user["email"], set()).add(token)
+        return user
+
+    def has_role(self, token, role):
+        user = self.get_user(token)
+        return bool(user) and user.get("role") == role
+
+    def invalidate(self, token):
+        if self.cache.delete(token):
+            self.invalidations += 1
+
+    def invalidate_user(self, email):
+        """Drop every cached token of a user, e.g. after a role change."""
+        with self._lock:
+            tokens = self._tokens_by_email.pop(email, set())
+        for token in tokens:
+            self.invalidate(token)
+
+    def clear(self):
+        self.cache.clear()
+        with self._lock:
+            self._tokens_by_email.clear()
+
+    def stats(self):
+        return dict(self.cache.stats(), invalidations=self.invalidations)
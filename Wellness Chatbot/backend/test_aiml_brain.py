@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+import unittest
+from aiml_brain import AIMLBrain
+
+AIML_TEMPLATE = """<aiml version="1.0.1" encoding="UTF-8">
+    <category>
+        <pattern>HELLO</pattern>
+        <template>{reply}</template>
+    </category>
+</aiml>
+"""
+
+
+class TestAIMLBrain(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.aiml_path = os.path.join(self.tmp, "wellness.aiml")
+        self.cache_dir = os.path.join(self.tmp, "brain_cache")
+        self.write("Hello from WellBot")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, reply, bump=0):
+        with open(self.aiml_path, "w", encoding="utf-8") as f:
+            f.write(AIML_TEMPLATE.format(reply=reply))
+        if bump:
+            stat = os.stat(self.aiml_path)
+            os.utime(self.aiml_path, (stat.st_atime, stat.st_mtime + bump))
+
+    def test_second_boot_uses_snapshot(self):
+        """Test that a later process bootstraps from the saved brain file"""
+        first = AIMLBrain(self.aiml_path, self.cache_dir)
+        self.assertEqual(first.loaded_from, "aiml")
+        second = AIMLBrain(self.aiml_path, self.cache_dir)
+        self.assertEqual(second.loaded_from, "brain")
+        self.assertEqual(second.respond("HELLO"), "Hello from WellBot")
+
+    def test_hot_reload_swaps_kernel(self):
+        """Test that editing the AIML file swaps in a new kernel and snapshot"""
+        brain = AIMLBrain(self.aiml_path, self.cache_dir)
+        old_kernel = brain.kernel
+        self.write("Hi again", bump=5)
+        self.assertTrue(brain.reload_if_changed())
+        self.assertIsNot(brain.kernel, old_kernel)
+        self.assertEqual(brain.respond("HELLO"), "Hi again")
+        # Only the snapshot for the current file version is kept
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,31 @@
+import unittest
+from datetime import datetime
+from analytics_rollup import bucket_id, bucket_start, bucket_update
+
+
+class TestAnalyticsRollup(unittest.TestCase):
+    def setUp(self):
+        self.chat = {"user_email": "a@example.com", "timestamp": datetime(2026, 3, 14, 9, 41, 7),
+                     "language": "Hindi", "ai_model": "Groq", "intent": "mental",
+                     "response_source": "llm", "is_crisis": False, "has_image": False}
+
+    def test_chat_counts_in_hour_and_day_buckets(self):
+        """Test that one chat upserts an hourly and a daily bucket"""
+        _, hour = bucket_update(self.chat, "hour")
+        _, day = bucket_update(self.chat, "day")
+        self.assertEqual(hour["$inc"], {"count": 1})
+        self.assertEqual(hour["$setOnInsert"]["bucket"], datetime(2026, 3, 14, 9))
+        self.assertIn("expires_at", hour["$setOnInsert"])
+        self.assertEqual(day["$setOnInsert"]["bucket"], datetime(2026, 3, 14))
+        self.assertNotIn("expires_at", day["$setOnInsert"])
+
+    def test_live_and_backfill_keys_agree(self):
+        """Test that bucket ids ignore extra fields and dimension order"""
+        start = bucket_start(self.chat["timestamp"], "day")
+        regrouped = {d: self.chat[d] for d in reversed(list(self.chat)) if d not in ("user_email", "timestamp")}
+        regrouped["bucket"] = "2026-03-14"
+        self.assertEqual(bucket_id("day", start, self.chat), bucket_id("day", start, regrouped))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
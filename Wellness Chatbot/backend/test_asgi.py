@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+# Keep write-behind spill files out of the source tree
+os.environ.setdefault("WRITE_BEHIND_SPILL", os.path.join(tempfile.mkdtemp(), "spill.jsonl"))
+import app as flask_module
+from asgi import app
+
+
+class TestASGI(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def test_chat_safety_reply(self):
+        """Test that the async /chat answers crisis messages without an LLM"""
+        response = self.client.post("/chat", json={"message": "I want to end my life"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("crisis helpline", response.json()["reply"])
+
+    def test_chat_stream_frames(self):
+        """Test that the async /chat/stream emits token and done frames"""
+        response = self.client.post("/chat/stream", json={"message": "I want to end my life"})
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        self.assertIn("event: done", response.text)
+
+    def test_validation_matches_flask(self):
+        """Test that async routes reject missing fields like the Flask ones"""
+        self.assertEqual(self.client.post("/symptom_checker", json={}).status_code, 400)
+        self.assertEqual(self.client.post("/translate", json={}).json(), {"success": False, "error": "Text required"})
+        self.assertEqual(self.client.post("/translate/batch", json={"texts": []}).status_code, 400)
+        self.assertEqual(self.client.get("/api/user_stats").status_code, 400)
+
+    @patch('app.cached_complete', return_value=("Rest and drink fluids.", "Groq"))
+    def test_async_flag_submits_job(self, _complete):
+        """Test that the async routes honour `async` with the same job queue as Flask"""
+        with patch.object(flask_module.jobs, 'persist', None):
+            response = self.client.post("/symptom_checker", json={"symptom": "fever", "async": True})
+            self.assertEqual(response.status_code, 202)
+            job_id = response.json()["job_id"]
+            job = flask_module.jobs.wait(job_id, timeout=5)
+            while job["status"] not in ("done", "failed"):
+                job = flask_module.jobs.wait(job_id, job["version"], timeout=5)
+        self.assertEqual(job["result"], {"success": True, "result": "Rest and drink fluids."})
+
+    def test_other_routes_served_by_flask(self):
+        """Test that routes without an async version fall through to Flask"""
+        response = self.client.get("/api/admin/stats")
+        self.assertEqual(response.status_code, 401)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -1,8 +1,13 @@
+import os
+import tempfile
 import unittest
+import base64
 import json
-import os
 from unittest.mock import MagicMock, patch
-from app import app, safety_check, kernel
+
+# Keep write-behind spill files out of the source tree
+os.environ.setdefault("WRITE_BEHIND_SPILL", os.path.join(tempfile.mkdtemp(), "spill.jsonl"))
+from app import app, safety_check, kernel, user_activity_pipeline
 
 class TestWellnessChatbot(unittest.TestCase):
     def setUp(self):
@@ -16,8 +21,6 @@ class TestWellnessChatbot(unittest.TestCase):
 
     def test_aiml_response(self):
         """Test AIML response for HELLO"""
-        if os.path.exists("wellness.aiml"):
-            kernel.learn("wellness.aiml")
         response = kernel.respond("HELLO")
         self.assertTrue(
             "WellBot" in response,
@@ -57,5 +60,161 @@ class TestWellnessChatbot(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn('reach out', data['reply'].lower())
 
+    def test_chat_stream_safety(self):
+        """Test that /chat/stream emits the safety warning as SSE frames"""
+        payload = {"message": "I want to kill myself", "mood": "Sad"}
+        response = self.app.post('/chat/stream', json=payload)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        body = response.get_data(as_text=True)
+        self.assertIn('event: done', body)
+        self.assertIn('reach out', body.lower())
+
+    def test_user_activity_pipeline_order(self):
+        """Test that user-field sorts page before the chats join and stat sorts join first"""
+        by_name = user_activity_pipeline({}, "name", False, 0, 50)[1]["$facet"]["users"]
+        by_chats = user_activity_pipeline({}, "chat_count", True, 0, 50)[1]["$facet"]["users"]
+        stages = lambda users: [next(iter(stage)) for stage in users]
+        self.assertLess(stages(by_name).index("$limit"), stages(by_name).index("$lookup"))
+        self.assertLess(stages(by_chats).index("$lookup"), stages(by_chats).index("$limit"))
+
+    def test_user_activity_stat_sort_driven_by_user_stats(self):
+        """Test that a busiest-first page reads user_stats by index and joins only after sorting"""
+        from app import stats_activity_pipeline
+        stages = [next(iter(stage)) for stage in stats_activity_pipeline({}, "chat_count", 0, 50)]
+        self.assertEqual(stages[:2], ["$sort", "$lookup"])
+        self.assertLess(stages.index("$lookup"), stages.index("$limit"))
+        # A page that runs past the users with stats is topped up with idle users
+        with patch('app.user_stats_col') as stats, patch('app.users_col') as users, \
+                patch('app.admin_auth_check', return_value=True):
+            stats.aggregate.return_value = iter([{"email": "a@example.com", "chat_count": 3}])
+            users.aggregate.return_value = iter([{"email": "b@example.com", "chat_count": 0}])
+            users.count_documents.return_value = 2
+            data = self.app.get('/api/admin/user-activity?page_size=2').get_json()
+            self.assertEqual([u["email"] for u in data["users"]], ["a@example.com", "b@example.com"])
+            idle = users.aggregate.call_args.args[0]
+            self.assertEqual(next(s["$limit"] for s in idle if "$limit" in s), 1)
+
+    @patch('app.admin_auth_check', return_value=True)
+    def test_user_activity_rejects_bad_params(self, _auth):
+        """Test that user-activity validates sort and paging before querying"""
+        self.assertEqual(self.app.get('/api/admin/user-activity?sort=password').status_code, 400)
+        self.assertEqual(self.app.get('/api/admin/user-activity?page=abc').status_code, 400)
+
+    @patch('app.save_chat')
+    @patch('app.router.complete', return_value=("Hemoglobin is normal.", "Groq-Vision"))
+    def test_repeat_upload_served_from_vision_cache(self, mock_complete, mock_save):
+        """Test that re-uploading the same report skips the vision chain"""
+        from io import BytesIO
+        from PIL import Image
+        from response_cache import ResponseCache
+        out = BytesIO()
+        Image.new("RGB", (64, 64), "white").save(out, "PNG")
+        payload = {"message": "read this", "image": "data:image/png;base64," + base64.b64encode(out.getvalue()).decode()}
+        with patch('app.vision_cache', ResponseCache(collection=None)):
+            first = self.app.post('/chat', json=payload).get_json()
+            second = self.app.post('/chat', json=payload).get_json()
+        self.assertEqual(mock_complete.call_count, 1)
+        self.assertEqual((first["source"], second["source"]), ("vision", "vision_cache"))
+        self.assertEqual(second["reply"], "Hemoglobin is normal.")
+        self.assertEqual(mock_save.call_args.args[9], "vision_cache")
+
+    @patch('app.save_chat')
+    @patch('app.router.complete', return_value=("Take one tablet daily.", "Ollama-Vision"))
+    def test_chat_upload_multipart_and_raw(self, mock_complete, mock_save):
+        """Test that /chat/upload feeds multipart and raw image bodies to the vision chain"""
+        from io import BytesIO
+        from PIL import Image
+        from response_cache import ResponseCache
+        out = BytesIO()
+        Image.new("RGB", (3000, 2000), "white").save(out, "JPEG")
+        raw = out.getvalue()
+        with patch('app.vision_cache', ResponseCache(collection=None)):
+            multipart = self.app.post('/chat/upload', content_type='multipart/form-data', data={
+                "message": "read this", "email": "a@b.c", "image": (BytesIO(raw), "rx.jpg")
+            })
+            binary = self.app.post('/chat/upload?message=again&email=a@b.c', data=raw, content_type='image/jpeg')
+        self.assertEqual(multipart.get_json()["reply"], "Take one tablet daily.")
+        self.assertEqual(binary.get_json()["reply"], "Take one tablet daily.")
+        image = mock_complete.call_args.args[2]
+        self.assertEqual(max(image.width, image.height), 1600)
+        self.assertEqual(mock_save.call_args.args[:3], ("a@b.c", "Guest", "again"))
+
+    def test_chat_upload_limits(self):
+        """Test that /chat/upload refuses oversized and non-image bodies before reading them"""
+        with patch('app.UPLOAD_MAX_BYTES', 1024):
+            response = self.app.post('/chat/upload', data=b"x" * 200_000, content_type='image/jpeg')
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.app.post('/chat/upload', json={"message": "hi"}).status_code, 415)
+        self.assertEqual(self.app.post('/chat/upload', data={"message": "hi"}, content_type='multipart/form-data').status_code, 400)
+
+    @patch('app.cached_complete', return_value=("Rest and drink fluids.", "Groq"))
+    def test_symptom_checker_as_background_job(self, _complete):
+        """Test that async symptom checks return a job id that resolves to the usual payload"""
+        import app as app_module
+        with patch.object(app_module.jobs, 'persist', None):
+            response = self.app.post('/symptom_checker', json={"symptom": "fever", "async": True})
+            self.assertEqual(response.status_code, 202)
+            job_id = response.get_json()["job_id"]
+            job = app_module.jobs.wait(job_id, timeout=5)
+            while job["status"] not in ("done", "failed"):
+                job = app_module.jobs.wait(job_id, job["version"], timeout=5)
+            polled = self.app.get(f'/api/jobs/{job_id}').get_json()["job"]
+        self.assertEqual(polled["status"], "done")
+        self.assertEqual(polled["result"], {"success": True, "result": "Rest and drink fluids."})
+
+    @patch('app.cached_complete', return_value=("Rest and drink fluids.", "Groq"))
+    def test_background_job_only_visible_to_owner(self, _complete):
+        """Test that a job submitted with a session token is hidden from other callers"""
+        import app as app_module
+        users = {"tok-a": {"email": "a@example.com"}, "tok-b": {"email": "b@example.com"}}
+        with patch.object(app_module.jobs, 'persist', None), \
+                patch('app.session_cache.get_user', side_effect=users.get):
+            response = self.app.post('/symptom_checker?token=tok-a', json={"symptom": "fever", "async": True})
+            job_id = response.get_json()["job_id"]
+            self.assertEqual(self.app.get(f'/api/jobs/{job_id}?token=tok-a').status_code, 200)
+            self.assertEqual(self.app.get(f'/api/jobs/{job_id}?token=tok-b').status_code, 404)
+            self.assertEqual(self.app.get(f'/api/jobs/{job_id}').status_code, 404)
+            self.assertEqual(self.app.get(f'/api/jobs/{job_id}/events').status_code, 404)
+
+    @patch('app.router.has_any', return_value=True)
+    @patch('app.router.complete', return_value=('```json\n["अवलोकन", "लॉग आउट"]\n```', "Groq"))
+    def test_translate_batch_uses_memory(self, mock_complete, _has_any):
+        """Test that /translate/batch packs strings into one call and /translate reuses the memory"""
+        from translation_memory import TranslationMemory
+        with patch('app.translation_memory', TranslationMemory()):
+            response = self.app.post('/translate/batch', json={"texts": ["Overview", "Logout"], "language": "Hindi"})
+            self.assertEqual(response.get_json()["translations"], ["अवलोकन", "लॉग आउट"])
+            self.assertEqual(response.get_json()["verified"], [True, True])
+            single = self.app.post('/translate', json={"text": "Logout", "language": "Hindi"})
+            self.assertEqual(single.get_json()["translated"], "लॉग आउट")
+        self.assertEqual(mock_complete.call_count, 1)
+        self.assertEqual(self.app.post('/translate/batch', json={"texts": "Overview"}).status_code, 400)
+
+    def test_fallback_answers_cached_briefly(self):
+        """Test that only the chain's first configured provider gets the full cache TTL"""
+        import app as app_module
+        with patch.dict(app_module.router.providers, {"Groq": object(), "Ollama": object()}), \
+                patch('app.router.complete', return_value=("Rest.", "Ollama")), \
+                patch('app.response_cache') as cache:
+            cache.get.return_value = None
+            app_module.cached_complete("symptom", ["Groq", "Ollama"], "fever")
+            self.assertEqual(cache.set.call_args.kwargs["ttl"], app_module.LLM_CACHE_FALLBACK_TTL)
+            self.assertIsNone(app_module.response_cache_ttl(["Groq", "Ollama"], "Groq"))
+
+    @patch('app.router.has_any', return_value=False)
+    def test_translate_without_provider_is_not_an_echo(self, _has_any):
+        """Test that with no translation provider the English isn't returned as a translation"""
+        response = self.app.post('/translate/batch', json={"texts": ["Overview"], "language": "Hindi"})
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.get_json()["success"])
+        self.assertEqual(self.app.post('/translate', json={"text": "Overview", "language": "Hindi"}).status_code, 503)
+
+    def test_invalid_image_rejected(self):
+        """Test that an unreadable upload gets a 400 instead of reaching the vision chain"""
+        response = self.app.post('/chat', json={"message": "read this", "image": "data:image/png;base64,aGVsbG8="})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("couldn't read that image", response.get_json()["reply"])
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
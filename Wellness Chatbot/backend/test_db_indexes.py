@@ -0,0 +1,25 @@
+import unittest
+from db_indexes import INDEX_SPECS
+from query_audit import QUERY_SHAPES, find_stages
+
+
+class TestDbIndexes(unittest.TestCase):
+    def test_every_query_shape_has_a_leading_index(self):
+        """Test that each audited query can start an index scan on its filter or sort"""
+        for route, collection, query, sort in QUERY_SHAPES:
+            fields = set(query) | {field for field, _ in sort or []}
+            leading = {next(iter(m.document["key"])) for m in INDEX_SPECS.get(collection, [])}
+            self.assertTrue(fields & leading, f"{route} has no usable index on {collection}")
+
+    def test_find_stages_walks_nested_plans(self):
+        """Test COLLSCAN detection in nested and SBE-style explain output"""
+        ixscan = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "email"}}
+        nested = {"queryPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}}
+        union = {"stage": "OR", "inputStages": [ixscan, {"stage": "COLLSCAN"}]}
+        self.assertFalse(find_stages(ixscan, "COLLSCAN"))
+        self.assertTrue(find_stages(nested, "COLLSCAN"))
+        self.assertTrue(find_stages(union, "COLLSCAN"))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,48 @@
+import csv
+import gzip
+import json
+import unittest
+from datetime import datetime
+from io import StringIO
+from bson import ObjectId
+from export_stream import EXPORTS, export_query, gzip_stream, render_csv, render_json, render_ndjson
+
+FIELDS = ["user_email", "rating"]
+
+
+def rows(n):
+    return ({"user_email": f"u{i}@example.com", "rating": i, "cursor": str(i)} for i in range(n))
+
+
+class TestExportStream(unittest.TestCase):
+    def test_csv_streams_in_batches(self):
+        """Test that CSV is emitted as a header chunk plus one chunk per batch"""
+        chunks = list(render_csv(rows(1200), FIELDS))
+        self.assertEqual(len(chunks), 4)
+        parsed = list(csv.DictReader(StringIO("".join(chunks))))
+        self.assertEqual(len(parsed), 1200)
+        self.assertEqual(parsed[-1], {"user_email": "u1199@example.com", "rating": "1199", "cursor": "1199"})
+
+    def test_json_and_ndjson_round_trip(self):
+        """Test that the streamed JSON array and NDJSON lines parse back to the rows"""
+        self.assertEqual(json.loads("".join(render_json(rows(700)))), list(rows(700)))
+        self.assertEqual(json.loads("".join(render_json(rows(0)))), [])
+        lines = "".join(render_ndjson(rows(3))).splitlines()
+        self.assertEqual([json.loads(l) for l in lines], list(rows(3)))
+
+    def test_gzip_stream(self):
+        """Test that gzip output decompresses to the original text"""
+        text = "".join(render_csv(rows(50), FIELDS))
+        self.assertEqual(gzip.decompress(b"".join(gzip_stream(render_csv(rows(50), FIELDS)))).decode(), text)
+
+    def test_resume_query(self):
+        """Test that a resume cursor continues after the last row for each keyset"""
+        oid = ObjectId()
+        query = export_query(EXPORTS["users"], since=datetime(2026, 1, 1), cursor=str(oid))
+        self.assertEqual(query, {"created_at": {"$gte": datetime(2026, 1, 1)}, "_id": {"$gt": oid}})
+        chats = export_query(EXPORTS["chats"], cursor=None)
+        self.assertEqual(chats, {})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,66 @@
+import unittest
+from health_prober import HealthProber
+from llm_router import Provider
+
+
+class TestHealthProber(unittest.TestCase):
+    def setUp(self):
+        self.prober = HealthProber(interval=0, history=3)
+
+    def test_statuses_from_probe_outcome(self):
+        """Test that probes map to online, offline and error statuses"""
+        def broken():
+            raise RuntimeError("401 Unauthorized")
+        self.prober.add("Up", "bolt", lambda: {"ok": 1})
+        self.prober.add("Down", "server", lambda: False)
+        self.prober.add("Broken", "gem", broken)
+        self.prober.add("Unset", "brain")
+        self.prober.run_once()
+        services = {s["name"]: s for s in self.prober.snapshot()}
+        self.assertEqual(services["Up"]["status"], "online")
+        self.assertEqual(services["Down"]["status"], "offline")
+        self.assertEqual(services["Broken"]["status"], "error")
+        self.assertEqual(services["Broken"]["error"], "401 Unauthorized")
+        self.assertEqual(services["Unset"]["status"], "not_configured")
+        self.assertIsNone(services["Unset"]["checked_at"])
+
+    def test_history_and_uptime(self):
+        """Test that only the last `history` results count toward uptime"""
+        results = iter([False, True, True, True])
+        self.prober.add("Flaky", "server", lambda: next(results))
+        for _ in range(4):
+            self.prober.run_once()
+        service = self.prober.snapshot()[0]
+        self.assertEqual(service["history"], [True, True, True])
+        self.assertEqual(service["uptime"], 100)
+
+    def test_probe_feeds_provider_breaker(self):
+        """Test that failed probes trip the breaker and a passing one only half-opens it"""
+        provider = Provider("Ollama", lambda prompt, timeout=None: "hi", failure_threshold=2, reset_timeout=60)
+        up = {"value": False}
+        self.prober.add("Ollama (Local)", "server", lambda: up["value"], [provider])
+        self.prober.run_once()
+        self.prober.run_once()
+        self.assertEqual(provider.breaker.state, "open")
+        up["value"] = True
+        self.prober.run_once()
+        self.assertEqual(provider.breaker.state, "half_open")
+        self.assertEqual(provider.successes + provider.failures, 0)
+        # One real call gets through and decides; the rest wait for it
+        self.assertTrue(provider.breaker.allow_request())
+        self.assertFalse(provider.breaker.allow_request())
+        provider.breaker.record_failure()
+        self.assertEqual(provider.breaker.state, "open")
+
+    def test_passing_probe_leaves_closed_breaker_alone(self):
+        """Test that a passing probe doesn't wipe failures real traffic has counted"""
+        provider = Provider("Groq", lambda prompt, timeout=None: "hi", failure_threshold=2, reset_timeout=60)
+        self.prober.add("Groq API", "zap", lambda: True, [provider])
+        provider.breaker.record_failure()
+        self.prober.run_once()
+        provider.breaker.record_failure()
+        self.assertEqual(provider.breaker.state, "open")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,60 @@
+import base64
+import io
+import unittest
+from PIL import Image
+from image_pipeline import InvalidImage, decode_data_url, prepare_data_url, prepare_image
+
+
+def encode(img, fmt, **kwargs):
+    out = io.BytesIO()
+    img.save(out, fmt, **kwargs)
+    return out.getvalue()
+
+
+class TestImagePipeline(unittest.TestCase):
+    def test_downscales_and_strips_exif(self):
+        """Test that a large photo is bounded and loses its EXIF block"""
+        exif = Image.Exif()
+        exif[0x010F] = "PhoneMaker"  # Make
+        raw = encode(Image.new("RGB", (4000, 3000), "white"), "JPEG", exif=exif.tobytes())
+        image = prepare_image(raw, max_side=1600)
+        self.assertEqual((image.width, image.height), (1600, 1200))
+        out = Image.open(io.BytesIO(image.data))
+        self.assertEqual(out.format, "JPEG")
+        self.assertEqual(len(out.getexif()), 0)
+        self.assertLess(len(image.data), len(raw))
+
+    def test_applies_exif_orientation(self):
+        """Test that a sideways phone photo is rotated upright before EXIF is dropped"""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotate 90 CW
+        raw = encode(Image.new("RGB", (400, 200)), "JPEG", exif=exif.tobytes())
+        image = prepare_image(raw)
+        self.assertEqual((image.width, image.height), (200, 400))
+
+    def test_flattens_transparent_png(self):
+        """Test that a PNG with alpha becomes an RGB JPEG on white"""
+        raw = encode(Image.new("RGBA", (10, 10), (0, 0, 0, 0)), "PNG")
+        image = prepare_image(raw)
+        self.assertGreater(Image.open(io.BytesIO(image.data)).getpixel((5, 5))[0], 240)
+
+    def test_representations_share_bytes(self):
+        """Test that b64, data URL and blob are all views of the same bytes"""
+        raw = encode(Image.new("RGB", (10, 10)), "PNG")
+        image = prepare_data_url("data:image/png;base64," + base64.b64encode(raw).decode())
+        self.assertEqual(base64.b64decode(image.b64), image.data)
+        self.assertTrue(image.data_url.endswith(image.b64))
+        self.assertIs(image.blob["data"], image.data)
+
+    def test_rejects_bad_input(self):
+        """Test that non-images, bad base64 and oversized uploads are rejected"""
+        with self.assertRaises(InvalidImage):
+            decode_data_url("data:image/png;base64,@@not-base64@@")
+        with self.assertRaises(InvalidImage):
+            prepare_image(b"%PDF-1.4 not an image")
+        with self.assertRaises(InvalidImage):
+            prepare_image(encode(Image.new("RGB", (10, 10)), "PNG"), max_bytes=10)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,55 @@
+import threading
+import unittest
+from jobs import JobQueue, QueueFull
+
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.saved = []
+        self.queue = JobQueue(workers=1, max_pending=2, persist=lambda job: self.saved.append(job["status"]))
+
+    def tearDown(self):
+        self.queue.shutdown()
+
+    def test_job_runs_to_done_with_progress(self):
+        """Test that a job reports progress and ends with its result"""
+        def work(report):
+            report(0.5, "halfway")
+            return {"answer": 42}
+        job = self.queue.submit("symptom", work)
+        done = self.queue.wait(job["id"], timeout=5)
+        while done["status"] != "done":
+            done = self.queue.wait(job["id"], done["version"], timeout=5)
+        self.assertEqual(done["result"], {"answer": 42})
+        self.assertEqual(done["progress"], 1.0)
+        self.assertEqual(self.saved, ["queued", "running", "running", "done"])
+
+    def test_failure_is_recorded(self):
+        """Test that an exception marks the job failed with its message"""
+        job = self.queue.submit("vision", lambda report: 1 / 0)
+        self.queue.shutdown()
+        failed = self.queue.get(job["id"])
+        self.assertEqual(failed["status"], "failed")
+        self.assertIn("division", failed["error"])
+        self.assertEqual(self.queue.stats()["pending"], 0)
+
+    def test_rejects_when_full(self):
+        """Test that submissions past max_pending fail fast instead of queueing"""
+        release = threading.Event()
+        self.queue.submit("diet", lambda report: release.wait(5))
+        self.queue.submit("diet", lambda report: release.wait(5))
+        with self.assertRaises(QueueFull):
+            self.queue.submit("diet", lambda report: None)
+        release.set()
+        self.assertEqual(self.queue.stats()["rejected"], 1)
+
+    def test_unknown_job_falls_back_to_lookup(self):
+        """Test that jobs held by another worker are read through `lookup`"""
+        queue = JobQueue(workers=1, lookup=lambda job_id: {"id": job_id, "status": "done"} if job_id == "remote" else None)
+        self.assertEqual(queue.get("remote")["status"], "done")
+        self.assertIsNone(queue.wait("missing", timeout=0.1))
+        queue.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,36 @@
+import unittest
+from keyword_matcher import KeywordMatcher
+
+
+class TestKeywordMatcher(unittest.TestCase):
+    def setUp(self):
+        self.matcher = KeywordMatcher()
+        self.matcher.add("symptom", ["pain", "chest pain", "bleed", "blood", "blood pressure"])
+        self.matcher.add("crisis", ["self harm", "kill myself"])
+        self.matcher.add("mood", ["pain", "sad"])
+        self.matcher.compile()
+
+    def test_word_boundaries(self):
+        """Test that terms do not match inside longer words"""
+        self.assertEqual(self.matcher.match("I enjoy painting"), {})
+        self.assertEqual(self.matcher.match("Sadly not"), {})
+
+    def test_inflections(self):
+        """Test that common suffixes still match the base term"""
+        self.assertIn("bleed", self.matcher.match("my gums are bleeding")["symptom"])
+        self.assertIn("pain", self.matcher.match("growing pains")["symptom"])
+
+    def test_overlapping_terms_all_reported(self):
+        """Test that nested terms are all returned in one pass"""
+        hits = self.matcher.match("Chest pain and high blood pressure")
+        self.assertEqual(hits["symptom"], {"chest pain", "pain", "blood pressure", "blood"})
+        self.assertEqual(hits["mood"], {"pain"})
+
+    def test_multiword_separators(self):
+        """Test that multi-word terms match across hyphens and extra spaces"""
+        self.assertIn("crisis", self.matcher.match("thoughts of self-harm"))
+        self.assertIn("crisis", self.matcher.match("I want to KILL  myself"))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,57 @@
+import json
+import os
+import tempfile
+import unittest
+from knowledge_base import KnowledgeBase
+
+
+def write_kb(path, conditions):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"conditions": conditions}, f)
+
+
+class TestKnowledgeBase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "kb.json")
+        write_kb(self.path, {
+            "headache": {"symptoms": ["pain in head", "nausea"], "precautions": [], "doctor": ""},
+            "hypertension": {"symptoms": ["headache", "dizziness", "nosebleeds"], "precautions": [], "doctor": ""},
+            "nausea": {"symptoms": ["upset stomach", "dizziness"], "precautions": [], "doctor": ""}
+        })
+        self.kb = KnowledgeBase(self.path, reload_interval=0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_ranks_by_symptom_hits(self):
+        """Test that the condition matching the most terms ranks first"""
+        ranked = self.kb.rank(["headache", "dizziness"], top_k=3)
+        self.assertEqual([name for name, _, _ in ranked], ["hypertension", "headache", "nausea"])
+        self.assertEqual(ranked[0][2], ["dizziness", "headache"])
+
+    def test_unknown_terms_ignored(self):
+        """Test that terms outside the KB produce no matches"""
+        self.assertEqual(self.kb.rank(["sunburn"]), [])
+
+    def test_hot_reload(self):
+        """Test that an edited KB file is picked up without a restart"""
+        write_kb(self.path, {"sunburn": {"symptoms": ["red skin"], "precautions": [], "doctor": ""}})
+        stat = os.stat(self.path)
+        os.utime(self.path, (stat.st_atime, stat.st_mtime + 5))
+        self.assertTrue(self.kb.reload_if_changed())
+        self.assertEqual(self.kb.rank(["red skin"])[0][0], "sunburn")
+        self.assertIsNone(self.kb.get("hypertension"))
+
+    def test_broken_file_keeps_previous_index(self):
+        """Test that a malformed KB file does not replace the loaded index"""
+        with open(self.path, "w") as f:
+            f.write("{ not json")
+        stat = os.stat(self.path)
+        os.utime(self.path, (stat.st_atime, stat.st_mtime + 5))
+        self.assertFalse(self.kb.reload_if_changed())
+        self.assertEqual(self.kb.stats()["conditions"], 3)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
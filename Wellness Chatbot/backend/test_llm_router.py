@@ -0,0 +1,193 @@
+import asyncio
+import threading
+import time
+import unittest
+from llm_router import LLMRouter, Provider, AllProvidersFailed
+
+
+class TestLLMRouter(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.router = LLMRouter(budget=10)
+
+    def make_provider(self, name, reply=None, error=None, **kwargs):
+        def call(prompt, timeout=None):
+            self.calls.append(name)
+            if error:
+                raise error
+            return reply
+        return self.router.register(Provider(name, call, **kwargs))
+
+    def test_falls_through_to_next_provider(self):
+        """Test that a failing provider falls through to the next one"""
+        self.make_provider("Groq", error=RuntimeError("down"))
+        self.make_provider("Ollama", reply="hello")
+        reply, name = self.router.complete(["Groq", "Ollama"], "hi")
+        self.assertEqual((reply, name), ("hello", "Ollama"))
+
+    def test_open_breaker_skips_provider(self):
+        """Test that a tripped provider is skipped without being called"""
+        self.make_provider("Groq", error=RuntimeError("down"), failure_threshold=2, reset_timeout=60)
+        self.make_provider("Ollama", reply="hello")
+        for _ in range(2):
+            self.router.complete(["Groq", "Ollama"], "hi")
+        self.calls.clear()
+        self.router.complete(["Groq", "Ollama"], "hi")
+        self.assertEqual(self.calls, ["Ollama"])
+        self.assertEqual(self.router.providers["Groq"].breaker.state, "open")
+
+    def test_half_open_probe_closes_breaker(self):
+        """Test that a successful half-open probe closes the breaker"""
+        provider = self.make_provider("Groq", reply="ok", failure_threshold=1, reset_timeout=0.01)
+        provider.record(False)
+        self.assertEqual(provider.breaker.state, "open")
+        time.sleep(0.02)
+        self.assertEqual(self.router.complete(["Groq"], "hi"), ("ok", "Groq"))
+        self.assertEqual(provider.breaker.state, "closed")
+
+    def test_all_failed_raises(self):
+        """Test that an exhausted chain raises AllProvidersFailed"""
+        self.make_provider("Groq", error=RuntimeError("down"))
+        with self.assertRaises(AllProvidersFailed):
+            self.router.complete(["Groq", "Gemini"], "hi")
+
+    def test_stream_keeps_partial_reply(self):
+        """Test that a stream failing mid-reply is not restarted elsewhere"""
+        def broken_stream(prompt, timeout=None):
+            yield "Hel"
+            raise RuntimeError("connection reset")
+        self.router.register(Provider("Groq", None, stream=broken_stream))
+        self.make_provider("Ollama", reply="unused")
+        chunks = []
+        with self.assertRaises(AllProvidersFailed):
+            for chunk in self.router.stream(["Groq", "Ollama"], "hi"):
+                chunks.append(chunk)
+        self.assertEqual(chunks, [("Groq", "Hel")])
+        self.assertNotIn("Ollama", self.calls)
+
+    def test_closed_stream_releases_probe(self):
+        """Test that a client hanging up mid-stream frees the half-open probe slot"""
+        def stream(prompt, timeout=None):
+            yield "Hel"
+            yield "lo"
+        provider = self.router.register(Provider("Groq", lambda prompt, timeout=None: "ok", stream=stream,
+                                                 failure_threshold=1, reset_timeout=0.01))
+        provider.record(False)
+        time.sleep(0.02)
+        chunks = self.router.stream(["Groq"], "hi")
+        next(chunks)
+        chunks.close()
+        self.assertEqual(self.router.complete(["Groq"], "hi"), ("ok", "Groq"))
+
+    def test_saturated_hedge_pool_keeps_probe(self):
+        """Test that no hedge fires while the pool is full, and the backup keeps its half-open probe"""
+        self.router = LLMRouter(budget=10, hedge_workers=1)
+
+        def slow(prompt, timeout=None):
+            time.sleep(0.2)
+            return "slow"
+        self.router.register(Provider("Groq", slow))
+        backup = self.make_provider("Ollama", reply="fast", failure_threshold=1, reset_timeout=0.01)
+        backup.record(False)
+        time.sleep(0.02)
+        self.router._hedge_slots.acquire()
+        try:
+            self.assertEqual(self.router.hedged_complete(["Groq", "Ollama"], "hi", delay=0.01), ("slow", "Groq"))
+        finally:
+            self.router._hedge_slots.release()
+        self.assertEqual(self.calls, [])
+        self.assertGreater(self.router.hedges_skipped, 0)
+        self.assertEqual(self.router.complete(["Ollama"], "hi"), ("fast", "Ollama"))
+
+    def test_slow_primaries_do_not_starve_hedges(self):
+        """Test that concurrent hedged requests all get the fast backup despite slow primaries"""
+        self.router = LLMRouter(budget=10, hedge_workers=2)
+
+        def slow(prompt, timeout=None):
+            time.sleep(1.0)
+            return "slow"
+
+        def fast(prompt, timeout=None):
+            time.sleep(0.02)
+            return "fast"
+        self.router.register(Provider("Groq", slow))
+        self.router.register(Provider("Ollama", fast))
+        results, elapsed = [], []
+
+        def request():
+            started = time.monotonic()
+            results.append(self.router.hedged_complete(["Groq", "Ollama"], "hi", delay=0.05))
+            elapsed.append(time.monotonic() - started)
+        threads = [threading.Thread(target=request) for _ in range(12)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, [("fast", "Ollama")] * 12)
+        self.assertLess(max(elapsed), 0.8)
+
+    def test_hedge_returns_faster_provider(self):
+        """Test that a hedged request returns the first reply to land"""
+        def slow(prompt, timeout=None):
+            time.sleep(0.5)
+            return "slow"
+        self.router.register(Provider("Groq", slow))
+        self.make_provider("Ollama", reply="fast")
+        started = time.monotonic()
+        reply, name = self.router.hedged_complete(["Groq", "Ollama"], "hi", delay=0.05)
+        self.assertEqual((reply, name), ("fast", "Ollama"))
+        self.assertLess(time.monotonic() - started, 0.4)
+
+    def test_hedge_not_fired_when_primary_is_fast(self):
+        """Test that the backup provider is untouched when the primary answers in time"""
+        self.make_provider("Groq", reply="quick")
+        self.make_provider("Ollama", reply="unused")
+        self.assertEqual(self.router.hedged_complete(["Groq", "Ollama"], "hi", delay=0.5), ("quick", "Groq"))
+        self.assertEqual(self.calls, ["Groq"])
+
+    def test_acomplete_falls_back_to_blocking_call(self):
+        """Test that acomplete runs providers without an async client on a thread"""
+        async def failing(prompt, timeout=None):
+            raise RuntimeError("down")
+        self.router.register(Provider("Groq", None, acall=failing))
+        self.make_provider("Ollama", reply="hello")
+        self.assertEqual(asyncio.run(self.router.acomplete(["Groq", "Ollama"], "hi")), ("hello", "Ollama"))
+
+    def test_ahedge_cancels_loser(self):
+        """Test that the async hedge cancels the slower provider's task"""
+        cancelled = []
+        async def slow(prompt, timeout=None):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append("Groq")
+                raise
+            return "slow"
+        async def fast(prompt, timeout=None):
+            return "fast"
+        self.router.register(Provider("Groq", None, acall=slow))
+        self.router.register(Provider("Ollama", None, acall=fast))
+
+        async def run():
+            reply = await self.router.ahedged_complete(["Groq", "Ollama"], "hi", delay=0.05)
+            await asyncio.sleep(0)
+            return reply
+        self.assertEqual(asyncio.run(run()), ("fast", "Ollama"))
+        self.assertEqual(cancelled, ["Groq"])
+        self.assertEqual(self.router.providers["Groq"].failures, 0)
+
+    def test_astream_skips_sync_only_providers(self):
+        """Test that astream only uses providers with an async stream"""
+        async def tokens(prompt, timeout=None):
+            for token in ("He", "llo"):
+                yield token
+        self.router.register(Provider("Groq", None, stream=lambda prompt, timeout=None: iter(["x"])))
+        self.router.register(Provider("Ollama", None, astream=tokens))
+
+        async def collect():
+            return [pair async for pair in self.router.astream(["Groq", "Ollama"], "hi")]
+        self.assertEqual(asyncio.run(collect()), [("Ollama", "He"), ("Ollama", "llo")])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
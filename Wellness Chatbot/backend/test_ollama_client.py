@@ -0,0 +1,88 @@
+import json
+import socket
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from ollama_client import OllamaClient
+
+
+class FakeOllama(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        self._send(json.dumps({"models": [{"name": "llama3:latest"}]}).encode())
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.payloads.append(body)
+        done = {"response": "", "done": True, "total_duration": 5_000_000}
+        if body["stream"]:
+            lines = [{"response": "Hel", "done": False}, {"response": "lo", "done": False}, done]
+            self._send("".join(json.dumps(line) + "\n" for line in lines).encode())
+        else:
+            self._send(json.dumps(dict(done, response="Hello")).encode())
+
+    def _send(self, data):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestOllamaClient(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllama)
+        self.server.payloads = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.metrics = []
+        self.client = OllamaClient(f"http://127.0.0.1:{self.server.server_port}", keep_alive="10m",
+                                   on_metrics=self.metrics.append)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_reuses_one_connection(self):
+        """Test that sequential calls share a single keep-alive connection"""
+        self.assertTrue(self.client.ping())
+        for _ in range(3):
+            self.assertEqual(self.client.generate("llama3", "hi"), "Hello")
+        self.assertEqual("".join(self.client.stream("llama3", "hi")), "Hello")
+        self.assertEqual(self.client.stats()["connections_opened"], 1)
+
+    def test_metrics_split_generation_from_overhead(self):
+        """Test that Ollama's total_duration is reported as generation time"""
+        self.client.generate("llama3", "hi")
+        metric = self.metrics[0]
+        self.assertAlmostEqual(metric["generation"], 0.005)
+        self.assertAlmostEqual(metric["overhead"], max(metric["wall"] - 0.005, 0.0))
+        self.assertEqual(self.server.payloads[0]["keep_alive"], "10m")
+
+    def test_models_lists_pulled_models(self):
+        """Test that models() returns tag names, and None when Ollama is down"""
+        self.assertEqual(self.client.models(), ["llama3:latest"])
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        self.assertIsNone(OllamaClient(f"http://127.0.0.1:{port}", retries=0).models())
+
+    def test_connection_refused_raises_after_retries(self):
+        """Test that an unreachable server fails fast and is counted"""
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        client = OllamaClient(f"http://127.0.0.1:{port}", retries=1, backoff=0)
+        with self.assertRaises(requests.ConnectionError):
+            client.generate("llama3", "hi")
+        self.assertFalse(client.ping())
+        self.assertEqual(client.stats()["errors"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,26 @@
+import unittest
+from datetime import datetime
+from bson import ObjectId
+from pagination import InvalidCursor, after_cursor, decode_cursor, encode_cursor
+
+
+class TestPagination(unittest.TestCase):
+    def test_cursor_round_trip(self):
+        """Test that a cursor carries the last row's timestamp and _id"""
+        doc = {"timestamp": datetime(2026, 3, 14, 9, 41, 7, 1234), "_id": ObjectId()}
+        self.assertEqual(decode_cursor(encode_cursor(doc)), (doc["timestamp"], doc["_id"]))
+        with self.assertRaises(InvalidCursor):
+            decode_cursor("not-a-cursor")
+
+    def test_after_cursor_breaks_timestamp_ties_on_id(self):
+        """Test that the keyset filter keeps the caller's filters and orders ties by _id"""
+        doc = {"timestamp": datetime(2026, 3, 14), "_id": ObjectId()}
+        query = after_cursor({"user_email": "a@example.com"}, encode_cursor(doc))
+        base, keyset = query["$and"]
+        self.assertEqual(base, {"user_email": "a@example.com"})
+        self.assertEqual(keyset["$or"][1], {"timestamp": doc["timestamp"], "_id": {"$lt": doc["_id"]}})
+        self.assertEqual(after_cursor({}, None), {})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
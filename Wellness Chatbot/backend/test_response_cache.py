@@ -0,0 +1,59 @@
+import time
+import unittest
+from ttl_cache import TTLCache
+from response_cache import ResponseCache
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.evictions, 1)
+
+    def test_ttl_expiry(self):
+        """Test that entries expire after their TTL"""
+        cache = TTLCache(maxsize=10, ttl=0.01)
+        cache.set("a", 1)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["misses"], 1)
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_key_ignores_whitespace_layout(self):
+        """Test that prompts differing only in indentation share a key"""
+        a = ResponseCache.make_key("diet", "Goal: Weight loss\n    Respond in English.", "Groq")
+        b = ResponseCache.make_key("diet", "Goal: Weight loss Respond in English.", "Groq")
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, ResponseCache.make_key("diet", "Goal: Weight loss Respond in English.", "Ollama"))
+        self.assertNotEqual(a, ResponseCache.make_key("symptom", "Goal: Weight loss Respond in English.", "Groq"))
+
+    def test_per_entry_ttl(self):
+        """Test that set() can give one entry a shorter life than the cache default"""
+        cache = ResponseCache(maxsize=10, ttl=60)
+        cache.set("fallback", {"reply": "ok"}, ttl=0.01)
+        cache.set("primary", {"reply": "ok"})
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("fallback"))
+        self.assertEqual(cache.get("primary"), {"reply": "ok"})
+
+    def test_local_hit_counts(self):
+        """Test hit/miss accounting for the in-process tier"""
+        cache = ResponseCache(maxsize=10, ttl=60)
+        key = ResponseCache.make_key("translate", "Hello", "Groq")
+        self.assertIsNone(cache.get(key))
+        cache.set(key, {"reply": "Hola", "model": "Groq"})
+        self.assertEqual(cache.get(key)["reply"], "Hola")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertFalse(stats["shared_enabled"])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
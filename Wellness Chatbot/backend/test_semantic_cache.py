@@ -0,0 +1,47 @@
+import unittest
+from semantic_cache import SemanticCache
+
+
+class TestSemanticCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = SemanticCache(threshold=0.85, max_entries=2)
+        self.partition = ("wellness", "English", "Neutral")
+
+    def test_paraphrase_hits(self):
+        """Test that a paraphrased question is served from the cache"""
+        self.cache.store("how do I sleep better", self.partition, {"reply": "Keep a routine.", "model": "Groq"})
+        value, similarity = self.cache.lookup("tips for better sleep", self.partition)
+        self.assertEqual(value["reply"], "Keep a routine.")
+        self.assertGreaterEqual(similarity, 0.85)
+
+    def test_partitions_are_isolated(self):
+        """Test that replies are not shared across languages"""
+        self.cache.store("how do I sleep better", self.partition, {"reply": "Keep a routine.", "model": "Groq"})
+        value, _ = self.cache.lookup("how do I sleep better", ("wellness", "Hindi", "Neutral"))
+        self.assertIsNone(value)
+
+    def test_negation_is_not_a_hit(self):
+        """Test that negated statements do not match their positive form"""
+        self.cache.store("I sleep well at night", self.partition, {"reply": "Great!", "model": "Groq"})
+        value, _ = self.cache.lookup("I can't sleep at night", self.partition)
+        self.assertIsNone(value)
+
+    def test_added_qualifier_is_not_a_hit(self):
+        """Test that a question adding context (pregnancy, a child, ...) never gets the generic answer"""
+        self.cache.store("can I take ibuprofen for a headache", self.partition, {"reply": "Yes, with food.", "model": "Groq"})
+        value, _ = self.cache.lookup("I am pregnant, can I take ibuprofen for a headache", self.partition)
+        self.assertIsNone(value)
+        self.assertEqual(self.cache.stats()["uncovered"], 1)
+        value, _ = self.cache.lookup("for a headache can I take ibuprofen", self.partition)
+        self.assertEqual(value["reply"], "Yes, with food.")
+
+    def test_lru_eviction(self):
+        """Test that the oldest entry is evicted when a partition is full"""
+        for msg in ["sleep hygiene routine", "healthy breakfast ideas", "reduce exam stress"]:
+            self.cache.store(msg, self.partition, {"reply": msg, "model": "Groq"})
+        self.assertIsNone(self.cache.lookup("sleep hygiene routine", self.partition)[0])
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,42 @@
+import unittest
+from session_cache import SessionCache
+
+
+class TestSessionCache(unittest.TestCase):
+    def setUp(self):
+        self.users = {"t-admin": {"email": "admin@example.com", "role": "admin"},
+                      "t-user": {"email": "user@example.com", "role": "user"}}
+        self.lookups = 0
+
+        def lookup(token):
+            self.lookups += 1
+            return self.users.get(token)
+
+        self.sessions = SessionCache(lookup, maxsize=10, ttl=60)
+
+    def test_repeat_checks_hit_cache(self):
+        """Test that a dozen admin checks cost one lookup"""
+        for _ in range(12):
+            self.assertTrue(self.sessions.has_role("t-admin", "admin"))
+        self.assertEqual(self.lookups, 1)
+        self.assertFalse(self.sessions.has_role("t-user", "admin"))
+        self.assertFalse(self.sessions.has_role(None, "admin"))
+        self.assertEqual(self.sessions.stats()["hits"], 11)
+
+    def test_unknown_tokens_are_not_cached(self):
+        """Test that a token created after a failed check works immediately"""
+        self.assertFalse(self.sessions.has_role("t-new", "admin"))
+        self.users["t-new"] = {"email": "new@example.com", "role": "admin"}
+        self.assertTrue(self.sessions.has_role("t-new", "admin"))
+
+    def test_invalidate_user_drops_role_change(self):
+        """Test that a demoted admin is re-read after invalidation"""
+        self.assertTrue(self.sessions.has_role("t-admin", "admin"))
+        self.users["t-admin"] = {"email": "admin@example.com", "role": "user"}
+        self.sessions.invalidate_user("admin@example.com")
+        self.assertFalse(self.sessions.has_role("t-admin", "admin"))
+        self.assertEqual(self.sessions.stats()["invalidations"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
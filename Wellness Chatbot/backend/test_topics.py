@@ -0,0 +1,13 @@
+import unittest
+from topics import build_topic_matcher
+
+
+class TestTopics(unittest.TestCase):
+    def test_topics_tagged_on_word_boundaries(self):
+        """Test that topics match whole words, multi-word topics and inflections"""
+        hits = build_topic_matcher().match("Headaches and high blood pressure, plus heartburn")
+        self.assertEqual(hits["topic"], {"headache", "blood pressure"})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
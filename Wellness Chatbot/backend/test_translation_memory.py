@@ -0,0 +1,104 @@
+import asyncio
+import json
+import unittest
+from translation_memory import TranslationMemory, Unverified, batch_prompt, parse_batch
+
+
+def fake_complete(calls, language="Hindi"):
+    """A provider that tags every string in the packed array with the language."""
+    def complete(prompt):
+        texts = json.loads(prompt[prompt.index("\n") + 1:])
+        calls.append(texts)
+        return "```json\n" + json.dumps([f"{language}:{t}" for t in texts], ensure_ascii=False) + "\n```", "Groq"
+    return complete
+
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = {d["_id"]: d for d in docs}
+
+    def find(self, query, projection=None):
+        return [self.docs[k] for k in query["_id"]["$in"] if k in self.docs]
+
+
+class TestBatchFormat(unittest.TestCase):
+    def test_delimiters_inside_strings_survive(self):
+        """Test that newlines, brackets and quotes in a string don't shift the others"""
+        texts = ['Line one\nline two', 'Take [1] tablet, "daily"', '|||']
+        prompt = batch_prompt(texts, "Hindi")
+        self.assertEqual(json.loads(prompt[prompt.index("\n") + 1:]), texts)
+        self.assertEqual(parse_batch("Sure:\n" + json.dumps(texts), 3), texts)
+
+    def test_wrong_count_rejected(self):
+        """Test that a reply with a different number of strings raises ValueError"""
+        with self.assertRaises(ValueError):
+            parse_batch('["a", "b"]', 3)
+        with self.assertRaises(ValueError):
+            parse_batch("no array here", 1)
+
+
+class TestTranslationMemory(unittest.TestCase):
+    def test_one_call_then_served_from_memory(self):
+        """Test that a batch costs one call and repeats cost none"""
+        calls, saved = [], {}
+        memory = TranslationMemory(save=lambda key, doc: saved.update({key: doc}))
+        texts = ["Overview", "Logout", "Overview"]
+        self.assertEqual(memory.translate(texts, "Hindi", fake_complete(calls)),
+                         ["Hindi:Overview", "Hindi:Logout", "Hindi:Overview"])
+        self.assertEqual(calls, [["Overview", "Logout"]])
+        self.assertEqual(memory.translate(["Logout"], "hindi", fake_complete(calls)), ["Hindi:Logout"])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(saved[TranslationMemory.make_key("Logout", "Hindi")]["translation"], "Hindi:Logout")
+
+    def test_shared_tier_and_english_skip_llm(self):
+        """Test that Mongo hits and English targets never call the provider"""
+        key = TranslationMemory.make_key("Support", "Kannada")
+        memory = TranslationMemory(collection=FakeCollection([{"_id": key, "translation": "ಬೆಂಬಲ"}]))
+        calls = []
+        self.assertEqual(memory.translate(["Support"], "Kannada", fake_complete(calls)), ["ಬೆಂಬಲ"])
+        self.assertEqual(memory.translate(["Support"], "English", fake_complete(calls)), ["Support"])
+        self.assertEqual(calls, [])
+        self.assertEqual(memory.stats()["shared_hits"], 1)
+
+    def test_batches_respect_limits(self):
+        """Test that misses are split by item count and character budget"""
+        memory = TranslationMemory(max_items=2, max_chars=10)
+        self.assertEqual(list(memory.batches(["a", "b", "c", "0123456789"])), [["a", "b"], ["c"], ["0123456789"]])
+
+    def test_unparsable_reply_splits_batch(self):
+        """Test that a malformed batch reply is retried in halves down to single strings"""
+        calls, saved = [], {}
+
+        def complete(prompt):
+            texts = json.loads(prompt[prompt.index("\n") + 1:])
+            calls.append(texts)
+            if len(texts) > 1:
+                return "Here you go: a, b", "Groq"
+            return f"translated {texts[0]}", "Groq"
+
+        memory = TranslationMemory(save=lambda key, doc: saved.update({key: doc}))
+        self.assertEqual(memory.translate(["a", "b"], "French", complete), ["translated a", "translated b"])
+        self.assertEqual(calls, [["a", "b"], ["a"], ["b"]])
+        self.assertEqual(memory.stats()["retries"], 1)
+        # Plain-text fallbacks are reused locally but never written to the shared memory
+        self.assertEqual(saved, {})
+        again = memory.translate(["a"], "French", complete)
+        self.assertEqual(again, ["translated a"])
+        self.assertIsInstance(again[0], Unverified)
+        self.assertEqual(len(calls), 3)
+
+    def test_async_batches(self):
+        """Test that atranslate matches translate"""
+        calls = []
+
+        async def acomplete(prompt):
+            return fake_complete(calls, "Spanish")(prompt)
+
+        memory = TranslationMemory(max_items=1)
+        result = asyncio.run(memory.atranslate(["Home", "Help"], "Spanish", acomplete))
+        self.assertEqual(result, ["Spanish:Home", "Spanish:Help"])
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,32 @@
+import unittest
+from datetime import datetime, timedelta
+from user_stats import MOOD_HISTORY, chat_update, stats_from_chats
+
+
+class TestUserStats(unittest.TestCase):
+    def test_chat_update_is_atomic_increment(self):
+        """Test that one chat becomes a single $inc/$push+$slice update"""
+        now = datetime.now()
+        update = chat_update({"user_email": "a@example.com", "timestamp": now, "mood": "Happy",
+                              "has_image": True, "intent": "symptom.check"})
+        self.assertEqual(update["$inc"], {"chat_count": 1, "image_count": 1, "intents.symptom_check": 1})
+        self.assertEqual(update["$push"]["moods"], {"$each": ["Happy"], "$position": 0, "$slice": MOOD_HISTORY})
+        self.assertEqual(update["$max"], {"last_active": now})
+
+    def test_backfill_folds_sorted_chats_per_user(self):
+        """Test that the rebuild keeps newest moods first and counts per user"""
+        start = datetime(2026, 1, 1)
+        chats = [{"user_email": "a@example.com", "timestamp": start + timedelta(minutes=20 - i),
+                  "mood": f"m{i}", "intent": "mental", "has_image": i == 0} for i in range(15)]
+        chats.append({"user_email": "b@example.com", "timestamp": start, "mood": "Calm", "intent": "nutrition"})
+        a, b = list(stats_from_chats(chats))
+        self.assertEqual(a["chat_count"], 15)
+        self.assertEqual(a["image_count"], 1)
+        self.assertEqual(a["moods"], [f"m{i}" for i in range(MOOD_HISTORY)])
+        self.assertEqual(a["last_active"], start + timedelta(minutes=20))
+        self.assertEqual(a["first_active"], start + timedelta(minutes=6))
+        self.assertEqual(b["intents"], {"nutrition": 1})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from pymongo.errors import AutoReconnect, ServerSelectionTimeoutError
+from write_behind import WriteBehind
+
+
+class FakeCollection:
+    def __init__(self, db):
+        self.db = db
+        self.batches = []
+        self.attempts = 0
+
+    def bulk_write(self, requests, ordered=True):
+        self.attempts += 1
+        if self.db.down:
+            raise self.db.down
+        self.batches.append(requests)
+
+
+class FakeDB(dict):
+    down = None
+
+    def __missing__(self, name):
+        self[name] = FakeCollection(self)
+        return self[name]
+
+
+class TestWriteBehind(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db = FakeDB()
+        self.wb = WriteBehind(self.db, flush_interval=60, spill_path=os.path.join(self.tmp, "spill.jsonl"))
+
+    def tearDown(self):
+        self.wb.close(timeout=1)
+        shutil.rmtree(self.tmp)
+
+    def test_writes_grouped_into_one_bulk_write_per_collection(self):
+        """Test that queued writes reach Mongo as one batch per collection"""
+        for i in range(5):
+            self.wb.insert("chats", {"n": i})
+            self.wb.update("user_stats", {"_id": "a@example.com"}, {"$inc": {"chat_count": 1}})
+        self.wb.insert("error_logs", {"error": "boom"})
+        self.wb.flush()
+        self.assertEqual([len(b) for b in self.db["chats"].batches], [5])
+        self.assertEqual([len(b) for b in self.db["user_stats"].batches], [5])
+        self.assertEqual(self.wb.stats()["written"], 11)
+
+    def test_spill_and_replay_when_mongo_is_down(self):
+        """Test that failed writes go to the spill file and are replayed after recovery"""
+        self.db.down = ServerSelectionTimeoutError("connection refused")
+        self.wb.insert("chats", {"n": 1})
+        self.wb.flush()
+        self.assertTrue(os.path.exists(self.wb.spill_path))
+        self.assertEqual(self.wb.stats()["spilled"], 1)
+
+        self.db.down = None
+        self.wb._replay_spill()
+        self.assertFalse(os.path.exists(self.wb.spill_path))
+        self.assertEqual(len(self.db["chats"].batches), 1)
+        self.assertEqual(self.wb.stats()["replayed"], 1)
+
+
+    def test_counter_updates_not_replayed_after_uncertain_failure(self):
+        """Test that only replay-safe writes are spilled when a batch may have been half applied"""
+        self.db.down = AutoReconnect("connection reset mid-batch")
+        self.wb.insert("chats", {"n": 1})
+        self.wb.update("user_stats", {"_id": "a@example.com"}, {"$inc": {"chat_count": 1}})
+        self.wb.update("jobs", {"_id": "j1"}, {"$set": {"status": "done"}})
+        self.wb.flush()
+        self.assertEqual(self.wb.stats()["spilled"], 2)
+        self.assertEqual(self.wb.stats()["uncertain"], 1)
+
+        self.db.down = None
+        self.wb._replay_spill()
+        self.assertEqual(len(self.db["chats"].batches), 1)
+        self.assertEqual(len(self.db["jobs"].batches), 1)
+        self.assertEqual(self.db["user_stats"].batches, [])
+
+    def test_idle_worker_replays_spill(self):
+        """Test that a recovered process drains its spill file without new writes"""
+        self.db.down = ServerSelectionTimeoutError("connection refused")
+        self.wb.insert("chats", {"n": 1})
+        self.wb.flush()
+        self.db.down = None
+        wb = WriteBehind(self.db, flush_interval=0.01, replay_interval=0.01, spill_path=self.wb.spill_path)
+        deadline = time.monotonic() + 2
+        while os.path.exists(wb.spill_path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        wb.close(timeout=1)
+        self.assertFalse(os.path.exists(wb.spill_path))
+        self.assertEqual(wb.stats()["replayed"], 1)
+
+    def test_truncated_spill_line_is_quarantined(self):
+        """Test that a half-written spill line is set aside and the rest still replayed"""
+        self.db.down = ServerSelectionTimeoutError("connection refused")
+        self.wb.insert("chats", {"n": 1})
+        self.wb.flush()
+        with open(self.wb.spill_path, "a", encoding="utf-8") as f:
+            f.write('{"collection": "chats", "kind": "ins')
+        self.db.down = None
+        self.wb._replay_spill()
+        self.assertEqual(len(self.db["chats"].batches), 1)
+        self.assertEqual(self.wb.stats()["corrupt"], 1)
+        with open(self.wb.spill_path + ".bad", encoding="utf-8") as f:
+            self.assertIn('"kind": "ins', f.read())
+
+    def test_leftover_replaying_file_picked_up(self):
+        """Test that writes left in .replaying by a crash mid-replay are replayed on startup"""
+        self.db.down = ServerSelectionTimeoutError("connection refused")
+        self.wb.insert("chats", {"n": 1})
+        self.wb.flush()
+        os.replace(self.wb.spill_path, self.wb.spill_path + ".replaying")
+        self.db.down = None
+        wb = WriteBehind(self.db, flush_interval=0.01, spill_path=self.wb.spill_path)
+        deadline = time.monotonic() + 2
+        while os.path.exists(wb.spill_path + ".replaying") and time.monotonic() < deadline:
+            time.sleep(0.01)
+        wb.close(timeout=1)
+        self.assertEqual(len(self.db["chats"].batches), 1)
+
+    def test_replay_stops_at_first_unreachable_batch(self):
+        """Test that a replay against a dead server tries one batch and re-spills the rest"""
+        wb = WriteBehind(self.db, max_batch=2, enabled=False, spill_path=self.wb.spill_path)
+        self.db.down = ServerSelectionTimeoutError("connection refused")
+        for i in range(6):
+            wb.insert("chats", {"n": i})
+        self.db["chats"].attempts = 0
+        wb._replay_spill()
+        self.assertEqual(self.db["chats"].attempts, 1)
+        with open(wb.spill_path, encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 6)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,38 @@
+"""
+Health topics tagged on every chat at write time.
+
+chat() gets topic hits from the shared message matcher and save_chat stores
+them as a `topics` array on the chat. analytics_rollup counts them per day,
+so the admin "top health queries" view reads a handful of counters instead
+of rescanning recent messages. `python maintenance.py tag-topics` tags
+chats stored before this existed.
+"""
+from pymongo import UpdateOne
+from keyword_matcher import KeywordMatcher
+
+HEALTH_TOPICS = ["headache", "fever", "stress", "anxiety", "depression", "cough", "cold",
+                 "pain", "fatigue", "insomnia", "nausea", "dizziness", "allergy",
+                 "diabetes", "blood pressure", "heart", "weight", "diet", "exercise"]
+
+
+def build_topic_matcher():
+    return KeywordMatcher().add("topic", HEALTH_TOPICS).compile()
+
+
+def tag_chats(chats_col, batch_size=500):
+    """Set `topics` on every chat that doesn't have it yet; returns chats tagged."""
+    matcher = build_topic_matcher()
+    cursor = chats_col.find({"topics": {"$exists": False}}, {"user_message": 1}).batch_size(batch_size)
+    tagged = 0
+    batch = []
+    for chat in cursor:
+        topics = sorted(matcher.match(chat.get("user_message") or "").get("topic", ()))
+        batch.append(UpdateOne({"_id": chat["_id"]}, {"$set": {"topics": topics}}))
+        if len(batch) >= batch_size:
+            chats_col.bulk_write(batch, ordered=False)
+            tagged += len(batch)
+            batch = []
+    if batch:
+        chats_col.bulk_write(batch, ordered=False)
+        tagged += len(batch)
+    return tagged
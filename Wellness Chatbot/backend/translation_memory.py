@@ -0,0 +1,192 @@
+"""
+Translation memory and batched translation for UI strings and bot replies.
+
+Every translation is stored under (sha256 of the source text, target
+language), so a string is sent to an LLM once per language and is served
+from the store after that. There are two tiers, as in ResponseCache. The
+first is an in-process TTL/LRU cache. The second is an optional shared
+Mongo collection with no expiry, written through `save` (write-behind in
+app.py) and read with one `$in` query per batch.
+
+Strings the memory doesn't hold are packed into as few provider calls as
+possible. Each call carries at most `max_items` strings and `max_chars`
+characters, sent as a JSON array, and the reply must be a JSON array of
+the same length. Quoting makes the format delimiter-safe: a string
+containing newlines, brackets or "|||" can't shift the others. If a reply
+doesn't parse or has the wrong length, its batch is split in half and
+retried, down to single strings. A single string whose reply still isn't
+an array is taken as plain text, but marked Unverified and only cached
+locally: unlike a parsed reply it is never written to the shared memory.
+"""
+import asyncio
+import hashlib
+import json
+from datetime import datetime
+from ttl_cache import TTLCache
+
+SOURCE_LANGUAGE = "english"
+
+
+class Unverified(str):
+    """A plain-text reply that wasn't a JSON array: maybe a translation, maybe commentary."""
+
+
+def batch_prompt(texts, language):
+    return (
+        f"Translate each healthcare-related string in this JSON array to {language}. "
+        f"Reply with ONLY a JSON array of exactly {len(texts)} translated strings, in the same order. "
+        "Keep emoji, HTML tags, placeholders and line breaks as they are.\n"
+        + json.dumps(texts, ensure_ascii=False)
+    )
+
+
+def parse_batch(reply, count):
+    """The `count` strings in a JSON-array reply; raises ValueError otherwise."""
+    start, end = reply.find("["), reply.rfind("]")
+    if start < 0 or end < start:
+        raise ValueError("Reply has no JSON array")
+    # Models sometimes wrap the array in prose or a ``` fence
+    items = json.loads(reply[start:end + 1])
+    if not isinstance(items, list) or len(items) != count or not all(isinstance(i, str) for i in items):
+        raise ValueError(f"Expected {count} strings in the reply")
+    return items
+
+
+class TranslationMemory:
+    def __init__(self, collection=None, save=None, maxsize=5000, ttl=7 * 86400, max_items=50, max_chars=3000):
+        self.collection = collection
+        self.save = save
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.max_items = max_items
+        self.max_chars = max_chars
+        self.shared_hits = 0
+        self.shared_errors = 0
+        self.translated = 0
+        self.llm_calls = 0
+        self.retries = 0
+
+    @staticmethod
+    def make_key(text, language):
+        digest = hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+        return f"{language.strip().lower()}:{digest}"
+
+    def lookup(self, texts, language):
+        """{text: translation} for each of `texts` the memory already holds."""
+        found, missing = {}, {}
+        for text in texts:
+            key = self.make_key(text, language)
+            value = self.local.get(key)
+            if value is not None:
+                found[text] = value
+            else:
+                missing[key] = text
+        if not missing or self.collection is None:
+            return found
+        try:
+            docs = list(self.collection.find({"_id": {"$in": list(missing)}}, {"translation": 1}))
+        except Exception as e:
+            self.shared_errors += 1
+            print(f"Translation Memory Read Error: {e}")
+            return found
+        for doc in docs:
+            self.shared_hits += 1
+            self.local.set(doc["_id"], doc["translation"])
+            found[missing[doc["_id"]]] = doc["translation"]
+        return found
+
+    def store(self, translations, language, model=None, shared=True):
+        """Remember `translations`; shared=False keeps them in the local TTL tier only."""
+        now = datetime.now()
+        for text, translation in translations.items():
+            key = self.make_key(text, language)
+            self.local.set(key, translation)
+            if self.save and shared:
+                try:
+                    self.save(key, {"source": text, "language": language, "translation": translation,
+                                    "model": model, "created_at": now})
+                except Exception as e:
+                    self.shared_errors += 1
+                    print(f"Translation Memory Write Error: {e}")
+        self.translated += len(translations)
+
+    def batches(self, texts):
+        """Split `texts` into provider calls of at most max_items strings / max_chars characters."""
+        batch, size = [], 0
+        for text in texts:
+            if batch and (len(batch) >= self.max_items or size + len(text) > self.max_chars):
+                yield batch
+                batch, size = [], 0
+            batch.append(text)
+            size += len(text)
+        if batch:
+            yield batch
+
+    def _plan(self, texts, language):
+        unique = list(dict.fromkeys(t for t in texts if t and t.strip()))
+        if language.strip().lower() == SOURCE_LANGUAGE:
+            return {t: t for t in unique}, []
+        found = self.lookup(unique, language)
+        return found, list(self.batches([t for t in unique if t not in found]))
+
+    def _accept(self, batch, reply, model, language):
+        """{text: translation} for one reply, or None if the batch must be split."""
+        parsed = True
+        try:
+            translated = parse_batch(reply, len(batch))
+        except ValueError:
+            if len(batch) > 1:
+                self.retries += 1
+                return None
+            # A lone string often comes back as plain text, not an array. It
+            # may just as well be an apology, so it expires with the local tier
+            # instead of going into the shared memory for good.
+            translated, parsed = [reply], False
+        result = {text: t.strip() if parsed else Unverified(t.strip()) for text, t in zip(batch, translated)}
+        self.store(result, language, model, shared=parsed)
+        return result
+
+    def _translate_batch(self, batch, language, complete):
+        self.llm_calls += 1
+        reply, model = complete(batch_prompt(batch, language))
+        result = self._accept(batch, reply, model, language)
+        if result is None:
+            mid = len(batch) // 2
+            result = self._translate_batch(batch[:mid], language, complete)
+            result.update(self._translate_batch(batch[mid:], language, complete))
+        return result
+
+    async def _atranslate_batch(self, batch, language, acomplete):
+        self.llm_calls += 1
+        reply, model = await acomplete(batch_prompt(batch, language))
+        result = self._accept(batch, reply, model, language)
+        if result is None:
+            mid = len(batch) // 2
+            result = await self._atranslate_batch(batch[:mid], language, acomplete)
+            result.update(await self._atranslate_batch(batch[mid:], language, acomplete))
+        return result
+
+    def translate(self, texts, language, complete):
+        """Translations of `texts` in order. `complete(prompt)` returns (reply, model)."""
+        found, batches = self._plan(texts, language)
+        for batch in batches:
+            found.update(self._translate_batch(batch, language, complete))
+        return [found.get(t, t) for t in texts]
+
+    async def atranslate(self, texts, language, acomplete):
+        """translate() for the event loop; batches go to `acomplete` concurrently."""
+        found, batches = await asyncio.to_thread(self._plan, texts, language)
+        for result in await asyncio.gather(*(self._atranslate_batch(b, language, acomplete) for b in batches)):
+            found.update(result)
+        return [found.get(t, t) for t in texts]
+
+    def stats(self):
+        return {
+            "size": len(self.local),
+            "local_hits": self.local.hits,
+            "shared_enabled": self.collection is not None,
+            "shared_hits": self.shared_hits,
+            "shared_errors": self.shared_errors,
+            "translated": self.translated,
+            "llm_calls": self.llm_calls,
+            "retries": self.retries
+        }
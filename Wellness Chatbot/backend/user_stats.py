@@ -0,0 +1,101 @@
+"""
+Materialized per-user chat stats.
+
+One document per user in the `user_stats` collection, keyed by email:
+
+    {_id: email, chat_count, image_count, last_active, first_active,
+     moods: [newest ... oldest, at most MOOD_HISTORY], intents: {intent: n}}
+
+save_chat() queues one atomic $inc/$push+$slice upsert per message, so
+/api/user_stats and the admin user activity table read a single document
+instead of counting and sorting the chats collection. Chats stored before
+this existed are folded in by `python maintenance.py rebuild-user-stats`.
+"""
+from pymongo import ReplaceOne
+
+MOOD_HISTORY = 10
+
+
+def _intent_key(intent):
+    # Field names can't contain dots or start with $
+    return str(intent or "general").replace(".", "_").lstrip("$") or "general"
+
+
+def chat_update(chat):
+    """The update document that folds one stored chat into its user's stats."""
+    timestamp = chat["timestamp"]
+    update = {
+        "$inc": {
+            "chat_count": 1,
+            "image_count": 1 if chat.get("has_image") else 0,
+            f"intents.{_intent_key(chat.get('intent'))}": 1
+        },
+        "$max": {"last_active": timestamp},
+        "$min": {"first_active": timestamp}
+    }
+    if chat.get("mood"):
+        update["$push"] = {"moods": {"$each": [chat["mood"]], "$position": 0, "$slice": MOOD_HISTORY}}
+    return update
+
+
+def get_user_stats(collection, email):
+    """Stats for `email`, with zeros for a user who hasn't chatted yet."""
+    return stats_from_doc(collection.find_one({"_id": email}))
+
+
+def stats_from_doc(doc):
+    doc = doc or {}
+    return {
+        "chat_count": doc.get("chat_count", 0),
+        "image_count": doc.get("image_count", 0),
+        "mood_history": doc.get("moods", []),
+        "intents": doc.get("intents", {}),
+        "last_active": doc.get("last_active"),
+        "first_active": doc.get("first_active")
+    }
+
+
+def stats_from_chats(chats):
+    """Fold chats sorted by (user_email, timestamp desc) into one stats doc per user."""
+    doc = None
+    for chat in chats:
+        email = chat.get("user_email")
+        if doc is None or doc["_id"] != email:
+            if doc is not None:
+                yield doc
+            doc = {"_id": email, "chat_count": 0, "image_count": 0, "moods": [], "intents": {},
+                   "last_active": chat.get("timestamp"), "first_active": chat.get("timestamp")}
+        doc["chat_count"] += 1
+        doc["image_count"] += 1 if chat.get("has_image") else 0
+        key = _intent_key(chat.get("intent"))
+        doc["intents"][key] = doc["intents"].get(key, 0) + 1
+        if chat.get("mood") and len(doc["moods"]) < MOOD_HISTORY:
+            doc["moods"].append(chat["mood"])
+        if chat.get("timestamp"):
+            doc["first_active"] = chat["timestamp"]
+    if doc is not None:
+        yield doc
+
+
+def rebuild_user_stats(chats_col, stats_col, batch_size=500):
+    """Recompute every user's stats from the chats collection; returns users written.
+
+    Walks the user_email_timestamp_id index once. Chats saved while this runs
+    may be counted twice or missed, so run it while traffic is quiet.
+    """
+    cursor = chats_col.find(
+        {"user_email": {"$exists": True}},
+        {"_id": 0, "user_email": 1, "timestamp": 1, "mood": 1, "has_image": 1, "intent": 1}
+    ).sort([("user_email", 1), ("timestamp", -1)])
+    written = 0
+    batch = []
+    for doc in stats_from_chats(cursor):
+        batch.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+        if len(batch) >= batch_size:
+            stats_col.bulk_write(batch, ordered=False)
+            written += len(batch)
+            batch = []
+    if batch:
+        stats_col.bulk_write(batch, ordered=False)
+        written += len(batch)
+    return written
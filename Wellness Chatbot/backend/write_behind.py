@@ -0,0 +1,252 @@
+"""
+Write-behind queue for log-style Mongo writes.
+
+Chats, AI error logs, admin logs and the counters derived from chats don't
+need to be durable before the HTTP response goes out. Request handlers
+enqueue them here and return. A background thread groups pending writes by
+collection and sends one unordered bulk_write per collection. It flushes
+every `flush_interval` seconds, or sooner once `max_batch` writes are waiting.
+
+If Mongo is unreachable, or the queue is full, writes are appended to a
+local JSON-lines spill file. The spill is replayed after the next
+successful flush, every `replay_interval` seconds while idle, and on
+close(). A replay stops at the first batch that fails and puts the rest
+back unsent. A line that doesn't parse (a crash mid-append) is moved to
+`<spill>.bad` instead of aborting the replay, and a `<spill>.replaying`
+left behind by a crash mid-replay is picked up on the next one. On
+interpreter exit the queue is drained.
+
+A replay must not apply a write twice. Inserts keep the _id pymongo gave
+them, so a replayed duplicate is rejected (11000) and ignored. Updates are
+only spilled when re-applying them is harmless: either no server was
+reachable, so nothing was sent, or the update only sets values ($set,
+$setOnInsert, $unset, $max, $min). A counter update ($inc, $push) caught
+in a failure that may have reached the server is dropped and counted in
+`uncertain`. So counters are at-most-once, and `python maintenance.py
+rebuild-user-stats` / `rebuild-rollups` recompute them from the chats.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from bson import json_util
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError, ServerSelectionTimeoutError
+
+# Update operators that give the same result when applied twice
+IDEMPOTENT_OPERATORS = {"$set", "$setOnInsert", "$unset", "$max", "$min"}
+
+
+class WriteBehind:
+    def __init__(self, db, max_batch=500, flush_interval=1.0, max_queue=10000, spill_path=None, enabled=True,
+                 replay_interval=30.0):
+        self.db = db
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.replay_interval = replay_interval
+        self.spill_path = spill_path
+        self.enabled = enabled
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.errors = 0
+        self.uncertain = 0
+        self.corrupt = 0
+        self._next_replay = 0.0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._spill_lock = threading.Lock()
+        self._thread = None
+        if enabled:
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    # ---- producers ----
+    def insert(self, collection, doc):
+        self._submit((collection, "insert", doc))
+
+    def update(self, collection, filter, update, upsert=True):
+        self._submit((collection, "update", {"filter": filter, "update": update, "upsert": upsert}))
+
+    def _submit(self, op):
+        if not self.enabled:
+            # Synchronous mode: same code path, batch of one
+            self._write([op])
+            return
+        try:
+            self._queue.put_nowait(op)
+            self.enqueued += 1
+        except queue.Full:
+            self._spill([op])
+
+    # ---- consumer ----
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                batch = self._take_batch()
+                flushed = self._write(batch) if batch else False
+                # Replay straight after a good flush, and on a timer so an idle
+                # process that has recovered still drains its spill file
+                if flushed or time.monotonic() >= self._next_replay:
+                    self._replay_spill()
+            except Exception as e:
+                # The thread must outlive any one bad batch or spill file
+                self.errors += 1
+                print(f"Write-Behind Worker Error: {e}")
+
+    def _take_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, ops):
+        """bulk_write `ops` per collection, spilling any that fail; True if all succeeded."""
+        by_collection = {}
+        for collection, kind, payload in ops:
+            if kind == "insert":
+                model = InsertOne(payload)
+            else:
+                model = UpdateOne(payload["filter"], payload["update"], upsert=payload["upsert"])
+            by_collection.setdefault(collection, []).append((model, (collection, kind, payload)))
+        failed = []
+        for collection, items in by_collection.items():
+            try:
+                self.db[collection].bulk_write([m for m, _ in items], ordered=False)
+                self.written += len(items)
+                self.batches += 1
+            except BulkWriteError as e:
+                # The server rejected individual writes (a duplicate key from a
+                # replayed insert, a validation error): retrying won't help
+                errors = e.details.get("writeErrors", [])
+                self.written += len(items) - len(errors)
+                self.batches += 1
+                if any(err.get("code") != 11000 for err in errors):
+                    self.errors += 1
+                    print(f"Write-Behind Rejected Writes ({collection}): {errors[:3]}")
+            except ServerSelectionTimeoutError as e:
+                # No server was reachable, so none of the batch was sent
+                self.errors += 1
+                print(f"Write-Behind Flush Error ({collection}): {e}")
+                failed.extend(op for _, op in items)
+            except PyMongoError as e:
+                # Part of an unordered batch may have been applied already
+                self.errors += 1
+                print(f"Write-Behind Flush Error ({collection}): {e}")
+                retry = [op for _, op in items if self._replay_safe(op)]
+                if len(retry) < len(items):
+                    self.uncertain += len(items) - len(retry)
+                    print(f"Write-Behind: dropped {len(items) - len(retry)} counter updates that may "
+                          f"already be applied ({collection}); rebuild with maintenance.py if needed")
+                failed.extend(retry)
+        if failed:
+            self._spill(failed)
+        return not failed
+
+    @staticmethod
+    def _replay_safe(op):
+        _, kind, payload = op
+        return kind == "insert" or set(payload["update"]) <= IDEMPOTENT_OPERATORS
+
+    # ---- spill file ----
+    def _spill(self, ops):
+        if not self.spill_path:
+            print(f"Write-Behind: dropped {len(ops)} writes (no spill file configured)")
+            return
+        with self._spill_lock:
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for collection, kind, payload in ops:
+                    f.write(json_util.dumps({"collection": collection, "kind": kind, "payload": payload}) + "\n")
+            self.spilled += len(ops)
+
+    def _replay_spill(self):
+        self._next_replay = time.monotonic() + self.replay_interval
+        if not self.spill_path:
+            return
+        replaying = f"{self.spill_path}.replaying"
+        with self._spill_lock:
+            # Take the file out of the way so new spills start a fresh one. A
+            # .replaying file still there is from a crash mid-replay: it goes first.
+            if not os.path.exists(replaying):
+                try:
+                    os.replace(self.spill_path, replaying)
+                except OSError:
+                    return
+        ops = self._read_spill(replaying)
+        os.remove(replaying)
+        if not ops:
+            return
+        print(f"Write-Behind: replaying {len(ops)} spilled writes")
+        self.replayed += len(ops)
+        for start in range(0, len(ops), self.max_batch):
+            if not self._write(ops[start:start + self.max_batch]):
+                # Still down: don't wait out a server-selection timeout per batch
+                rest = ops[start + self.max_batch:]
+                if rest:
+                    self._spill(rest)
+                break
+
+    def _read_spill(self, path):
+        ops, bad = [], []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json_util.loads(line)
+                    ops.append((entry["collection"], entry["kind"], entry["payload"]))
+                except (ValueError, KeyError, TypeError):
+                    bad.append(line if line.endswith("\n") else line + "\n")
+        if bad:
+            self.corrupt += len(bad)
+            print(f"Write-Behind: moved {len(bad)} unreadable spill lines to {self.spill_path}.bad")
+            with open(f"{self.spill_path}.bad", "a", encoding="utf-8") as f:
+                f.writelines(bad)
+        return ops
+
+    # ---- lifecycle ----
+    def flush(self):
+        """Write everything queued so far on the calling thread."""
+        ops = []
+        while True:
+            try:
+                ops.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(ops), self.max_batch):
+            self._write(ops[start:start + self.max_batch])
+
+    def close(self, timeout=10):
+        """Stop the worker and drain the queue; registered with atexit."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+        self._replay_spill()
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "errors": self.errors,
+            "uncertain": self.uncertain,
+            "corrupt": self.corrupt
+        }
@@ -84,6 +84,35 @@ window.saveSleep = function () {
     res.textContent = `Saved ${h} hours of sleep. Stay rested!`;
 };
 
+// Long analyses run as background jobs: the endpoint answers 202 with a
+// job id straight away and the result is polled from /api/jobs/<id>.
+// The session token ties a job to its user; without it only the id is needed.
+function withToken(url) {
+    const token = localStorage.getItem('token');
+    return token ? `${url}?token=${encodeURIComponent(token)}` : url;
+}
+
+async function pollJob(jobId, intervalMs = 1500) {
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+        const data = await (await fetch(withToken(`/api/jobs/${jobId}`))).json();
+        if (!data.success) return data;
+        if (data.job.status === 'done') return data.job.result;
+        if (data.job.status === 'failed') return { success: false, error: data.job.error };
+    }
+}
+
+async function runJob(url, body) {
+    const res = await fetch(withToken(url), {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ ...body, async: true, email: localStorage.getItem('email') })
+    });
+    const data = await res.json();
+    // No job id: a validation error or a full queue (503)
+    return data.job_id ? pollJob(data.job_id) : data;
+}
+
 window.getDietRecommendation = async function () {
     const goalEl = document.getElementById('dietGoal');
     const resultBox = document.getElementById('dietResult');
@@ -93,15 +122,10 @@ window.getDietRecommendation = async function () {
     resultBox.innerHTML = '<p>Generating your diet plan...</p>';
 
     try {
-        const res = await fetch('/api/diet-recommendation', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                goal: goal,
-                language: localStorage.getItem('language') || 'English'
-            })
+        const data = await runJob('/api/diet-recommendation', {
+            goal: goal,
+            language: localStorage.getItem('language') || 'English'
         });
-        const data = await res.json();
 
         if (data.success) {
             // Render markdown or text
@@ -115,10 +139,28 @@ window.getDietRecommendation = async function () {
 };
 
 let fullChatImageData = null;
+let fullChatImageFile = null;
+
+// Image chats are sent as multipart to /chat/upload: the file goes up as-is
+// instead of as a base64 string ~33% larger. The data URL is only the preview.
+async function postImageChat(payload, file) {
+    const form = new FormData();
+    Object.entries(payload).forEach(([key, value]) => {
+        if (value != null) form.append(key, value);
+    });
+    form.append('image', file);
+    form.append('async', 'true');
+    const res = await fetch(withToken('/chat/upload'), { method: 'POST', body: form });
+    const data = await res.json();
+    if (!data.job_id) return data.reply ? data : { reply: data.error || 'Server error.' };
+    const result = await pollJob(data.job_id);
+    return result.reply ? result : { reply: result.error || 'Server error.' };
+}
 
 window.handleFullImageSelect = function (e) {
     const file = e.target.files[0];
     if (file) {
+        fullChatImageFile = file;
         const reader = new FileReader();
         reader.onload = function (evt) {
             fullChatImageData = evt.target.result;
@@ -131,6 +173,7 @@ window.handleFullImageSelect = function (e) {
 
 window.clearFullImage = function () {
     fullChatImageData = null;
+    fullChatImageFile = null;
     document.getElementById('fullChatImagePreview').style.display = 'none';
     document.getElementById('fullImageInput').value = '';
 };
@@ -165,23 +208,18 @@ window.sendFullChatMessage = async function () {
         language: localStorage.getItem('language') || 'English'
     };
 
-    if (fullChatImageData) {
-        payload.image = fullChatImageData;
-    }
-
     try {
-        const res = await fetch('/chat', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(payload)
-        });
-        const data = await res.json();
+        if (!fullChatImageFile) {
+            await streamReplyTo(box, tid, payload);
+            return;
+        }
+        const data = await postImageChat(payload, fullChatImageFile);
 
         document.getElementById(tid).remove();
         appendMsgTo(box, data.reply, false);
         clearFullImage();
     } catch (err) {
-        document.getElementById(tid).remove();
+        document.getElementById(tid)?.remove();
         appendMsgTo(box, "Connection error.", false);
         clearFullImage();
     }
@@ -195,10 +233,12 @@ window.toggleChat = function () {
 };
 
 let floatChatImageData = null;
+let floatChatImageFile = null;
 
 window.handleImageSelect = function (e) {
     const file = e.target.files[0];
     if (file) {
+        floatChatImageFile = file;
         const reader = new FileReader();
         reader.onload = function (evt) {
             floatChatImageData = evt.target.result;
@@ -211,6 +251,7 @@ window.handleImageSelect = function (e) {
 
 window.clearImage = function () {
     floatChatImageData = null;
+    floatChatImageFile = null;
     document.getElementById('imagePreview').style.display = 'none';
     document.getElementById('imageInput').value = '';
 };
@@ -251,23 +292,18 @@ window.sendChatMessage = async function (predefinedMsg) {
         language: localStorage.getItem('language') || 'English'
     };
 
-    if (floatChatImageData) {
-        payload.image = floatChatImageData;
-    }
-
     try {
-        const res = await fetch('/chat', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(payload)
-        });
-        const data = await res.json();
+        if (!floatChatImageFile) {
+            await streamReplyTo(box, tid, payload);
+            return;
+        }
+        const data = await postImageChat(payload, floatChatImageFile);
 
         document.getElementById(tid).remove();
         appendMsgTo(box, data.reply, false);
         clearImage();
     } catch (err) {
-        document.getElementById(tid).remove();
+        document.getElementById(tid)?.remove();
         appendMsgTo(box, "Connection error.", false);
         clearImage();
     }
@@ -284,6 +320,59 @@ function appendMsgTo(box, text, isUser) {
     div.innerHTML = `<div class="msg-content">${text}</div><div class="msg-meta">${new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })}</div>`;
     box.appendChild(div);
     box.scrollTop = box.scrollHeight;
+    return div.querySelector('.msg-content');
+}
+
+// Read /chat/stream Server-Sent Events, calling onToken for each chunk
+async function streamChat(payload, onToken) {
+    const res = await fetch('/chat/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(payload)
+    });
+    if (!res.ok || !res.body) throw new Error('Stream unavailable');
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result = null;
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const frames = buffer.split('\n\n');
+        buffer = frames.pop();
+        for (const frame of frames) {
+            let event = 'message', data = '';
+            frame.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            if (!data) continue;
+            const parsed = JSON.parse(data);
+            if (event === 'done') result = parsed;
+            else if (parsed.token) onToken(parsed.token);
+        }
+    }
+    return result;
+}
+
+// Stream a text reply into a chat box, replacing the typing indicator on the first token
+async function streamReplyTo(box, typingId, payload) {
+    let replyEl = null;
+    const data = await streamChat(payload, (token) => {
+        if (!replyEl) {
+            const typing = document.getElementById(typingId);
+            if (typing) typing.remove();
+            replyEl = appendMsgTo(box, '', false);
+        }
+        replyEl.textContent += token;
+        box.scrollTop = box.scrollHeight;
+    });
+    const typing = document.getElementById(typingId);
+    if (typing) typing.remove();
+    if (!replyEl && data) appendMsgTo(box, data.reply, false);
+    return data;
 }
 
 window.logout = function () { localStorage.clear(); window.location.href = "/"; };
@@ -540,15 +629,10 @@ window.checkSymptoms = async function () {
     resultBox.innerHTML = '';
 
     try {
-        const res = await fetch('/symptom_checker', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                symptom: symptoms,
-                language: localStorage.getItem('language') || 'English'
-            })
+        const data = await runJob('/symptom_checker', {
+            symptom: symptoms,
+            language: localStorage.getItem('language') || 'English'
         });
-        const data = await res.json();
 
         if (data.success && data.result) {
             resultBox.innerHTML = `<div class="glass-card" style="padding: 20px; text-align: left; line-height: 1.6; margin-top:20px;">${data.result.replace(/\n/g, '<br>')}</div>`;
@@ -838,7 +838,48 @@ const translations = {
     }
 };
 
+// Strings a language's table lacks are translated from English by the
+// backend's translation memory in one /translate/batch call. Verified
+// translations are kept in localStorage so each browser asks only once per
+// language; unverified replies and English echoes are asked for again later.
+async function fillMissingTranslations(lang) {
+    const english = translations["English"];
+    const dict = translations[lang] || (translations[lang] = {});
+    const stored = JSON.parse(localStorage.getItem(`translations_${lang}`) || '{}');
+    Object.assign(dict, stored);
+    const missing = Object.keys(english).filter(key => !(key in dict));
+    if (missing.length === 0) return false;
+    try {
+        const res = await fetch('/translate/batch', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ texts: missing.map(key => english[key]), language: lang })
+        });
+        const data = await res.json();
+        if (!data.success) return false;
+        let filled = false;
+        missing.forEach((key, i) => {
+            const text = data.translations[i];
+            if (!data.verified[i] || !text || text === english[key]) return;
+            stored[key] = dict[key] = text;
+            filled = true;
+        });
+        if (filled) localStorage.setItem(`translations_${lang}`, JSON.stringify(stored));
+        return filled;
+    } catch (err) {
+        console.error('Batch translation failed:', err);
+        return false;
+    }
+}
+
 function updateUILanguage(lang) {
+    if (lang !== "English") {
+        fillMissingTranslations(lang).then(filled => { if (filled) applyTranslations(lang); });
+    }
+    applyTranslations(lang);
+}
+
+function applyTranslations(lang) {
     const dict = translations[lang] || translations["English"];
 
     // Update text content